@@ -0,0 +1,91 @@
+import os
+import threading
+from importlib import import_module
+
+# Agent name -> module with its tools and build_agent(). The module (and its heavy
+# dependencies) is only imported the first time the agent is requested
+AGENT_MODULES = {
+    "quality": "agents.quality",
+    "director": "agents.director",
+    "nan_imputer": "agents.nan_imputer",
+    "outliers": "agents.outliers",
+    "one_hot": "agents.one_hot",
+    "modeling": "agents.modeling",
+    "narrator": "agents.narrator",
+}
+
+# Agent name -> its tool, called directly (without the model) in the tool-first mode
+AGENT_TOOLS = {
+    "quality": "evaluate_csv_quality",
+    "nan_imputer": "manage_nulls",
+    "outliers": "manage_outliers",
+    "one_hot": "apply_dummies",
+    "modeling": "train_and_test_model",
+}
+
+_agents = {}
+_lock = threading.RLock()
+
+
+def get_agent(name):
+    """
+    Returns an agent, building it on first use. Agents are shared by the whole
+    process (also by the batch mode threads).
+
+    Args:
+        name (str): Agent name, a key of AGENT_MODULES.
+
+    Returns:
+        Agent: The agent.
+
+    Raises:
+        ValueError: If the name is unknown.
+        EnvironmentError: If GOOGLE_API_KEY is not set.
+    """
+    if name not in AGENT_MODULES:
+        raise ValueError(f"Agente no reconocido: '{name}'. Disponibles: {list(AGENT_MODULES)}")
+    with _lock:
+        if name not in _agents:
+            agent = import_module(AGENT_MODULES[name]).build_agent()
+            # Every tool execution is traced (utils/tracing.py)
+            from utils.tracing import trace_tool
+            agent.tool_hooks = (agent.tool_hooks or []) + [trace_tool]
+            _agents[name] = agent
+        return _agents[name]
+
+
+def get_tool(name):
+    """
+    Returns the plain function behind the tool of an agent, without building the
+    agent or its model (no API key needed).
+
+    Args:
+        name (str): Agent name, a key of AGENT_TOOLS.
+
+    Returns:
+        callable: The tool function.
+
+    Raises:
+        ValueError: If the agent has no tool.
+    """
+    if name not in AGENT_TOOLS:
+        raise ValueError(f"El agente '{name}' no tiene herramienta. Disponibles: {list(AGENT_TOOLS)}")
+    return getattr(import_module(AGENT_MODULES[name]), AGENT_TOOLS[name]).entrypoint
+
+
+def build_model(model_id="gemini-2.5-flash"):
+    """
+    Gemini model of the agents, scheduled by utils.scheduler. With AGENT_MODEL=stub
+    the offline StubModel is used instead (benchmarks and dry runs, no API key needed).
+
+    Raises:
+        EnvironmentError: If GOOGLE_API_KEY is not set.
+    """
+    if os.environ.get("AGENT_MODEL") == "stub":
+        from utils.stub_model import StubModel
+        return StubModel()
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        raise EnvironmentError("Falta la variable GOOGLE_API_KEY. Añádela al archivo .env.")
+    from utils.gemini import ScheduledGemini
+    return ScheduledGemini(id=model_id, api_key=api_key)
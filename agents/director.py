@@ -1,7 +1,6 @@
 import os
-from agno.agent import Agent
-from agno.models.google import Gemini
 from dotenv import load_dotenv
+from agents import build_model, get_agent
 from pydantic import BaseModel, Field
 
 # Load environment variables
@@ -14,38 +13,96 @@ class DirectorResponse(BaseModel):
     use_smote: str = Field(..., description="Decisión sobre aplicar SMOTE: 'yes', 'no'")
 
 
-# This agent is the Director who makes strategic decisions based on data quality reports
-# Agent
-strategy_agent = Agent(
-    name="Agente Director",
-    model=Gemini(id="gemini-2.5-flash", api_key= os.environ["GOOGLE_API_KEY"]),
-    markdown=True,
-    output_schema=DirectorResponse, # Using Pydantic model for structured output
-    description="Eres el Director de Data Science. Tomas decisiones estratégicas basadas en reportes de calidad.",
-    instructions=[
-        "Recibirás un reporte de calidad de un dataset y lo mostrarás.",
-        "Analiza las dimensiones, nulos, outliers, columnas categóricas ('cols_cat') y desbalanceo.",
-        "Debes tomar 5 decisiones basadas en el análisis del reporte.",
+# Thresholds of the Director rules
+NULL_THRESHOLD = 5.0 # Percentage of null cells (over all the cells) above which KNN is used
+ROWS_THRESHOLD = 1000 # Number of rows above which outlier rows are dropped
+IMBALANCE_THRESHOLD = 40.0 # A class below this percentage means imbalance
+
+
+def plan_strategy(profile) -> DirectorResponse:
+    """
+    Deterministic local planner. Applies the Director rules to a dataset profile
+    without calling the LLM.
+
+    Args:
+        profile (DatasetProfile): Quality profile of the dataset.
+
+    Returns:
+        DirectorResponse: Strategy decisions for the pipeline.
+    """
+    # 1. Null strategy
+    if profile.total_nulls == 0:
+        null_strategy = "skip"
+    elif profile.null_percentage < NULL_THRESHOLD:
+        null_strategy = "drop"
+    else:
+        null_strategy = "knn"
+
+    # 2. Outliers strategy
+    if profile.total_outliers == 0:
+        outliers_strategy = "skip"
+    elif profile.n_rows < ROWS_THRESHOLD:
+        outliers_strategy = "capping"
+    else:
+        outliers_strategy = "drop"
+
+    # 3. Encoding strategy
+    encoding_strategy = "get_dummies" if profile.cols_cat else "skip"
+
+    # 4. SMOTE
+    use_smote = "yes" if profile.minority_class_percentage < IMBALANCE_THRESHOLD else "no"
+
+    return DirectorResponse(
+        null_strategy=null_strategy,
+        outliers_strategy=outliers_strategy,
+        encoding_strategy=encoding_strategy,
+        use_smote=use_smote,
+    )
+
+
+# This agent is the Director who makes strategic decisions based on data quality reports.
+# It is only used as a fallback of plan_strategy or when explicitly requested
+# Agent (built on first use through agents.get_agent)
+def build_agent():
+    from agno.agent import Agent # agno is only imported when the LLM Director is needed
+    return Agent(
+        name="Agente Director",
+        model=build_model(),
+        markdown=True,
+        output_schema=DirectorResponse, # Using Pydantic model for structured output
+        description="Eres el Director de Data Science. Tomas decisiones estratégicas basadas en reportes de calidad.",
+        instructions=[
+            "Recibirás el perfil de calidad de un dataset en JSON y lo mostrarás.",
+            "En el perfil, 'nulls.pct' es el porcentaje de celdas nulas sobre el total, 'nulls.rows_pct' el porcentaje de filas con nulos, 'outliers.cells' el total de outliers, 'cols_cat' las columnas categóricas (más 'cols_cat_total' si la tabla está recortada) y 'target.minority_pct' el porcentaje de la clase minoritaria.",
+            "Analiza las dimensiones, nulos, outliers, columnas categóricas ('cols_cat') y desbalanceo.",
+            "Debes tomar 5 decisiones basadas en el análisis del reporte.",
         
-        "Debes seguir las siguientes estrategias para tomar tu decisión:",
-        "1. NULL_STRATEGY:",
-        "   - Si nulos < 5%, del total entonces eliges 'drop'.",
-        "   - Si nulos >= 5%, entonces eliges 'knn'.",
-        "   - Si no hay nulos entonces eliges 'skip'.",
+            "Debes seguir las siguientes estrategias para tomar tu decisión:",
+            "1. NULL_STRATEGY:",
+            "   - Si nulos ('nulls.pct') < 5% del total, entonces eliges 'drop'.",
+            "   - Si nulos ('nulls.pct') >= 5% del total, entonces eliges 'knn'.",
+            "   - Si no hay nulos entonces eliges 'skip'.",
         
-        "2. OUTLIERS_STRATEGY:",
-        "   - Si filas totales < 1000 entonces eliges 'capping'.",
-        "   - Si filas totales >= 1000 entonces eliges 'drop'.",
-        "   - Si no hay outliers entonces eliges 'skip'.",
+            "2. OUTLIERS_STRATEGY:",
+            "   - Si filas totales < 1000 entonces eliges 'capping'.",
+            "   - Si filas totales >= 1000 entonces eliges 'drop'.",
+            "   - Si no hay outliers entonces eliges 'skip'.",
         
-        "3. ENCODING_STRATEGY:",
-        "   - Si hay columnas categóricas ('cols_cat') aplica 'get_dummies' a las columnas categóricas.",
-        "   - Si no hay columnas categóricas aplica 'skip'.",
+            "3. ENCODING_STRATEGY:",
+            "   - Si hay columnas categóricas ('cols_cat') aplica 'get_dummies' a las columnas categóricas.",
+            "   - Si no hay columnas categóricas aplica 'skip'.",
 
-        "4. SCALING_METHOD: siempre aplica normalización de datos con 'standard'",
+            "4. SCALING_METHOD: siempre aplica normalización de datos con 'standard'",
         
-        "5. USE_SMOTE:",
-        "   - Si existe un desbalanceo de datos, entonces eliges 'yes'.",
-        "   - Si los datos están balanceados entonces eliges 'no'."
-    ]
-)
\ No newline at end of file
+            "5. USE_SMOTE:",
+            "   - Si existe un desbalanceo de datos, entonces eliges 'yes'.",
+            "   - Si los datos están balanceados entonces eliges 'no'."
+        ]
+    )
+
+
+# Backwards compatible attribute: `from agents.director import strategy_agent` builds the agent on first use
+def __getattr__(name):
+    if name == "strategy_agent":
+        return get_agent("director")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
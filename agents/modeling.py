@@ -1,28 +1,32 @@
 import pandas as pd
 import os
-import matplotlib
-matplotlib.use('Agg') # Use a non-interactive backend (for environments without display)
-import matplotlib.pyplot as plt
-import seaborn as sns
-from agno.agent import Agent
-from agno.models.google import Gemini
 from agno.tools import tool
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import f1_score, confusion_matrix, accuracy_score, recall_score, precision_score
-from imblearn.over_sampling import SMOTE
-from sklearn.preprocessing import StandardScaler
 from dotenv import load_dotenv
+from agents import build_model, get_agent
+from utils.store import store
+from utils.model_selection import build_candidates, select_model, leaderboard_markdown, tune_model, tuning_markdown
+from utils.inference import save_bundle
 
 # Load environment variables
 load_dotenv()
 
 
 @tool
-def train_and_test_model(filepath: str, use_smote: str = "no") -> str:
-    # Read the CSV file and handle potential errors
+def train_and_test_model(filepath: str, use_smote: str = "no", candidates: str = "all", cv_folds: int = 5, tune_budget: float = 0) -> str:
+    # Heavy dependencies are imported on first call, not when the agent is built
+    import matplotlib
+    matplotlib.use('Agg') # Use a non-interactive backend (for environments without display)
+    from matplotlib.figure import Figure
+    import seaborn as sns
+    from sklearn.model_selection import train_test_split
+    from sklearn.base import clone
+    from sklearn.metrics import f1_score, confusion_matrix, accuracy_score, recall_score, precision_score
+    from imblearn.over_sampling import SMOTE
+    from sklearn.preprocessing import StandardScaler
+
+    # Get the dataset from the shared store (or read the CSV file) and handle potential errors
     try:
-        df = pd.read_csv(filepath)
+        df = store.resolve(filepath)
     except FileNotFoundError:
         return f"Error: El archivo '{filepath}' no fue encontrado."
     except pd.errors.EmptyDataError:
@@ -71,8 +75,33 @@ def train_and_test_model(filepath: str, use_smote: str = "no") -> str:
         else:
             return "Parámetro 'use_smote' no reconocido. Usa 'yes' o 'no'."
 
-        # Train Random Forest Classifier
-        clf = RandomForestClassifier(n_estimators=100, random_state=42)
+        # Model selection: k-fold cross-validation of every candidate on the train set, in parallel
+        if cv_folds >= 2:
+            try:
+                leaderboard = select_model(X_train, y_train, candidates=candidates, use_smote=use_smote, cv_folds=cv_folds)
+            except ValueError as e:
+                return f"Error en la selección de modelos: {e}"
+            best_name = leaderboard.index[0]
+            leaderboard_summary = f"### Leaderboard ({cv_folds}-fold CV sobre train)\n{leaderboard_markdown(leaderboard)}\n\n"
+        else:
+            best_name = "random_forest"
+            leaderboard_summary = ""
+
+        # Hyperparameter search of the best model within tune_budget seconds (successive halving)
+        params = {}
+        tuning_summary = ""
+        if tune_budget > 0:
+            try:
+                tuning = tune_model(X_train, y_train, best_name, use_smote=use_smote, budget_s=tune_budget)
+            except ValueError as e:
+                return f"Error en el ajuste de hiperparámetros: {e}"
+            params = tuning["best_params"]
+            tuning_summary = f"{tuning_markdown(tuning)}\n\n"
+
+        # Train the best model on the whole train set using all cores
+        clf = clone(build_candidates()[best_name]).set_params(**params)
+        if "n_jobs" in clf.get_params():
+            clf.set_params(n_jobs=-1)
         clf.fit(X_train_final, y_train_final)
 
         # Predictions
@@ -100,44 +129,88 @@ def train_and_test_model(filepath: str, use_smote: str = "no") -> str:
         )
         
         # Confusion Matrix plot
+        # (own Figure instead of pyplot's global state, so batch mode can plot from several threads)
         cm = confusion_matrix(y_test, y_test_pred)
-        plt.figure(figsize=(8, 6))
-        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
-        plt.title(f'Matriz de Confusión (Target: {target_col})\nSMOTE: {use_smote}')
-        plt.ylabel('Realidad')
-        plt.xlabel('Predicción')
+        fig = Figure(figsize=(8, 6))
+        ax = fig.subplots()
+        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=ax)
+        ax.set_title(f'Matriz de Confusión (Target: {target_col})\nSMOTE: {use_smote}')
+        ax.set_ylabel('Realidad')
+        ax.set_xlabel('Predicción')
         
         # Save the confusion matrix plot
-        output_folder = os.path.join("data", "clean_data")
+        output_folder = store.clean_folder(filepath)
         clean_name = os.path.basename(filepath).split("_")[0] if "_" in os.path.basename(filepath) else os.path.basename(filepath).split(".")[0]
         img_name = f"{clean_name}_confusion_matrix.png"
         path_img = os.path.join(output_folder, img_name)
-        plt.savefig(path_img)
-        plt.close()
+        fig.savefig(path_img)
+
+        # Save everything needed to score new data: preprocessing (if fitted by main.py), scaler and model
+        path_bundle = os.path.join(output_folder, f"{clean_name}_model.joblib")
+        try:
+            preprocessing = _load_preprocessing(os.path.join(store.processed_folder(filepath), f"{clean_name}_preprocessing.joblib"))
+            save_bundle(
+                path_bundle, clf, scaler, X.columns, target_col,
+                preprocessing=preprocessing, labels=_target_labels(preprocessing, target_col),
+                model_name=best_name, model_params=params, use_smote=use_smote.lower(), metrics_test=metrics_test,
+            )
+            bundle_summary = f"**Modelo guardado en:** `{path_bundle}`"
+        except Exception as e:
+            bundle_summary = f"**Modelo no guardado:** {e}"
         
         return (
-            f"### Rendimiento del Modelo Random Forest\n"
+            f"{leaderboard_summary}"
+            f"{tuning_summary}"
+            f"### Rendimiento del Modelo {best_name}\n"
             f"{process_summary}\n\n"
             f"### Comparativa Train vs Test (Detección Overfitting)\n"
             f"{metrics_table}\n\n"
-            f"**Visualización:** `{path_img}`"
+            f"**Visualización:** `{path_img}`\n"
+            f"{bundle_summary}"
         )
     except Exception as e:
         return f"Error durante el entrenamiento y evaluación del modelo: {e}"
 
 
-# Agent
-modeling_agent = Agent(
-    name="Agente Data Scientist",
-    model=Gemini(id="gemini-2.5-flash", api_key= os.environ["GOOGLE_API_KEY"]),
-    tools=[train_and_test_model],
-    markdown=True,
-    instructions=[
-        "Eres un Data Scientist Senior.",
-        "Tu objetivo es entrenar y evaluar modelos de machine learning correctamente.",
-        "Tu herramienta principal es 'train_and_test_model'.",
-        "Recibe el archivo y la decisión de aplicar balanceo de datos con SMOTE o no aplicar balanceo de datos.",
-        "Si aplicas SMOTE indica que los datos están balanceados con los porcentajes de cada clase. ",
-        "Genera un análisis de las métricas obtenidas comparando con train y test para ver si hay overfitting y concluyendo si el modelo predice bien o no. "
-    ]
-)
\ No newline at end of file
+# Fitted preprocessing pipeline of the dataset, if main.py saved one
+def _load_preprocessing(path):
+    if not os.path.exists(path):
+        return None
+    from utils.preprocessing import load_pipeline
+    return load_pipeline(path)
+
+
+# Original class labels of a label-encoded target (index = code)
+def _target_labels(preprocessing, target_col):
+    if preprocessing is None or preprocessing.named_steps["encoding"] == "passthrough":
+        return None
+    vocabulary = preprocessing.named_steps["encoding"].encoder_.vocabulary
+    return vocabulary[target_col]["levels"] if target_col in vocabulary else None
+
+
+# Agent (built on first use through agents.get_agent)
+def build_agent():
+    from agno.agent import Agent # Tool-first runs only import the tool, not the agent
+    return Agent(
+        name="Agente Data Scientist",
+        model=build_model(),
+        tools=[train_and_test_model],
+        markdown=True,
+        instructions=[
+            "Eres un Data Scientist Senior.",
+            "Tu objetivo es entrenar y evaluar modelos de machine learning correctamente.",
+            "Tu herramienta principal es 'train_and_test_model'.",
+            "La herramienta compara varios modelos con validación cruzada y entrena el mejor. Muestra el leaderboard con los tiempos.",
+            "Si te indican un presupuesto de tiempo para ajustar hiperparámetros, pásalo en 'tune_budget' (segundos) y muestra la mejor configuración y el tiempo empleado.",
+            "Recibe el archivo y la decisión de aplicar balanceo de datos con SMOTE o no aplicar balanceo de datos.",
+            "Si aplicas SMOTE indica que los datos están balanceados con los porcentajes de cada clase. ",
+            "Genera un análisis de las métricas obtenidas comparando con train y test para ver si hay overfitting y concluyendo si el modelo predice bien o no. "
+        ]
+    )
+
+
+# Backwards compatible attribute: `from agents.modeling import modeling_agent` builds the agent on first use
+def __getattr__(name):
+    if name == "modeling_agent":
+        return get_agent("modeling")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
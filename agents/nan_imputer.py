@@ -1,21 +1,24 @@
 import pandas as pd
 import numpy as np
-from sklearn.impute import KNNImputer
-from agno.agent import Agent
-from agno.models.google import Gemini
 from agno.tools import tool
 import os
 from dotenv import load_dotenv
+from agents import build_model, get_agent
+from utils.store import store
+from utils.imputation import knn_impute
 
 # Load environment variables
 load_dotenv()
 
 # This tool applies missing value imputation strategies to a CSV file
 @tool
-def manage_nulls(filepath: str, strategy: str = "drop") -> str:
-    # Read the CSV file and handle potential errors
+def manage_nulls(filepath: str, strategy: str = "drop", n_neighbors: int = 5, sample_size: int = 0, chunksize: int = 0) -> str:
+    # Out-of-core mode: the file is streamed in chunks and never loaded whole
+    if chunksize > 0:
+        return _manage_nulls_chunked(filepath, strategy, chunksize)
+    # Get the dataset from the shared store (or read the CSV file) and handle potential errors
     try:
-        df = pd.read_csv(filepath)
+        df = store.resolve(filepath)
     except FileNotFoundError:
         return f"Error: El archivo '{filepath}' no fue encontrado."
     except pd.errors.EmptyDataError:
@@ -23,12 +26,9 @@ def manage_nulls(filepath: str, strategy: str = "drop") -> str:
     except Exception as e:
         return f"Error leyendo el archivo: {e}"
     
-    # Define output folder
-    output_folder = os.path.join("data", "processed_data")
-    # Extract clean name for output file and path
+    # Extract clean name for the output handle
     clean_name = os.path.basename(filepath).split("_")[0] if "_" in os.path.basename(filepath) else os.path.basename(filepath).split(".")[0]
-    output_filename = f"{clean_name}_no_nulls.csv"
-    destination_path = os.path.join(output_folder, output_filename)
+    output_handle = f"{clean_name}_no_nulls"
     # Store initial number of rows for reporting
     initial_rows = len(df)
         
@@ -37,7 +37,7 @@ def manage_nulls(filepath: str, strategy: str = "drop") -> str:
         if strategy.lower() == "drop":
             df_clean = df.dropna() # Drop rows with any null values
             deleted_rows = initial_rows - len(df_clean)
-            df_clean.to_csv(destination_path, index=False) # Save cleaned DataFrame
+            destination_path = store.put(output_handle, df_clean, parent=filepath) # Register cleaned DataFrame
             if deleted_rows == 0: # If no rows were deleted, inform accordingly
                 return f"Sin nulos. Copia guardada en: {destination_path}"
             return f"Se eliminaron {deleted_rows} filas. Dataset limpio en: {destination_path}"
@@ -47,41 +47,73 @@ def manage_nulls(filepath: str, strategy: str = "drop") -> str:
             df_categorical = df.select_dtypes(exclude=[np.number]) # Select non-numeric columns
             if df_numeric.empty: # Check if there are numeric columns to impute
                 return "No hay columnas numéricas para aplicar KNN."
-            # Apply KNN Imputer
-            imputer = KNNImputer(n_neighbors=5)
-            imputed_matrix = imputer.fit_transform(df_numeric)
-            df_numeric_imputed = pd.DataFrame(imputed_matrix, columns=df_numeric.columns, index=df_numeric.index)
+            # Apply scalable KNN imputation (tree index queried only for rows with nulls)
+            df_numeric_imputed, knn_stats = knn_impute(df_numeric, n_neighbors=n_neighbors, sample_size=sample_size)
+            resources = f"Tiempo KNN: {knn_stats['seconds']:.2f} s | Memoria pico: {knn_stats['peak_mb']:.1f} MB | Filas imputadas: {knn_stats['rows_imputed']} | Donantes: {knn_stats['donors']}"
             df_final = pd.concat([df_numeric_imputed, df_categorical], axis=1) # Combine numeric and categorical data
             # We check if any nulls remain
             total_nulls_remaining = df_final.isnull().sum()
-            # Save the final DataFrame
+            # Register the final DataFrame
             try:
-                df_final.to_csv(destination_path, index=False)
+                destination_path = store.put(output_handle, df_final, parent=filepath)
             except Exception as e:
                 return f"Error guardando el archivo procesado: {e}"
             # Report on remaining nulls
             if total_nulls_remaining.sum() == 0:
-                return f"Imputación KNN realizada exitosamente. No quedan nulos.\nArchivo guardado en: {destination_path}"
+                return f"Imputación KNN realizada exitosamente. No quedan nulos.\nArchivo guardado en: {destination_path}\n{resources}"
             else:
                 return (f"Imputación KNN realizada pero quedan {total_nulls_remaining} valores nulos.\n"
-                        f"Archivo guardado en: {destination_path}")
+                        f"Archivo guardado en: {destination_path}\n{resources}")
         else:
             return ("Estrategia no reconocida. Usa 'drop' o 'knn'.")
     except Exception as e:
         return f"Error durante la imputación: {e}"
         
 
-# Agent
-nan_imputer_agent = Agent(
-    name="Agente de Imputación",
-    model=Gemini(id="gemini-2.5-flash", api_key= os.environ["GOOGLE_API_KEY"]),
-    tools=[manage_nulls],
-    markdown=True,
-    instructions=[
-        "Recibes un archivo.",
-        "Tu herramienta principal es 'manage_nulls'.",
-        "Aplicas la estrategia de limpieza indicada.",
-        "Informas que el resultado se ha guardado en 'data/processed_data'."
-        "Reporta el cambio de dimensiones y resultados."
-    ]
-)
\ No newline at end of file
+# Row-local null handling from file to file, chunk by chunk
+def _manage_nulls_chunked(filepath, strategy, chunksize):
+    from utils.streaming import stream_stage
+
+    if strategy.lower() != "drop":
+        return "La imputación KNN necesita el dataset en memoria. Por bloques solo se admite la estrategia 'drop'."
+    clean_name = os.path.basename(filepath).split("_")[0] if "_" in os.path.basename(filepath) else os.path.basename(filepath).split(".")[0]
+    try:
+        destination_path, stats = stream_stage(filepath, f"{clean_name}_no_nulls", lambda chunk: chunk.dropna(), chunksize)
+    except FileNotFoundError:
+        return f"Error: El archivo '{filepath}' no fue encontrado."
+    except pd.errors.EmptyDataError:
+        return f"Error: El archivo '{filepath}' está vacío."
+    except Exception as e:
+        return f"Error durante la imputación: {e}"
+    deleted_rows = stats["rows_in"] - stats["rows_out"]
+    blocks = f"Procesado por bloques: {stats['chunks']} bloques de hasta {chunksize} filas."
+    if deleted_rows == 0:
+        return f"Sin nulos. Copia guardada en: {destination_path}\n{blocks}"
+    return f"Se eliminaron {deleted_rows} filas. Dataset limpio en: {destination_path}\n{blocks}"
+
+
+# Agent (built on first use through agents.get_agent)
+def build_agent():
+    from agno.agent import Agent # Tool-first runs only import the tool, not the agent
+    return Agent(
+        name="Agente de Imputación",
+        model=build_model(),
+        tools=[manage_nulls],
+        markdown=True,
+        instructions=[
+            "Recibes un archivo.",
+            "Tu herramienta principal es 'manage_nulls'.",
+            "Aplicas la estrategia de limpieza indicada.",
+            "Para datasets muy grandes puedes limitar los donantes de KNN con 'sample_size'.",
+            "Si te indican un 'chunksize', pásalo a la herramienta: el archivo se procesa por bloques sin cargarlo entero (solo con 'drop').",
+            "Informas que el resultado se ha guardado en 'data/processed_data'."
+            "Reporta el cambio de dimensiones y resultados."
+        ]
+    )
+
+
+# Backwards compatible attribute: `from agents.nan_imputer import nan_imputer_agent` builds the agent on first use
+def __getattr__(name):
+    if name == "nan_imputer_agent":
+        return get_agent("nan_imputer")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,28 @@
+from dotenv import load_dotenv
+from agents import build_model, get_agent
+
+# Load environment variables
+load_dotenv()
+
+
+# This agent writes the final report of the tool-first mode: the tools already ran,
+# so a single call turns all their results into the narrative
+# Agent (built on first use through agents.get_agent)
+def build_agent():
+    from agno.agent import Agent # agno is only imported when the narration is requested
+    return Agent(
+        name="Agente Narrador",
+        model=build_model(),
+        markdown=True,
+        description="Eres un Data Scientist Senior que redacta el informe final de un pipeline AutoML.",
+        instructions=[
+            "Recibes en JSON los resultados de todas las etapas del pipeline, ya ejecutadas: calidad, plan del Director, nulos, outliers, encoding y modelado.",
+            "Redacta un único informe en markdown con una sección por etapa, en ese orden.",
+            "En la calidad indica si hay valores nulos y outliers, cuántas y cuáles son las columnas categóricas y si hay desbalanceo (una clase < 40%).",
+            "Explica las decisiones del Director y lo que cambió cada etapa (filas eliminadas, valores imputados, columnas creadas).",
+            "Muestra el leaderboard de modelos con sus tiempos y la comparativa train vs test.",
+            "Si SMOTE se aplicó, indica que los datos de train están balanceados con los porcentajes de cada clase.",
+            "Concluye si hay overfitting y si el modelo predice bien o no.",
+            "No inventes cifras: usa solo las de los resultados.",
+        ]
+    )
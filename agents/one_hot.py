@@ -1,19 +1,23 @@
 import pandas as pd
 import os
-from agno.agent import Agent
-from agno.models.google import Gemini
 from agno.tools import tool
 from dotenv import load_dotenv
+from agents import build_model, get_agent
+from utils.store import store
+from utils.encoding import CategoricalEncoder
 
 # Load environment variables
 load_dotenv()
 
 
 @tool
-def apply_dummies(filepath: str) -> str:
-    # Read the CSV file and handle potential errors
+def apply_dummies(filepath: str, max_levels: int = 0, min_frequency: int = 0, sparse: bool = False, vocabulary: str = "", chunksize: int = 0) -> str:
+    # Out-of-core mode: vocabulary counted in a streaming pass, then the file is encoded chunk by chunk
+    if chunksize > 0:
+        return _apply_dummies_chunked(filepath, max_levels, min_frequency, vocabulary, chunksize)
+    # Get the dataset from the shared store (or read the CSV file) and handle potential errors
     try:
-        df = pd.read_csv(filepath)
+        df = store.resolve(filepath)
     except FileNotFoundError:
         return f"Error: El archivo '{filepath}' no fue encontrado."
     except pd.errors.EmptyDataError:
@@ -25,28 +29,31 @@ def apply_dummies(filepath: str) -> str:
     cols_cat = df.select_dtypes(include=['object', 'category']).columns.tolist()
     if not cols_cat:
         return "No se encontraron columnas categóricas para transformar."
-    # Initialize final DataFrame without categorical columns
-    df_final = df.drop(columns=cols_cat)
+    # We assume the target variable is the last column
+    target_col = df.columns[-1]
 
-    # Apply one-hot encoding
+    # Define output handle and vocabulary path
+    clean_name = os.path.basename(filepath).split("_")[0] if "_" in os.path.basename(filepath) else os.path.basename(filepath).split(".")[0]
+    output_handle = f"{clean_name}_encoded"
+    vocabulary_path = os.path.join(store.processed_folder(filepath), f"{clean_name}_vocabulary.json")
+
+    # Apply one-hot encoding of all categorical columns in one shot (uint8 or sparse)
     try:
-        # Create dummies for each categorical column and concatenate to final DataFrame
-        for col in cols_cat:
-            dummies = pd.get_dummies(df[col], drop_first=True, dtype=int)
-            dummies.columns = [col]
-            df_final = pd.concat([df_final, dummies], axis=1)
+        if vocabulary:
+            # Reuse a previously fitted vocabulary
+            encoder = CategoricalEncoder.load(vocabulary)
+            vocabulary_path = vocabulary
+        else:
+            encoder = CategoricalEncoder(max_levels=max_levels, min_frequency=min_frequency)
+            encoder.fit(df, cols_cat, target=target_col if target_col in cols_cat else None)
+            encoder.save(vocabulary_path)
+        df_final = encoder.transform(df, sparse=sparse)
     except Exception as e:
         return f"Error durante la transformación a variables numéricas: {e}"
 
-    # Define output folder and path
-    output_folder = os.path.join("data", "processed_data")
-    clean_name = os.path.basename(filepath).split("_")[0] if "_" in os.path.basename(filepath) else os.path.basename(filepath).split(".")[0]
-    output_name = f"{clean_name}_encoded.csv"
-    output_path = os.path.join(output_folder, output_name)
-
-    # Save the final DataFrame
+    # Register the final DataFrame
     try:
-        df_final.to_csv(output_path, index=False)
+        output_path = store.put(output_handle, df_final, parent=filepath)
     except Exception as e:
         return f"Error guardando el archivo procesado: {e}"
     
@@ -60,19 +67,69 @@ def apply_dummies(filepath: str) -> str:
         f"- **Columnas originales:** {cols_before}\n"
         f"- **Columnas finales:** {cols_after} (Crecimiento: +{new_cols})\n"
         f"- **Variables transformadas:** {cols_cat}\n"
-        f"- **Archivo guardado en:** `{output_path}`"
+        f"- **Archivo guardado en:** `{output_path}`\n"
+        f"- **Vocabulario:** `{vocabulary_path}`"
+    )
+
+
+# One-hot encoding from file to file, chunk by chunk (always dense: the output is a CSV)
+def _apply_dummies_chunked(filepath, max_levels, min_frequency, vocabulary, chunksize):
+    from sklearn.pipeline import Pipeline
+    from utils.preprocessing import DummiesEncoder
+    from utils.streaming import fit_chunked, source_path, stream_stage
+
+    clean_name = os.path.basename(filepath).split("_")[0] if "_" in os.path.basename(filepath) else os.path.basename(filepath).split(".")[0]
+    vocabulary_path = os.path.join(store.processed_folder(filepath), f"{clean_name}_vocabulary.json")
+    step = DummiesEncoder(max_levels=max_levels, min_frequency=min_frequency)
+    try:
+        if vocabulary:
+            # Reuse a previously fitted vocabulary
+            step.encoder_ = CategoricalEncoder.load(vocabulary)
+            vocabulary_path = vocabulary
+        else:
+            fit_chunked(Pipeline([("encoding", step)]), source_path(filepath), chunksize)
+            if not step.encoder_.vocabulary:
+                return "No se encontraron columnas categóricas para transformar."
+            step.encoder_.save(vocabulary_path)
+        output_path, stats = stream_stage(filepath, f"{clean_name}_encoded", step.transform, chunksize)
+    except FileNotFoundError:
+        return f"Error: El archivo '{filepath}' no fue encontrado."
+    except pd.errors.EmptyDataError:
+        return f"Error: El archivo '{filepath}' está vacío."
+    except Exception as e:
+        return f"Error durante la transformación a variables numéricas: {e}"
+
+    return (
+        f"### Transformación a datos numérico (dummies) completada (por bloques)\n"
+        f"- **Columnas originales:** {stats['cols_in']}\n"
+        f"- **Columnas finales:** {stats['cols_out']} (Crecimiento: +{stats['cols_out'] - stats['cols_in']})\n"
+        f"- **Variables transformadas:** {list(step.encoder_.vocabulary)}\n"
+        f"- **Bloques:** {stats['chunks']} de hasta {chunksize} filas\n"
+        f"- **Archivo guardado en:** `{output_path}`\n"
+        f"- **Vocabulario:** `{vocabulary_path}`"
+    )
+
+
+# Agent (built on first use through agents.get_agent)
+def build_agent():
+    from agno.agent import Agent # Tool-first runs only import the tool, not the agent
+    return Agent(
+        name="Agente de One-hot Encoding",
+        model=build_model(),
+        tools=[apply_dummies],
+        markdown=True,
+        instructions=[
+            "Eres un ingeniero de datos experto en preprocesamiento.",
+            "Tu objetivo es preparar los datos para que sean 100% numéricos.",
+            "Recibe un archivo, aplica 'apply_dummies' y reporta el cambio de dimensiones y los resultados.",
+            "Si hay columnas con muchas categorías puedes agrupar las poco frecuentes con 'max_levels' o 'min_frequency'.",
+            "Si te indican un 'chunksize', pásalo a la herramienta: el archivo se procesa por bloques sin cargarlo entero."
+        ]
     )
 
 
-# Agent
-one_hot_agent = Agent(
-    name="Agente de One-hot Encoding",
-    model=Gemini(id="gemini-2.5-flash", api_key= os.environ["GOOGLE_API_KEY"]),
-    tools=[apply_dummies],
-    markdown=True,
-    instructions=[
-        "Eres un ingeniero de datos experto en preprocesamiento.",
-        "Tu objetivo es preparar los datos para que sean 100% numéricos.",
-        "Recibe un archivo, aplica 'apply_dummies' y reporta el cambio de dimensiones y los resultados."
-    ]
-)
\ No newline at end of file
+# Backwards compatible attribute: `from agents.one_hot import one_hot_agent` builds the agent on first use
+def __getattr__(name):
+    if name == "one_hot_agent":
+        return get_agent("one_hot")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,20 +1,24 @@
 import pandas as pd
 import numpy as np
 import os
-from agno.agent import Agent
-from agno.models.google import Gemini
 from agno.tools import tool
 from dotenv import load_dotenv
+from agents import build_model, get_agent
+from utils.store import store
+from utils.profiling import iqr_bounds
 
 # Load environment variables
 load_dotenv()
 
 # This tool manages outliers in a CSV file using specified strategies
 @tool
-def manage_outliers(filepath: str, strategy: str = "drop", column: str = "all") -> str:
-    # Read the CSV file and handle potential errors
+def manage_outliers(filepath: str, strategy: str = "drop", column: str = "all", mode: str = "vectorized", chunksize: int = 0) -> str:
+    # Out-of-core mode: bounds from a streaming pass, then the file is rewritten chunk by chunk
+    if chunksize > 0:
+        return _manage_outliers_chunked(filepath, strategy, column, chunksize)
+    # Get the dataset from the shared store (or read the CSV file) and handle potential errors
     try:
-        df = pd.read_csv(filepath)
+        df = store.resolve(filepath)
     except FileNotFoundError:
         return f"Error: El archivo '{filepath}' no fue encontrado."
     except pd.errors.EmptyDataError:
@@ -28,6 +32,9 @@ def manage_outliers(filepath: str, strategy: str = "drop", column: str = "all")
     # Validate strategy
     if strategy.lower() not in ["drop", "capping"]:
         return f"Estrategia '{strategy}' no soportada. Usa 'drop' o 'capping'."
+    # Validate mode
+    if mode.lower() not in ["vectorized", "sequential"]:
+        return f"Modo '{mode}' no soportado. Usa 'vectorized' o 'sequential'."
     
     # Determine columns to process
     if column == "all":
@@ -46,43 +53,60 @@ def manage_outliers(filepath: str, strategy: str = "drop", column: str = "all")
     total_outliers_found = 0
         
     try:
-        # Process each column and manage outliers
-        for col_name in cols_to_check:
-            # Calculate IQR
-            Q1 = df[col_name].quantile(0.25)
-            Q3 = df[col_name].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
+        if mode.lower() == "vectorized":
+            # All IQR bounds computed at once on the original data (independent of column order)
+            numeric_block = df[cols_to_check].to_numpy(dtype=np.float64, na_value=np.nan)
+            lower_bounds, upper_bounds = iqr_bounds(numeric_block)
+            mask_outliers = (numeric_block < lower_bounds) | (numeric_block > upper_bounds)
+            total_outliers_found = int(mask_outliers.sum())
+
+            if strategy.lower() == "drop":
+                df = df[~mask_outliers.any(axis=1)] # Single combined row mask
+            elif strategy.lower() == "capping":
+                capped = df[cols_to_check].clip(
+                    lower=pd.Series(lower_bounds, index=cols_to_check),
+                    upper=pd.Series(upper_bounds, index=cols_to_check),
+                    axis=1,
+                )
+                df = df.copy()
+                df[cols_to_check] = capped # Single clip over the numeric block
+        else:
+            # Legacy mode: columns processed one after another on a copy of the shared DataFrame
+            df = df.copy()
+            for col_name in cols_to_check:
+                # Calculate IQR
+                Q1 = df[col_name].quantile(0.25)
+                Q3 = df[col_name].quantile(0.75)
+                IQR = Q3 - Q1
+                lower_bound = Q1 - 1.5 * IQR
+                upper_bound = Q3 + 1.5 * IQR
             
-            # Identify outliers
-            mask_outliers = (df[col_name] < lower_bound) | (df[col_name] > upper_bound)
-            num_outliers = mask_outliers.sum()
+                # Identify outliers
+                mask_outliers = (df[col_name] < lower_bound) | (df[col_name] > upper_bound)
+                num_outliers = mask_outliers.sum()
             
-            # if outliers found, take action. If none, skip
-            if num_outliers > 0:
-                total_outliers_found += num_outliers
+                # if outliers found, take action. If none, skip
+                if num_outliers > 0:
+                    total_outliers_found += num_outliers
                 
-                if strategy.lower() == "drop":
+                    if strategy.lower() == "drop":
                     
-                    df = df[~mask_outliers] # Drop outlier rows (~ is negation)
+                        df = df[~mask_outliers] # Drop outlier rows (~ is negation)
                 
-                elif strategy.lower() == "capping":
+                    elif strategy.lower() == "capping":
                     
-                    df.loc[df[col_name] < lower_bound, col_name] = lower_bound
-                    df.loc[df[col_name] > upper_bound, col_name] = upper_bound
+                        df.loc[df[col_name] < lower_bound, col_name] = lower_bound
+                        df.loc[df[col_name] > upper_bound, col_name] = upper_bound
     except Exception as e:
         return f"Error durante la gestión de outliers: {e}"
 
-    # Save the processed DataFrame
-    output_folder = os.path.join("data", "processed_data")
+    # Register the processed DataFrame
     clean_name = os.path.basename(filepath).split("_")[0] if "_" in os.path.basename(filepath) else os.path.basename(filepath).split(".")[0]
-    output_name = f"{clean_name}_no_outliers.csv"
-    output_path = os.path.join(output_folder, output_name)
+    output_handle = f"{clean_name}_no_outliers"
     
-    # Attempt to save the DataFrame to a CSV file
+    # Attempt to register the DataFrame (and its CSV snapshot)
     try:
-        df.to_csv(output_path, index=False)
+        output_path = store.put(output_handle, df, parent=filepath)
     except Exception as e:
         return f"Error guardando el archivo procesado: {e}"
     
@@ -106,17 +130,78 @@ def manage_outliers(filepath: str, strategy: str = "drop", column: str = "all")
     )
 
 
-# Agent
-outlier_agent = Agent(
-    name="Agente de Outliers",
-    model=Gemini(id="gemini-2.5-flash", api_key= os.environ["GOOGLE_API_KEY"]),
-    tools=[manage_outliers],
-    markdown=True,
-    instructions=[
-        "Eres un experto estadístico encargado de limpiar datos atípicos.",
-        "Tu herramienta principal es 'manage_outliers'.",
-        "Si el usuario no especifica qué hacer, usa la estrategia 'drop' por defecto.",
-        "Si el usuario pide 'suavizar' o 'mantener datos', usa la estrategia 'capping'."
-        "Reporta el cambio de dimensiones y resultados."
-    ]
-)
\ No newline at end of file
+# Vectorized IQR handling from file to file: exact bounds fitted by chunks, then applied by chunks
+def _manage_outliers_chunked(filepath, strategy, column, chunksize):
+    from sklearn.pipeline import Pipeline
+    from utils.preprocessing import OutlierHandler
+    from utils.streaming import fit_chunked, source_path, stream_stage, train_transform
+
+    if strategy.lower() not in ["drop", "capping"]:
+        return f"Estrategia '{strategy}' no soportada. Usa 'drop' o 'capping'."
+    handler = OutlierHandler(strategy.lower())
+    try:
+        fit_chunked(Pipeline([("outliers", handler)]), source_path(filepath), chunksize)
+    except FileNotFoundError:
+        return f"Error: El archivo '{filepath}' no fue encontrado."
+    except pd.errors.EmptyDataError:
+        return f"Error: El archivo '{filepath}' está vacío."
+    except Exception as e:
+        return f"Error durante la gestión de outliers: {e}"
+    if column != "all":
+        # The bounds of a column do not depend on the others
+        if column not in handler.columns_:
+            return f"La columna '{column}' no existe o no es numérica y no puede analizarse con IQR."
+        handler.columns_ = [column]
+        handler.lower_, handler.upper_ = handler.lower_[[column]], handler.upper_[[column]]
+    if not handler.columns_:
+        return "No hay columnas numéricas para analizar outliers."
+
+    found = {"outliers": 0}
+    def apply(chunk):
+        found["outliers"] += int(handler.outliers(chunk).sum())
+        return train_transform(handler, chunk)
+
+    clean_name = os.path.basename(filepath).split("_")[0] if "_" in os.path.basename(filepath) else os.path.basename(filepath).split(".")[0]
+    try:
+        output_path, stats = stream_stage(filepath, f"{clean_name}_no_outliers", apply, chunksize)
+    except Exception as e:
+        return f"Error durante la gestión de outliers: {e}"
+    if strategy.lower() == "drop":
+        action_summary = f"Se eliminaron **{stats['rows_in'] - stats['rows_out']}** filas."
+    else:
+        action_summary = f"Se suavizaron los valores extremos. Filas mantenidas: {stats['rows_out']}."
+    return (
+        f"### Reporte de Outliers (Método IQR, por bloques)\n"
+        f"- **Columnas analizadas:** {len(handler.columns_)}\n"
+        f"- **Estrategia:** {strategy.upper()}\n"
+        f"- **Outliers detectados (Total):** {found['outliers']}\n"
+        f"- **Acción:** {action_summary}\n"
+        f"- **Bloques:** {stats['chunks']} de hasta {chunksize} filas\n"
+        f"- **Archivo guardado en:** `{output_path}`"
+    )
+
+
+# Agent (built on first use through agents.get_agent)
+def build_agent():
+    from agno.agent import Agent # Tool-first runs only import the tool, not the agent
+    return Agent(
+        name="Agente de Outliers",
+        model=build_model(),
+        tools=[manage_outliers],
+        markdown=True,
+        instructions=[
+            "Eres un experto estadístico encargado de limpiar datos atípicos.",
+            "Tu herramienta principal es 'manage_outliers'.",
+            "Si el usuario no especifica qué hacer, usa la estrategia 'drop' por defecto.",
+            "Si el usuario pide 'suavizar' o 'mantener datos', usa la estrategia 'capping'.",
+            "Si te indican un 'chunksize', pásalo a la herramienta: el archivo se procesa por bloques sin cargarlo entero.",
+            "Reporta el cambio de dimensiones y resultados."
+        ]
+    )
+
+
+# Backwards compatible attribute: `from agents.outliers import outlier_agent` builds the agent on first use
+def __getattr__(name):
+    if name == "outlier_agent":
+        return get_agent("outliers")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
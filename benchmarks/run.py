@@ -0,0 +1,255 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+from utils.tracing import PeakRSS
+
+RESULTS_FOLDER = os.path.join("benchmarks", "results")
+
+# (rows, columns) of every preset. The column counts cover Bullying1.csv (17) up to very wide extracts
+PRESETS = {
+    "small": [(1_000, 17), (10_000, 17), (10_000, 100)],
+    "medium": [(100_000, 17), (100_000, 500), (10_000, 5_000)],
+    "large": [(1_000_000, 17), (10_000_000, 17), (100_000, 5_000)],
+}
+
+STAGES = ["load", "quality", "plan", "no_nulls", "no_outliers", "encoded", "preprocess", "model"]
+
+
+def run_scenario(name, n_rows, n_cols, rates, stages, workdir, snapshots=False, fused=False):
+    """
+    Runs the pipeline stages on one synthetic dataset through the stub model.
+    Meant to run in a fresh process, so that memory peaks are not inherited.
+
+    Args:
+        name (str): Scenario name.
+        n_rows (int): Rows of the dataset.
+        n_cols (int): Columns of the dataset.
+        rates (dict): null_rate, outlier_rate, minority_rate and cat_levels.
+        stages (list): Stages to run (see STAGES); the rest are skipped.
+        workdir (str): Folder for the dataset and the stage outputs.
+        snapshots (bool): Also write the CSV snapshots of every stage.
+        fused (bool): Run nulls, outliers and encoding as one compiled pipeline ('preprocess' stage).
+
+    Returns:
+        dict: Scenario description and, per stage, seconds, peak RSS and rows per second.
+    """
+    # The stub model runs the same tools as Gemini, offline and deterministically
+    os.environ["AGENT_MODEL"] = "stub"
+    from benchmarks.synthetic import write_dataset
+    from agents import get_agent
+    from agents.director import plan_strategy
+    from utils.profiling import profile_dataframe
+    from utils.store import store
+    from utils.utils import retry
+    from main import PROMPTS
+
+    processed_folder = os.path.join(workdir, name, "processed_data")
+    clean_folder = os.path.join(workdir, name, "clean_data")
+    os.makedirs(processed_folder, exist_ok=True)
+    os.makedirs(clean_folder, exist_ok=True)
+    path = os.path.join(workdir, name, f"{name}.csv")
+    start = time.perf_counter()
+    write_dataset(path, n_rows, n_cols, **rates)
+    result = {
+        "name": name, "rows": n_rows, "cols": n_cols, **rates,
+        "csv_mb": os.path.getsize(path) / 1024 ** 2,
+        "generate_s": time.perf_counter() - start,
+        "stages": {},
+    }
+    store.snapshots = snapshots
+
+    def measure(stage, function, ref):
+        if stage not in stages:
+            return None
+        # Throughput is measured on the rows the stage receives
+        rows = store.get(ref).shape[0] if store.exists(ref) else n_rows
+        with PeakRSS(children=True) as rss: # Model selection trains in loky worker processes
+            start = time.perf_counter()
+            output = function()
+            seconds = time.perf_counter() - start
+        result["stages"][stage] = {
+            "seconds": seconds,
+            "peak_rss_mb": rss.peak_mb,
+            "rows_per_s": rows / seconds if seconds > 0 else None,
+        }
+        return output
+
+    load = lambda: store.load(path, handle=name, processed_folder=processed_folder, clean_folder=clean_folder)
+    if measure("load", load, name) is None:
+        load()
+    measure("quality", lambda: retry("run", get_agent("quality"), PROMPTS["quality_report"].format(filename=name)), name)
+    plan_of = lambda: plan_strategy(profile_dataframe(store.get(name), name)).model_dump()
+    plan = measure("plan", plan_of, name) or plan_of()
+    result["plan"] = plan
+
+    # Same order and prompts as main.run_pipeline; every stage continues from the last registered dataset
+    steps = [
+        ("no_nulls", "nan_imputer", "nan", plan["null_strategy"] != "skip", {"action": plan["null_strategy"]}),
+        ("no_outliers", "outliers", "outliers", plan["outliers_strategy"] != "skip", {"action": plan["outliers_strategy"]}),
+        ("encoded", "one_hot", "one_hot", plan["encoding_strategy"] == "get_dummies", {}),
+    ]
+    current = name
+    if fused:
+        from main import run_fused
+        steps = []
+        if measure("preprocess", lambda: run_fused(name, name, plan), name) is not None:
+            current = f"{name}_preprocessed"
+    for stage, agent, prompt, enabled, fields in steps:
+        if not enabled:
+            continue
+        prompt_text = PROMPTS[prompt].format(filename=current, **fields)
+        measure(stage, lambda: retry("run", get_agent(agent), prompt_text), current)
+        if store.exists(f"{name}_{stage}"):
+            current = f"{name}_{stage}"
+    prompt_text = PROMPTS["modeling"].format(filename=current, plan=plan["use_smote"])
+    measure("model", lambda: retry("run", get_agent("modeling"), prompt_text), current)
+    store.wait()
+
+    result["total_s"] = sum(stage["seconds"] for stage in result["stages"].values())
+    return result
+
+
+def environment():
+    """Versions and hardware the results were measured on."""
+    import numpy, pandas, sklearn
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Compares the stage times of two benchmark runs.
+
+    Args:
+        results (dict): Current run.
+        baseline (dict): Previous run (same JSON format).
+        tolerance (float): Relative slowdown tolerated before flagging a regression.
+
+    Returns:
+        list: (scenario, stage, baseline s, current s, ratio, regression) for every stage in both runs.
+    """
+    previous = {scenario["name"]: scenario for scenario in baseline.get("scenarios", [])}
+    rows = []
+    for scenario in results["scenarios"]:
+        base = previous.get(scenario["name"])
+        if base is None:
+            continue
+        for stage, current in scenario["stages"].items():
+            before = base["stages"].get(stage)
+            if before is None or not before["seconds"]:
+                continue
+            ratio = current["seconds"] / before["seconds"]
+            rows.append((scenario["name"], stage, before["seconds"], current["seconds"], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def print_results(results, comparison=None):
+    """Prints the stage times (and the comparison with a baseline) as tables."""
+    from rich.console import Console
+    from rich.table import Table
+
+    console = Console()
+    table = Table(title=f"Benchmark ({results['environment']['commit'] or 'sin commit'})")
+    for column in ["Escenario", "Etapa", "Tiempo (s)", "Pico RSS (MB)", "Filas/s"]:
+        table.add_column(column)
+    for scenario in results["scenarios"]:
+        for stage, values in scenario["stages"].items():
+            throughput = f"{values['rows_per_s']:,.0f}" if values["rows_per_s"] else "-"
+            table.add_row(scenario["name"], stage, f"{values['seconds']:.3f}", f"{values['peak_rss_mb']:.0f}", throughput)
+    console.print(table)
+    if comparison:
+        table = Table(title="Comparación con la línea base")
+        for column in ["Escenario", "Etapa", "Base (s)", "Actual (s)", "Ratio"]:
+            table.add_column(column)
+        for name, stage, before, current, ratio, regression in comparison:
+            style = "red" if regression else ("green" if ratio < 1 else None)
+            table.add_row(name, stage, f"{before:.3f}", f"{current:.3f}", f"{ratio:.2f}x", style=style)
+        console.print(table)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline del pipeline (modelo stub y datasets sintéticos)")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small",
+                        help="Conjunto de tamaños a medir (por defecto 'small').")
+    parser.add_argument("--rows", default="", help="Filas separadas por comas (sustituye al preset), p. ej. 1000,100000.")
+    parser.add_argument("--cols", default="17", help="Columnas separadas por comas, usadas con --rows (por defecto 17).")
+    parser.add_argument("--null-rate", type=float, default=0.05, help="Proporción de nulos en las columnas con nulos.")
+    parser.add_argument("--outlier-rate", type=float, default=0.01, help="Proporción de outliers en cada columna numérica.")
+    parser.add_argument("--minority-rate", type=float, default=0.35, help="Proporción de la clase minoritaria.")
+    parser.add_argument("--cat-levels", type=int, default=2, help="Niveles de cada variable categórica.")
+    parser.add_argument("--skip", default="", help=f"Etapas a omitir, separadas por comas ({', '.join(STAGES)}).")
+    parser.add_argument("--snapshots", action="store_true", help="Escribe también las copias de cada etapa en disco.")
+    parser.add_argument("--fused", action="store_true", help="Mide el preprocesado compilado en un solo pipeline (main.py --fused).")
+    parser.add_argument("--output", default="", help="Archivo JSON de resultados (por defecto benchmarks/results/<fecha>.json).")
+    parser.add_argument("--compare", default="", help="JSON de una ejecución anterior con la que comparar.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Ralentización tolerada antes de marcar una regresión.")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Termina con código 1 si hay regresiones.")
+    parser.add_argument("--keep", action="store_true", help="No borra los datasets y salidas generados.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.rows:
+        sizes = [(int(r), int(c)) for r in args.rows.split(",") for c in args.cols.split(",")]
+    else:
+        sizes = PRESETS[args.preset]
+    skipped = {stage.strip() for stage in args.skip.split(",") if stage.strip()}
+    stages = [stage for stage in STAGES if stage not in skipped]
+    rates = {"null_rate": args.null_rate, "outlier_rate": args.outlier_rate,
+             "minority_rate": args.minority_rate, "cat_levels": args.cat_levels}
+
+    workdir = tempfile.mkdtemp(prefix="automl-bench-")
+    results = {"environment": environment(), "rates": rates, "scenarios": []}
+    try:
+        for n_rows, n_cols in sizes:
+            name = f"r{n_rows}c{n_cols}"
+            print(f"Escenario {name}...")
+            # A fresh process per scenario: memory peaks and caches are not shared
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                scenario = pool.submit(run_scenario, name, n_rows, n_cols, rates, stages, workdir, args.snapshots, args.fused).result()
+            results["scenarios"].append(scenario)
+            print(f"  {scenario['total_s']:.2f} s")
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_FOLDER, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    comparison = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            comparison = compare(results, json.load(f), args.tolerance)
+    print_results(results, comparison)
+    print(f"Resultados guardados en {output}")
+    if args.fail_on_regression and comparison and any(row[-1] for row in comparison):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
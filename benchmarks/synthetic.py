@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+# Column mix of Bullying1.csv: 11 float, 3 int and 2 binary categorical features, plus a Si/No target
+FLOAT_SHARE = 11 / 16
+INT_SHARE = 3 / 16
+# Share of the numeric columns that contain nulls (2 of 14 in Bullying1.csv)
+NULL_COLUMNS_SHARE = 2 / 14
+
+
+def column_layout(n_cols):
+    """
+    Names and kinds of the columns of a synthetic dataset.
+
+    Args:
+        n_cols (int): Total number of columns, target included (>= 2).
+
+    Returns:
+        list: (name, kind) pairs with kind 'float', 'int', 'cat' or 'target'; the target is last.
+    """
+    n_features = max(n_cols - 1, 1)
+    n_float = max(1, round(n_features * FLOAT_SHARE))
+    n_int = min(round(n_features * INT_SHARE), n_features - n_float)
+    n_cat = n_features - n_float - n_int
+    layout = [(f"num_{i}", "float") for i in range(n_float)]
+    layout += [(f"int_{i}", "int") for i in range(n_int)]
+    layout += [(f"cat_{i}", "cat") for i in range(n_cat)]
+    layout.append(("target", "target"))
+    return layout
+
+
+def make_dataset(n_rows, n_cols=17, null_rate=0.05, outlier_rate=0.01, minority_rate=0.35, cat_levels=2, seed=0):
+    """
+    Synthetic dataset shaped like Bullying1.csv.
+
+    Args:
+        n_rows (int): Number of rows.
+        n_cols (int): Number of columns, target included (default 17 like Bullying1.csv).
+        null_rate (float): Share of nulls in the columns with nulls (default 0.05).
+        outlier_rate (float): Share of extreme values in every numeric column (default 0.01).
+        minority_rate (float): Share of the minority class 'Si' in the target (default 0.35).
+        cat_levels (int): Levels of every categorical feature (default 2).
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: The dataset, with the target as last column.
+    """
+    rng = np.random.default_rng(seed)
+    layout = column_layout(n_cols)
+    numeric = [name for name, kind in layout if kind in ("float", "int")]
+    null_columns = set(numeric[:max(1, round(len(numeric) * NULL_COLUMNS_SHARE))]) if null_rate > 0 else set()
+    levels = np.array([f"nivel_{i}" for i in range(max(cat_levels, 2))], dtype=object)
+
+    data = {}
+    for name, kind in layout:
+        if kind == "float":
+            values = np.round(rng.uniform(0, 10, n_rows), 1)
+        elif kind == "int":
+            values = rng.integers(0, 13, n_rows).astype(np.float64)
+        elif kind == "cat":
+            data[name] = levels[rng.integers(0, len(levels), n_rows)]
+            continue
+        else:
+            data[name] = np.where(rng.random(n_rows) < minority_rate, "Si", "No").astype(object)
+            continue
+        if outlier_rate > 0:
+            # Far outside the IQR fences of a uniform 0-10 column
+            outliers = rng.random(n_rows) < outlier_rate
+            values[outliers] = values[outliers] * 10 + 50
+        if name in null_columns:
+            values[rng.random(n_rows) < null_rate] = np.nan
+        # Integer columns without nulls keep their integer type, like in Bullying1.csv
+        data[name] = values.astype(np.int64) if kind == "int" and name not in null_columns else values
+    return pd.DataFrame(data)
+
+
+def write_dataset(path, n_rows, n_cols=17, chunk_rows=1_000_000, seed=0, **rates):
+    """
+    Writes a synthetic dataset to CSV in chunks, so that datasets larger than
+    memory can be generated.
+
+    Args:
+        path (str): Destination CSV path.
+        n_rows (int): Number of rows.
+        n_cols (int): Number of columns, target included.
+        chunk_rows (int): Rows generated per chunk.
+        seed (int): Random seed; every chunk uses its own derived seed.
+        **rates: null_rate, outlier_rate, minority_rate and cat_levels of make_dataset.
+
+    Returns:
+        str: The path.
+    """
+    chunk_rows = max(1, min(chunk_rows, max(1, 50_000_000 // max(n_cols, 1))))
+    written = 0
+    chunk = 0
+    while written < n_rows or chunk == 0:
+        rows = min(chunk_rows, n_rows - written)
+        df = make_dataset(rows, n_cols, seed=seed + chunk, **rates)
+        df.to_csv(path, mode="w" if chunk == 0 else "a", header=chunk == 0, index=False)
+        written += rows
+        chunk += 1
+    return path
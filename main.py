@@ -1,15 +1,29 @@
 import os
-import shutil
+import re
 import json
-from agents.quality import quality_agent
-from agents.nan_imputer import nan_imputer_agent
-from agents.outliers import outlier_agent
-from agents.one_hot import one_hot_agent
-from agents.modeling import modeling_agent
-from agents.director import strategy_agent
-from utils.utils import retry
+import glob
+import time
+import asyncio
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from agents import get_agent, get_tool
+from agents.director import plan_strategy
+from utils import profiling
+from utils.profiling import profile_dataframe, profile_csv_chunked
+from utils.loader import loader
+from utils.incremental import state_path, record_build, refresh, refresh_markdown
+from utils.store import store, PROCESSED_FOLDER, CLEAN_FOLDER
+from utils.llm_cache import ResponseCache
+from utils.stage_cache import StageCache
+from utils.scheduler import scheduler
+from utils.tracing import tracer
+from utils.utils import retry, call_tool
 from utils.utils import clear_old_data
 from dotenv import load_dotenv
+from rich.console import Console
+from rich.table import Table
+from rich.markdown import Markdown
 
 # Load environment variables
 load_dotenv()
@@ -20,15 +34,511 @@ PROMPT_PATH = os.path.join(os.path.dirname(__file__), "config", "prompts.json")
 with open(PROMPT_PATH, "r", encoding="utf-8") as f:
     PROMPTS = json.load(f)
 
+# Background narrations of the tool-first mode (their model requests still go through the scheduler)
+NARRATION = ThreadPoolExecutor(max_workers=4, thread_name_prefix="narration")
+
+# Command line arguments
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sistema Multiagente AutoML")
+    parser.add_argument("--llm-director", action="store_true",
+                        help="Usa el Director LLM en lugar del planificador local de reglas.")
+    parser.add_argument("--no-snapshots", action="store_true",
+                        help="No escribe copias intermedias en data/processed_data.")
+    parser.add_argument("--artifact-format", choices=["parquet", "feather", "csv"], default="",
+                        help="Formato de los archivos de data/processed_data y data/clean_data: 'parquet' (comprimido, por defecto si pyarrow está instalado), 'feather' (lectura mapeada en memoria) o 'csv'.")
+    parser.add_argument("--chunksize", type=int, default=0,
+                        help="Genera el reporte de calidad leyendo el .csv por bloques de N filas (memoria acotada).")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="Ejecuta nulos (drop), outliers y encoding por bloques de --chunksize filas (100000 por defecto), de archivo a archivo y sin cargar el dataset en memoria; solo el modelado lo carga. Con imputación KNN estas etapas se ejecutan en memoria.")
+    parser.add_argument("--tune-budget", type=float, default=0,
+                        help="Ajusta los hiperparámetros del mejor modelo con successive halving durante un máximo de N segundos (por defecto no se ajustan).")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Si hay un modelo de una ejecución anterior del dataset, procesa solo las filas añadidas al .csv desde entonces y actualiza el modelo con warm start. Si detecta drift, reconstruye todo.")
+    parser.add_argument("--ignore-drift", action="store_true",
+                        help="Con --refresh, actualiza el modelo aunque se detecte drift.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="No reutiliza respuestas de Gemini guardadas en data/cache/llm.")
+    parser.add_argument("--no-stage-cache", action="store_true",
+                        help="Recalcula todas las etapas aunque su resultado esté en data/cache/stages.")
+    parser.add_argument("--stage-cache-mb", type=float, default=2048,
+                        help="Tamaño máximo (MB) de data/cache/stages; al superarlo se borran las etapas usadas hace más tiempo (por defecto 2048).")
+    parser.add_argument("--profile-tokens", type=int, default=0,
+                        help="Presupuesto de tokens del perfil de calidad JSON que reciben los agentes (por defecto 2000 o PROFILE_MAX_TOKENS).")
+    parser.add_argument("--batch", default="",
+                        help="Procesa todos los .csv de una carpeta o patrón glob (p. ej. 'data/raw/*.csv') en paralelo.")
+    parser.add_argument("--jobs", type=int, default=4,
+                        help="Número de datasets procesados a la vez en modo batch (por defecto 4).")
+    parser.add_argument("--fused", action="store_true",
+                        help="Compila el plan del Director en un único pipeline de preprocesado (nulos, outliers y encoding en una pasada, sin agentes) y lo guarda para reutilizarlo.")
+    parser.add_argument("--speculate", type=int, default=0,
+                        help="Con --fused y el Director LLM, precalcula hasta N ramas probables del preprocesado mientras el Director decide.")
+    parser.add_argument("--speculate-mb", type=float, default=1024,
+                        help="Memoria máxima (MB) de los resultados precalculados con --speculate (por defecto 1024).")
+    parser.add_argument("--tools-first", action="store_true",
+                        help="Llama a las herramientas directamente, sin un agente por etapa, y redacta el informe con una sola llamada al modelo en segundo plano.")
+    parser.add_argument("--csv-engine", choices=["c", "pyarrow"], default="",
+                        help="Motor de lectura de los .csv: 'c' o 'pyarrow' (multihilo, requiere pyarrow). Por defecto CSV_ENGINE o 'c'.")
+    parser.add_argument("--no-compact-types", action="store_true",
+                        help="Lee los .csv con los tipos por defecto de pandas (int64, float64, object) en lugar del esquema compacto inferido.")
+    parser.add_argument("--float32", action="store_true",
+                        help="En el esquema compacto, lee también los decimales cortos y los enteros con nulos en float32 (menos memoria, pero las estadísticas pueden variar en los últimos decimales).")
+    parser.add_argument("--trace", default="",
+                        help="Guarda una traza por etapa: .jsonl (una línea por span) o .json (formato Chrome trace / Perfetto).")
+    return parser.parse_args(argv)
+
+# Dataset handle derived from the file name (the agents split it on '_')
+def base_name(filepath):
+    name = os.path.basename(filepath)
+    return name.split("_")[0] if "_" in name else name.split(".")[0]
+
+# Best model and test F1 from the modeling tool output
+def model_summary(text):
+    model = re.search(r"Rendimiento del Modelo (\w+)", text or "")
+    f1 = re.search(r"\*\*F1-Score\*\* \| [\d.]+ \| ([\d.]+) \|", text or "")
+    return {"model": model.group(1) if model else None, "f1_test": float(f1.group(1)) if f1 else None}
+
+# Text returned by the tools of an agent response (fresh or replayed from the cache)
+def tool_results(response):
+    results = []
+    for tool in getattr(response, "tools", None) or []:
+        result = tool.get("result") if isinstance(tool, dict) else getattr(tool, "result", None)
+        if result:
+            results.append(str(result))
+    return "\n".join(results)
+
+# Stage cache parameters of an agent stage: every argument of its tool, defaults included, except the input
+def stage_params(name, arguments):
+    import inspect
+
+    parameters = inspect.signature(get_tool(name)).parameters.items()
+    params = {key: p.default for key, p in parameters if p.default is not inspect.Parameter.empty}
+    params.update(arguments)
+    for key in ("filepath", "chunksize"):
+        params.pop(key, None)
+    return params
+
+# Stage cache parameters of the tool call an agent actually made (None if it did not call its tool)
+def called_params(name, response):
+    from agents import AGENT_TOOLS
+
+    for tool in getattr(response, "tools", None) or []:
+        if isinstance(tool, dict):
+            tool_name, arguments = tool.get("tool_name", tool.get("name")), tool.get("tool_args", tool.get("args"))
+        else:
+            tool_name, arguments = getattr(tool, "tool_name", None), getattr(tool, "tool_args", None)
+        if tool_name == AGENT_TOOLS[name]:
+            return stage_params(name, arguments or {})
+    return None
+
+# Full pipeline (quality -> director -> nulls -> outliers -> encoding -> modeling) of one dataset
+def run_pipeline(raw_path, args, cache=None, stage_cache=None, handle=None,
+                 processed_folder=PROCESSED_FOLDER, clean_folder=CLEAN_FOLDER):
+    """
+    Runs every stage on one raw CSV file.
+
+    Args:
+        raw_path (str): Path to the raw CSV file.
+        args (argparse.Namespace): Command line options.
+        cache (ResponseCache): Optional LLM response cache.
+        stage_cache (StageCache): Optional stage output cache.
+        handle (str): Handle of the dataset in the store (default: name derived from the file).
+        processed_folder (str): Folder for the intermediate outputs of this dataset.
+        clean_folder (str): Folder for the final outputs of this dataset.
+
+    Returns:
+        dict: Summary of the run (shapes, applied plan, best model, test F1 and time).
+    """
+    start = time.perf_counter()
+    target_file = os.path.basename(raw_path)
+    # Extract clean base name without prefix or file extension
+    clean_name = handle or base_name(target_file)
+    summary = {"dataset": target_file, "handle": clean_name, "output": clean_folder}
+    outputs = {} # Stage -> tool output, narrated at the end in tool-first mode
+
+    current_file = raw_path
+    if not args.chunksize:
+        # Parse the raw file once. From here on every stage passes the dataset handle
+        current_file = store.load(raw_path, handle=clean_name, processed_folder=processed_folder, clean_folder=clean_folder)
+    
+    # Step 1: Data Quality Report
+    with tracer.span("quality"):
+        if args.chunksize:
+            # Streaming report straight from the file, in bounded memory
+            prompt_quality_report = PROMPTS["quality_report_chunked"].format(filename=raw_path, chunksize=args.chunksize)
+        else:
+            prompt_quality_report = PROMPTS["quality_report"].format(filename=current_file)
+        context = [os.path.getsize(raw_path), os.path.getmtime(raw_path)] if args.chunksize else [store.fingerprint(current_file)]
+        arguments = {"filepath": raw_path, "chunksize": args.chunksize} if args.chunksize else {"filepath": current_file}
+        quality_report = run_stage("run", "quality", prompt_quality_report, arguments, args, cache=cache, context=context) # Get quality report
+        text_report = quality_report.content # Extract text content
+        outputs["quality"] = text_report
+        print(text_report)
+
+    # Step 2: Strategy Planning
+    with tracer.span("plan"):
+        plan = None
+        profile = None
+        speculator = None
+        try:
+            if args.chunksize:
+                profile = profile_csv_chunked(raw_path, chunksize=args.chunksize)
+            else:
+                profile = profile_dataframe(store.get(current_file), target_file)
+        except Exception as e:
+            print(f"\n Perfil de calidad no disponible ({e}).")
+        if not args.llm_director and profile is not None:
+            # Local rule engine over the profiling statistics (no LLM round-trip)
+            try:
+                plan = plan_strategy(profile).model_dump()
+                print(f"\n Plan del Director (reglas locales): {plan}")
+            except Exception as e:
+                print(f"\n Planificador local no disponible ({e}). Consultando al Director LLM.")
+        if plan is None:
+            if args.fused and args.speculate and profile is not None and not args.chunksize:
+                # Precompute the likely preprocessing branches while the Director LLM answers
+                from utils.speculation import Speculator, candidate_plans
+                candidates = candidate_plans(plan_strategy(profile).model_dump(), args.speculate)
+                speculator = Speculator(store.get(current_file), candidates, memory_mb=args.speculate_mb)
+            # Compact JSON profile within the token budget instead of the prose of the quality report
+            report = profile.render_json() if profile is not None else text_report
+            prompt_director = PROMPTS["director"].format(report=report)
+            try:
+                report_director = retry("run", get_agent("director"), prompt_director, cache=cache) # Get strategy plan
+            except BaseException:
+                if speculator is not None:
+                    speculator.close()
+                raise
+            plan = dict(report_director.content) # Convert to dictionary
+    summary["plan"] = plan
+
+    # Out-of-core steps 3-5 stream the raw file chunk by chunk; KNN imputation needs the whole dataset
+    chunksize = args.chunksize if args.out_of_core and plan.get("null_strategy") != "knn" else 0
+    if args.out_of_core and not chunksize:
+        print("La imputación KNN necesita el dataset en memoria: las etapas de preprocesado se ejecutan en memoria.")
+    if chunksize:
+        # The raw file is only registered, never loaded
+        current_file = store.track(clean_name, raw_path, processed_folder=processed_folder, clean_folder=clean_folder)
+        summary["shape_raw"] = (profile.n_rows, profile.n_cols) if profile is not None else raw_shape(raw_path, chunksize)
+    else:
+        if args.chunksize:
+            # The preprocessing stages work in memory: parse the raw file once now
+            current_file = store.load(raw_path, handle=clean_name, processed_folder=processed_folder, clean_folder=clean_folder)
+        summary["shape_raw"] = store.get(current_file).shape
+    # The stage cache is keyed by the content of datasets held in memory
+    preprocess_cache = stage_cache if not chunksize else None
+    suffix = "_chunked" if chunksize else ""
+    extra = {"chunksize": chunksize} if chunksize else {}
+
+    if args.fused:
+        # Steps 3-5 fused: the plan compiled into one fitted pipeline, applied in a single pass
+        current_file = run_fused(current_file, clean_name, plan, preprocess_cache, speculator, chunksize=chunksize)
+    else:
+        stage_inputs = {} # Step -> dataset the agent transformed
+        # Step 3: Null Value Handling
+        with tracer.span("no_nulls"):
+            action = plan.get("null_strategy", "skip")
+            prompt_nan = PROMPTS["nan" + suffix].format(filename=current_file, action=action, chunksize=chunksize)
+            if action != "skip":
+                new = f"{clean_name}_no_nulls"
+                arguments = {"filepath": current_file, "strategy": action, **extra}
+                if preprocess_cache is None or not preprocess_cache.restore("no_nulls", current_file, stage_params("nan_imputer", arguments), new):
+                    response = run_stage("print_response", "nan_imputer", prompt_nan, arguments, args,
+                                         cache=cache, context=[dataset_version(current_file)]) # Execute imputation
+                    outputs["no_nulls"] = tool_results(response)
+                    params = called_params("nan_imputer", response)
+                    if preprocess_cache is not None and params is not None:
+                        # Keyed by the arguments the agent chose, not only by the planned strategy
+                        preprocess_cache.record("no_nulls", current_file, params, new)
+                # Update dataset handle if a new dataset was registered
+                if registered(new):
+                    stage_inputs["nulls"] = current_file
+                    current_file = new 
+            else:
+                print(f"El archivo {current_file} no tiene valores nulos.")
+
+        # Step 4: Outlier Handling
+        with tracer.span("no_outliers"):
+            action = plan.get("outliers_strategy", "skip")
+            prompt_outlier = PROMPTS["outliers" + suffix].format(filename=current_file, action=action, chunksize=chunksize)
+            if action != "skip":
+                new = f"{clean_name}_no_outliers"
+                arguments = {"filepath": current_file, "strategy": action, **extra}
+                if preprocess_cache is None or not preprocess_cache.restore("no_outliers", current_file, stage_params("outliers", arguments), new):
+                    response = run_stage("print_response", "outliers", prompt_outlier, arguments, args,
+                                         cache=cache, context=[dataset_version(current_file)]) # Execute outlier handling
+                    outputs["no_outliers"] = tool_results(response)
+                    params = called_params("outliers", response)
+                    if preprocess_cache is not None and params is not None:
+                        # Keyed by the arguments the agent chose, not only by the planned strategy
+                        preprocess_cache.record("no_outliers", current_file, params, new)
+                # Update dataset handle if a new dataset was registered
+                if registered(new):
+                    stage_inputs["outliers"] = current_file
+                    current_file = new
+            else:
+                print(f"El archivo {current_file} no tiene outliers.")
+
+        # Step 5: One-Hot Encoding for Categorical Variables
+        with tracer.span("encoded"):
+            action = plan.get("encoding_strategy", "skip")
+            prompt_one_hot = PROMPTS["one_hot" + suffix].format(filename=current_file, chunksize=chunksize)
+            if action == "get_dummies":
+                new = f"{clean_name}_encoded"
+                vocabulary_folder = store.processed_folder(current_file)
+                arguments = {"filepath": current_file, **extra}
+                params = stage_params("one_hot", arguments)
+                if preprocess_cache is None or not preprocess_cache.restore("encoded", current_file, params, new):
+                    response = run_stage("print_response", "one_hot", prompt_one_hot, arguments, args,
+                                         cache=cache, context=[dataset_version(current_file)]) # Execute one-hot encoding
+                    outputs["encoded"] = tool_results(response)
+                    params = called_params("one_hot", response)
+                    if preprocess_cache is not None and params is not None:
+                        preprocess_cache.record("encoded", current_file, params, new)
+                        preprocess_cache.record_files("vocabulary", current_file, params, [os.path.join(vocabulary_folder, f"{clean_name}_vocabulary.json")])
+                else:
+                    preprocess_cache.restore_files("vocabulary", current_file, params, vocabulary_folder) # The report points to the fitted vocabulary
+                # Update dataset handle if a new dataset was registered
+                if registered(new):
+                    stage_inputs["encoding"] = current_file
+                    current_file = new
+            else:
+                print(f"El archivo {current_file} no tiene columnas categóricas.")
+
+        # Preprocessing of the model bundle: the plan fitted on the data every agent received
+        from utils.preprocessing import fit_steps, save_pipeline
+        if chunksize:
+            pipeline = fit_steps(plan, {step: store.path_of(ref) for step, ref in stage_inputs.items()}, chunksize=chunksize)
+        else:
+            pipeline = fit_steps(plan, {step: store.get(ref) for step, ref in stage_inputs.items()})
+        save_pipeline(pipeline, preprocessing_path(current_file, clean_name))
+
+    if store.path_of(current_file):
+        # Modeling needs the preprocessed dataset in memory: parse its file once now
+        current_file = store.load(store.path_of(current_file), handle=current_file, processed_folder=store.processed_folder(current_file),
+                                  clean_folder=store.clean_folder(current_file))
+    summary["shape_clean"] = store.get(current_file).shape
+
+    # Step 6: Final Clean Data Copy
+    with tracer.span("clean"):
+        final_name = f"{clean_name}_clean{store.extension}"
+        path_final_clean = os.path.join(clean_folder, final_name)
+        if stage_cache is None:
+            store.snapshot(current_file, path_final_clean) # Write (or hard-link) final cleaned file in the background
+        elif stage_cache.restore_files("clean", current_file, {"format": store.artifact_format}, clean_folder) is None:
+            store.snapshot(current_file, path_final_clean).result() # Write final cleaned file and keep a copy
+            stage_cache.record_files("clean", current_file, {"format": store.artifact_format}, [path_final_clean])
+
+    # Step 7: Modeling
+    with tracer.span("model"):
+        smote = plan.get("use_smote", "no") # Check SMOTE decision
+        if args.tune_budget > 0:
+            prompt_modeling = PROMPTS["modeling_tuned"].format(filename=current_file, plan=smote, budget=args.tune_budget)
+            arguments = {"filepath": current_file, "use_smote": smote, "tune_budget": args.tune_budget}
+        else:
+            prompt_modeling = PROMPTS["modeling"].format(filename=current_file, plan=smote)
+            arguments = {"filepath": current_file, "use_smote": smote}
+        params = stage_params("modeling", arguments)
+        cached_model = stage_cache.restore_files("model", current_file, params, clean_folder) if stage_cache is not None else None
+        if cached_model is not None:
+            print(f"Etapa 'model' reutilizada de la caché.\n{cached_model.get('text') or ''}")
+            outputs["model"] = cached_model.get("text") or ""
+            summary.update(cached_model.get("summary") or {})
+        else:
+            response = run_stage("print_response", "modeling", prompt_modeling, arguments, args,
+                                 cache=cache, context=[store.fingerprint(current_file)]) # Run modeling agent
+            outputs["model"] = tool_results(response)
+            results = model_summary(outputs["model"])
+            summary.update(results)
+            params = called_params("modeling", response)
+            if stage_cache is not None and params is not None:
+                path_img = os.path.join(clean_folder, f"{clean_name}_confusion_matrix.png")
+                path_bundle = os.path.join(clean_folder, f"{clean_name}_model.joblib")
+                if response is not None and os.path.exists(path_img):
+                    stage_cache.record_files("model", current_file, params, [path_img, path_bundle], text=getattr(response, "content", None), summary=results)
+
+    # Starting point of later incremental refreshes (--refresh)
+    path_bundle = os.path.join(clean_folder, f"{clean_name}_model.joblib")
+    if os.path.exists(path_bundle):
+        record_build(state_path(clean_folder, clean_name), raw_path, summary["shape_raw"][0], path_final_clean, path_bundle)
+
+    summary["seconds"] = time.perf_counter() - start
+    if args.tools_first:
+        # A single model call writes the whole report, in the background: the caller moves on meanwhile
+        summary["narration"] = narrate(summary, outputs, clean_folder, cache)
+    return summary
+
+# One agent stage: the model calls the agent's tool or, in tool-first mode, the tool is called directly
+def run_stage(function, name, prompt, arguments, args, cache=None, context=None):
+    if args.tools_first:
+        return call_tool(function, get_tool(name), arguments)
+    return retry(function, get_agent(name), prompt, cache=cache, context=context)
+
+# Narrative report of a tool-first run from the outputs of all its stages
+def narrate(summary, outputs, clean_folder, cache=None):
+    """
+    Submits the narration of a tool-first run to the background narration pool.
+
+    Args:
+        summary (dict): Summary of the run (plan, shapes, best model...).
+        outputs (dict): Stage -> output of its tool.
+        clean_folder (str): Folder where the report is written.
+        cache (ResponseCache): Optional LLM response cache.
+
+    Returns:
+        concurrent.futures.Future: Resolves to (report path, report text).
+    """
+    results = {key: summary.get(key) for key in ("dataset", "plan", "shape_raw", "shape_clean", "model", "f1_test")}
+    results["stages"] = outputs
+    prompt = PROMPTS["narration"].format(filename=summary["dataset"], results=json.dumps(results, ensure_ascii=False, default=str))
+    path = os.path.join(clean_folder, f"{summary['handle']}_report.md")
+
+    def write():
+        with tracer.span("narration", dataset=summary["handle"]):
+            text = str(retry("run", get_agent("narrator"), prompt, cache=cache).content)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path, text
+
+    return NARRATION.submit(write)
+
+# Waits for the narration of a tool-first run and records where its report was written
+def finish_narration(summary, show=False):
+    future = summary.pop("narration", None)
+    if future is None:
+        return
+    try:
+        path, text = future.result()
+    except Exception as e:
+        print(f"\n No se pudo redactar el informe de {summary['dataset']}: {e}")
+        return
+    summary["report"] = path
+    if show:
+        Console().print(Markdown(text))
+    print(f"Informe guardado en {path}")
+
+# Rows and columns of a raw file counted chunk by chunk (out of core, when no profile could be computed)
+def raw_shape(raw_path, chunksize):
+    import pandas as pd
+
+    columns = pd.read_csv(raw_path, nrows=0).columns
+    rows = sum(len(chunk) for chunk in loader.chunks(raw_path, chunksize, columns=[columns[0]]))
+    return rows, len(columns)
+
+# Whether a stage registered its output dataset (in memory or, out of core, on disk)
+def registered(handle):
+    return store.exists(handle) or store.path_of(handle) is not None
+
+# Version of a dataset for the LLM response cache: content hash in memory, size and mtime of its file out of core
+def dataset_version(ref):
+    path = store.path_of(ref)
+    if path:
+        return [os.path.getsize(path), os.path.getmtime(path)]
+    return store.fingerprint(ref)
+
+# Fitted preprocessing pipeline of a dataset, read by the modeling tool to build the model bundle
+def preprocessing_path(ref, clean_name):
+    return os.path.join(store.processed_folder(ref), f"{clean_name}_preprocessing.joblib")
+
+# Steps 3-5 in one pass: the Director plan compiled into a single preprocessing pipeline
+def run_fused(current_file, clean_name, plan, stage_cache=None, speculator=None, chunksize=0):
+    """
+    Preprocesses a dataset with the whole plan at once, without agents or intermediate datasets.
+
+    The fitted pipeline is saved next to the processed data as
+    <handle>_preprocessing.joblib, so the same transformation can be reapplied to new data.
+
+    Args:
+        current_file (str): Handle of the raw dataset in the store.
+        clean_name (str): Handle prefix of the dataset.
+        plan (dict): Plan of the Director.
+        stage_cache (StageCache): Optional stage output cache.
+        speculator (Speculator): Branches precomputed while the Director decided, if any.
+        chunksize (int): If > 0, the dataset is a file (store.track) streamed in chunks of this
+            many rows and the result is written to a CSV file (utils.streaming).
+
+    Returns:
+        str: Handle of the preprocessed dataset.
+    """
+    # sklearn is only imported when the fused mode is used
+    from utils.preprocessing import compile_plan, fit_pipeline, save_pipeline
+
+    with tracer.span("preprocess"):
+        new = f"{clean_name}_preprocessed"
+        pipeline_path = preprocessing_path(current_file, clean_name)
+        params = {k: plan.get(k, "skip") for k in ("null_strategy", "outliers_strategy", "encoding_strategy")}
+        if chunksize:
+            from utils.streaming import fit_transform_chunked
+            pipeline = compile_plan(plan)
+            output_path = os.path.join(store.processed_folder(current_file), f"{new}{store.extension}")
+            stats = fit_transform_chunked(pipeline, store.path_of(current_file), output_path, chunksize)
+            store.track(new, output_path, parent=current_file)
+            save_pipeline(pipeline, pipeline_path)
+            steps = ", ".join(action for action in params.values() if action != "skip")
+            print(f"Preprocesado por bloques de {chunksize} filas ({steps or 'sin pasos'}): {stats['rows_in']}x{stats['cols_in']} -> {stats['rows_out']}x{stats['cols_out']}\n"
+                  f"Dataset en: {output_path}\nPipeline guardado en: {pipeline_path}")
+            return new
+        if stage_cache is not None and stage_cache.restore_files("preprocess_pipeline", current_file, params, os.path.dirname(pipeline_path)) is not None \
+                and stage_cache.restore("preprocess", current_file, params, new):
+            if speculator is not None:
+                speculator.close()
+            return new
+        df = store.get(current_file)
+        precomputed = speculator.take(plan) if speculator is not None else None
+        if precomputed is not None:
+            pipeline, df_final = precomputed
+            print("Preprocesado tomado de la rama precalculada mientras decidía el Director.")
+        else:
+            pipeline = compile_plan(plan)
+            df_final = fit_pipeline(pipeline, df)
+        output_path = store.put(new, df_final, parent=current_file)
+        save_pipeline(pipeline, pipeline_path)
+        steps = ", ".join(action for action in params.values() if action != "skip")
+        print(f"Preprocesado en una pasada ({steps or 'sin pasos'}): {df.shape[0]}x{df.shape[1]} -> {df_final.shape[0]}x{df_final.shape[1]}\n"
+              f"Dataset en: {output_path}\nPipeline guardado en: {pipeline_path}")
+        if stage_cache is not None:
+            stage_cache.record("preprocess", current_file, params, new)
+            stage_cache.record_files("preprocess_pipeline", current_file, params, [pipeline_path])
+        return new
+
 # Main execution function
-def main():
-    # Remove old processed files
-    clear_old_data()
+def main(argv=None):
+    args = parse_args(argv)
+    store.snapshots = not args.no_snapshots
+    if args.artifact_format:
+        store.artifact_format = args.artifact_format
+    if args.profile_tokens:
+        profiling.PROFILE_TOKENS = args.profile_tokens
+    if args.csv_engine:
+        loader.engine = args.csv_engine
+    loader.compact = not args.no_compact_types
+    loader.float32 = args.float32
+    if args.out_of_core and not args.chunksize:
+        args.chunksize = 100_000
+    if args.trace:
+        # Spans of every stage, agent call, model request, tool and file I/O
+        tracer.start()
+    try:
+        return _run(args)
+    finally:
+        if args.trace:
+            tracer.stop()
+            tracer.export(args.trace)
+            print(tracer.report())
+            print(f"Traza guardada en {args.trace}")
+
+# Single file or batch run with the parsed arguments
+def _run(args):
+    # Cache of LLM responses: unchanged stages are replayed without calling Gemini
+    cache = None if args.no_cache else ResponseCache()
+    # Content-addressed cache of stage outputs: unchanged stages are skipped
+    stage_cache = None if args.no_stage_cache else StageCache(max_bytes=int(args.stage_cache_mb * 1024 ** 2))
+
+    if args.batch:
+        # Every dataset gets its own output folders, so the shared ones are not wiped
+        return run_batch(args, cache, stage_cache)
 
     # Define main directories
     raw_folder = os.path.join("data", "raw")
-    folder_processed = os.path.join("data", "processed_data") 
-    folder_clean_data = os.path.join("data", "clean_data")
 
     try:
         # Check if raw data folder exists
@@ -52,67 +562,136 @@ def main():
         print(f"\n Error crítico seleccionando archivo: {e}")
         print("\n Deteniendo ejecución.")
         return
-    
-    # Extract clean base name without prefix or file extension
-    clean_name = os.path.basename(target_file).split("_")[0] if "_" in os.path.basename(target_file) else os.path.basename(target_file).split(".")[0]
-    
-    # Step 1: Data Quality Report
-    prompt_quality_report = PROMPTS["quality_report"].format(filename=current_file)
-    quality_report = retry("run", quality_agent, prompt_quality_report) # Get quality report
-    text_report = quality_report.content # Extract text content
-    print(text_report)
 
-    # Step 2: Strategy Planning
-    prompt_director = PROMPTS["director"].format(report=text_report)
-    report_director = retry("run", strategy_agent, prompt_director) # Get strategy plan
-    plan = dict(report_director.content) # Convert to dictionary
-
-    # Step 3: Null Value Handling
-    action = plan.get("null_strategy", "skip")
-    prompt_nan = PROMPTS["nan"].format(filename=current_file, action=action)
-    if action != "skip":
-        retry("print_response", nan_imputer_agent, prompt_nan) # Execute imputation
-        # Update dataset path if new file was created
-        new = os.path.join(folder_processed, f"{clean_name}_no_nulls.csv")
-        if os.path.exists(new):
-            current_file = new 
-    else:
-        print(f"El archivo {current_file} no tiene valores nulos.")
-
-    # Step 4: Outlier Handling
-    action = plan.get("outliers_strategy", "skip")
-    prompt_outlier = PROMPTS["outliers"].format(filename=current_file, action=action)
-    if action != "skip":
-        retry("print_response", outlier_agent, prompt_outlier) # Execute outlier handling
-        # Update dataset path if new file was created
-        new = os.path.join(folder_processed, f"{clean_name}_no_outliers.csv")
-        if os.path.exists(new):
-            current_file = new
-    else:
-        print(f"El archivo {current_file} no tiene outliers.")
-
-    # Step 5: One-Hot Encoding for Categorical Variables
-    action = plan.get("encoding_strategy", "skip")
-    prompt_one_hot = PROMPTS["one_hot"].format(filename=current_file)
-    if action == "get_dummies":
-        retry("print_response", one_hot_agent, prompt_one_hot) # Execute one-hot encoding
-        # Update dataset path if new file was created
-        new = os.path.join(folder_processed, f"{clean_name}_encoded.csv")
-        if os.path.exists(new):
-            current_file = new
-    else:
-        print(f"El archivo {current_file} no tiene columnas categóricas.")
+    if args.refresh:
+        result = run_refresh(current_file, args)
+        if result is not None and not result["rebuild"]:
+            return result
 
-    # Step 6: Final Clean Data Copy
-    final_name = f"{clean_name}_clean.csv"
-    path_final_clean = os.path.join(folder_clean_data, final_name)
-    shutil.copy(current_file, path_final_clean) # Copy final cleaned file
+    # Remove old processed files
+    clear_old_data()
 
-    # Step 7: Modeling
-    smote = plan.get("use_smote", "no") # Check SMOTE decision
-    prompt_modeling = PROMPTS["modeling"].format(filename=current_file, plan=smote)
+    summary = run_pipeline(current_file, args, cache, stage_cache)
+
+    # Make sure every CSV snapshot is on disk before exiting
+    store.wait()
+    finish_narration(summary, show=True)
+    print(scheduler.report())
+    return summary
+
+# Incremental refresh of the last run of a dataset (--refresh); None if there is nothing to refresh
+def run_refresh(raw_path, args):
+    path = state_path(CLEAN_FOLDER, base_name(raw_path))
+    if not os.path.exists(path):
+        print(f"\n No hay una ejecución anterior de '{os.path.basename(raw_path)}' que actualizar: se ejecuta el pipeline completo.")
+        return None
+    try:
+        with tracer.span("refresh"):
+            result = refresh(path, force=args.ignore_drift, chunksize=args.chunksize or 100_000)
+    except ValueError as e:
+        print(f"\n {e}")
+        return None
+    Console().print(Markdown(refresh_markdown(result)))
+    if result["rebuild"]:
+        print("\n Se ejecuta el pipeline completo.")
+    return result
+
+# Batch mode: every CSV of a folder or glob pattern, several datasets at a time
+def run_batch(args, cache=None, stage_cache=None):
+    """
+    Runs the full pipeline on many datasets concurrently.
+
+    Each dataset is an asyncio task that runs its whole pipeline, LLM calls and
+    stages alike, on a worker thread pool of size --jobs: while one dataset waits
+    for the model, the others compute. The stages are not sent to a process pool
+    because every tool runs inside the tool-call loop of its agent and reads and
+    writes the in-memory dataset store, and all the model calls share one request
+    scheduler; the heavy pandas/scikit-learn kernels release the GIL, and model
+    selection spreads its folds over its own process pool. Every dataset writes
+    into its own data/batch/<run>/<handle> folder.
+
+    Args:
+        args (argparse.Namespace): Command line options (--batch, --jobs, ...).
+        cache (ResponseCache): Optional LLM response cache.
+        stage_cache (StageCache): Optional stage output cache.
+
+    Returns:
+        list: Summary of every dataset, in input order.
+    """
+    source = args.batch
+    pattern = os.path.join(source, "*.csv") if os.path.isdir(source) else source
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        print(f"\n No se encontraron archivos .csv en '{source}'.")
+        return []
+
+    # Unique handles: files sharing the same prefix get a numeric suffix
+    handles, seen = [], {}
+    for path in paths:
+        name = base_name(path)
+        seen[name] = seen.get(name, 0) + 1
+        handles.append(name if seen[name] == 1 else f"{name}-{seen[name]}")
+
+    run_folder = os.path.join("data", "batch", datetime.now().strftime("%Y%m%d-%H%M%S"))
+    print(f"\n Procesando {len(paths)} archivos en {run_folder} ({args.jobs} a la vez)")
+    summaries = asyncio.run(_run_batch(paths, handles, run_folder, args, cache, stage_cache))
+
+    store.wait()
+    # The narrations ran while the next datasets were computed
+    for summary in summaries:
+        finish_narration(summary)
+    print_summary(summaries)
+    print(scheduler.report())
+    with open(os.path.join(run_folder, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summaries, f, ensure_ascii=False, indent=2, default=str)
+    return summaries
+
+async def _run_batch(paths, handles, run_folder, args, cache, stage_cache):
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=max(args.jobs, 1), thread_name_prefix="dataset") as pool:
+        tasks = [
+            loop.run_in_executor(pool, _run_dataset, path, handle, run_folder, args, cache, stage_cache)
+            for path, handle in zip(paths, handles)
+        ]
+        return await asyncio.gather(*tasks)
+
+def _run_dataset(path, handle, run_folder, args, cache, stage_cache):
+    # One batch task: isolated folders, errors reported in the summary instead of stopping the batch
+    processed_folder = os.path.join(run_folder, handle, "processed_data")
+    clean_folder = os.path.join(run_folder, handle, "clean_data")
+    os.makedirs(processed_folder, exist_ok=True)
+    os.makedirs(clean_folder, exist_ok=True)
+    start = time.perf_counter()
+    try:
+        with tracer.span(handle, "dataset", path=path):
+            summary = run_pipeline(path, args, cache, stage_cache, handle, processed_folder, clean_folder)
+        summary["status"] = "ok"
+    except Exception as e:
+        summary = {"dataset": os.path.basename(path), "handle": handle, "output": clean_folder,
+                   "status": f"error: {e}", "seconds": time.perf_counter() - start}
+    finally:
+        # Free the memory of this dataset once its snapshots are written
+        store.wait()
+        store.drop(handle)
+    return summary
 
-    retry("print_response", modeling_agent, prompt_modeling) # Run modeling agent
+def print_summary(summaries):
+    """Prints the batch results as a table."""
+    table = Table(title="Resumen del batch")
+    for column in ["Dataset", "Filas x Cols", "Limpio", "Plan", "Modelo", "F1 test", "Tiempo (s)", "Estado"]:
+        table.add_column(column)
+    for s in summaries:
+        plan = s.get("plan") or {}
+        steps = ", ".join(f"{v}" for k, v in plan.items() if k != "use_smote" and v != "skip")
+        if plan.get("use_smote") == "yes":
+            steps += ", smote" if steps else "smote"
+        shape = lambda key: "x".join(map(str, s[key])) if s.get(key) else "-"
+        table.add_row(
+            s["dataset"], shape("shape_raw"), shape("shape_clean"), steps or "-",
+            s.get("model") or "-", f"{s['f1_test']:.3f}" if s.get("f1_test") is not None else "-",
+            f"{s.get('seconds', 0):.1f}", s.get("status", "ok"),
+        )
+    Console().print(table)
 
 if __name__ == "__main__":
     main()
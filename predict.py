@@ -0,0 +1,47 @@
+import os
+import argparse
+from utils.inference import load_bundle, predict
+from utils.tracing import tracer
+
+# Command line arguments
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Predicciones con un modelo entrenado por main.py, sin reentrenar")
+    parser.add_argument("input", help="Archivo .csv con los datos nuevos (en bruto, como los de data/raw).")
+    parser.add_argument("--model", required=True,
+                        help="Modelo guardado por main.py, p. ej. data/clean_data/Bullying1_model.joblib.")
+    parser.add_argument("--output", default="",
+                        help="Archivo .csv de salida (por defecto <entrada>_predictions.csv).")
+    parser.add_argument("--chunksize", type=int, default=100_000,
+                        help="Filas leídas y puntuadas por bloque (por defecto 100000).")
+    parser.add_argument("--jobs", type=int, default=-1,
+                        help="Bloques puntuados en paralelo (por defecto -1, todos los núcleos).")
+    parser.add_argument("--only-predictions", action="store_true",
+                        help="Escribe solo las columnas prediction y probability, sin las columnas de entrada.")
+    parser.add_argument("--trace", default="",
+                        help="Guarda una traza de la ejecución (.json o .jsonl).")
+    return parser.parse_args(argv)
+
+# Main execution function
+def main(argv=None):
+    args = parse_args(argv)
+    output = args.output or f"{os.path.splitext(args.input)[0]}_predictions.csv"
+    if args.trace:
+        tracer.start()
+    try:
+        # The model arrays are memory-mapped, not copied
+        bundle = load_bundle(args.model)
+        info = bundle["metadata"]
+        print(f"Modelo {info.get('model_name', '?')} (creado {bundle['created']}, sklearn {bundle['sklearn']})")
+        stats = predict(bundle, args.input, output, chunksize=args.chunksize, n_jobs=args.jobs,
+                        keep_columns=not args.only_predictions)
+        print(f"{stats['rows']} filas puntuadas en {stats['chunks']} bloques ({stats['seconds']:.2f} s, "
+              f"{stats['rows_per_s'] or 0:,.0f} filas/s). Predicciones en {output}")
+        return stats
+    finally:
+        if args.trace:
+            tracer.stop()
+            tracer.export(args.trace)
+            print(tracer.report())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# The tests import the project modules (utils, agents) from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # Caches and outputs use paths relative to the working directory (data/...)
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    from utils.store import store
+    store.clear()
+
+
+@pytest.fixture
+def raw_frame():
+    # Bullying1-like dataset: numeric columns with nulls, ties and outliers, categorical features and a categorical target last
+    rng = np.random.default_rng(7)
+    n = 3000
+    df = pd.DataFrame({
+        "edad": rng.integers(12, 18, n).astype(float),
+        "horas": np.round(rng.normal(7, 1.2, n), 1),
+        "notas": np.round(rng.uniform(0, 10, n), 2),
+        "amigos": rng.poisson(6, n).astype(float),
+        "ausencias": rng.integers(0, 30, n),
+        "centro": rng.choice(["Publico", "Privado", "Concertado"], n),
+        "genero": rng.choice(["M", "F"], n),
+        "bullying": rng.choice(["No", "Si"], n, p=[0.65, 0.35]),
+    })
+    df.loc[rng.choice(n, 120, replace=False), "edad"] = np.nan
+    df.loc[rng.choice(n, 90, replace=False), "amigos"] = np.nan
+    df.loc[rng.choice(n, 60, replace=False), "notas"] = rng.uniform(30, 60, 60).round(2)
+    df.loc[rng.choice(n, 40, replace=False), "horas"] = -5.0
+    return df
+
+
+@pytest.fixture
+def raw_csv(workdir, raw_frame):
+    path = os.path.join(workdir, "Synth.csv")
+    raw_frame.to_csv(path, index=False)
+    return path
+
+
+# Plan applied by the tests that compare the preprocessing paths
+PLAN = {"null_strategy": "drop", "outliers_strategy": "drop", "encoding_strategy": "get_dummies"}
+
+
+def assert_same_frame(left, right):
+    # Same columns in the same order and the same values, whatever the dtypes and index
+    assert list(left.columns) == list(right.columns)
+    assert left.shape == right.shape
+    np.testing.assert_array_equal(left.to_numpy(dtype=np.float64), right.to_numpy(dtype=np.float64))
+
+
+def run_agent_stages(raw_csv, workdir, chunksize=0):
+    # The three preprocessing tools, as main.py runs them (in memory, or out of core with chunksize)
+    from agents import get_tool
+    from utils.store import store
+
+    processed = os.path.join(workdir, "processed")
+    os.makedirs(processed, exist_ok=True)
+    if chunksize:
+        handle = store.track("Synth", raw_csv, processed_folder=processed, clean_folder=processed)
+    else:
+        handle = store.load(raw_csv, handle="Synth", processed_folder=processed, clean_folder=processed)
+    extra = {"chunksize": chunksize} if chunksize else {}
+    get_tool("nan_imputer")(handle, strategy="drop", **extra)
+    get_tool("outliers")("Synth_no_nulls", strategy="drop", **extra)
+    get_tool("one_hot")("Synth_no_outliers", **extra)
+    store.wait()
+    return store.resolve("Synth_encoded")
+
+
+@pytest.fixture
+def in_memory(raw_csv, workdir, monkeypatch):
+    # Result of the agent tools run in memory: the reference of the other preprocessing paths
+    from utils.store import store
+
+    monkeypatch.setattr(store, "snapshots", False)
+    result = run_agent_stages(raw_csv, workdir)
+    store.clear()
+    return result
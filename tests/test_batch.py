@@ -0,0 +1,26 @@
+import os
+import json
+import main
+
+
+def test_batch_processes_every_file_in_its_own_folder(raw_frame, workdir, monkeypatch):
+    monkeypatch.setenv("AGENT_MODEL", "stub")
+    raw = workdir / "raw"
+    raw.mkdir()
+    # Two files with the same prefix (their handles must not collide) and one that cannot be processed
+    raw_frame.iloc[:400].to_csv(raw / "Alumnos_2023.csv", index=False)
+    raw_frame.iloc[400:800].to_csv(raw / "Alumnos_2024.csv", index=False)
+    (raw / "Vacio.csv").write_text("")
+
+    summaries = main.main(["--batch", str(raw), "--jobs", "3", "--no-cache", "--no-stage-cache", "--no-snapshots"])
+
+    assert [s["handle"] for s in summaries] == ["Alumnos", "Alumnos-2", "Vacio"]
+    assert [s["status"] for s in summaries[:2]] == ["ok", "ok"]
+    assert summaries[2]["status"].startswith("error")
+    for summary in summaries[:2]:
+        assert summary["shape_raw"] == (400, 8)
+        assert summary["model"] and 0 <= summary["f1_test"] <= 1
+        assert os.path.exists(os.path.join(summary["output"], f"{summary['handle']}_model.joblib"))
+    run_folder = os.path.dirname(os.path.dirname(summaries[0]["output"]))
+    with open(os.path.join(run_folder, "summary.json"), encoding="utf-8") as f:
+        assert [s["handle"] for s in json.load(f)] == ["Alumnos", "Alumnos-2", "Vacio"]
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+from agents.director import IMBALANCE_THRESHOLD, NULL_THRESHOLD, ROWS_THRESHOLD, plan_strategy
+from utils.profiling import ColumnProfile, DatasetProfile, profile_dataframe
+
+
+def make_profile(n_rows=2000, n_cols=10, nulls=0, rows_with_nulls=None, outliers=0, categorical=True, minority=50.0):
+    # Profile with the given totals: the nulls and outliers sit in the first column, the target is categorical or numeric
+    columns = [ColumnProfile(f"x{i}", "float64", nulls if i == 0 else 0, 100, outliers if i == 0 else 0) for i in range(n_cols - 1)]
+    columns.append(ColumnProfile("y", "object", 0, 2, None) if categorical else ColumnProfile("y", "int64", 0, 2, 0))
+    minority_rows = int(round(n_rows * minority / 100))
+    return DatasetProfile("synth.csv", n_rows, n_cols, 0, nulls if rows_with_nulls is None else rows_with_nulls, "y",
+                          {"0": n_rows - minority_rows, "1": minority_rows}, columns)
+
+
+@pytest.mark.parametrize("nulls, expected", [
+    (0, "skip"),
+    (1, "drop"),
+    (int(2000 * 10 * NULL_THRESHOLD / 100) - 1, "drop"),
+    (int(2000 * 10 * NULL_THRESHOLD / 100), "knn"),
+])
+def test_null_strategy_threshold_on_cells(nulls, expected):
+    assert plan_strategy(make_profile(nulls=nulls)).null_strategy == expected
+
+
+def test_null_strategy_ignores_the_share_of_rows():
+    # 3% of the cells are null, spread over 30% of the rows: few values to lose, so the rows are dropped
+    profile = make_profile(nulls=600, rows_with_nulls=600)
+    assert profile.null_rows_percentage == 30.0 and profile.null_percentage == 3.0
+    assert plan_strategy(profile).null_strategy == "drop"
+
+
+@pytest.mark.parametrize("n_rows, outliers, expected", [
+    (2000, 0, "skip"),
+    (ROWS_THRESHOLD - 1, 5, "capping"),
+    (ROWS_THRESHOLD, 5, "drop"),
+])
+def test_outliers_strategy_threshold_on_rows(n_rows, outliers, expected):
+    assert plan_strategy(make_profile(n_rows=n_rows, outliers=outliers)).outliers_strategy == expected
+
+
+def test_encoding_and_smote():
+    assert plan_strategy(make_profile(categorical=True)).encoding_strategy == "get_dummies"
+    assert plan_strategy(make_profile(categorical=False)).encoding_strategy == "skip"
+    assert plan_strategy(make_profile(minority=IMBALANCE_THRESHOLD - 1)).use_smote == "yes"
+    assert plan_strategy(make_profile(minority=IMBALANCE_THRESHOLD)).use_smote == "no"
+
+
+def test_plan_from_dataframe_profile(raw_frame):
+    # 210 null cells over 24000 (0.9%) and 1000+ rows with IQR outliers; the minority class is 35%
+    plan = plan_strategy(profile_dataframe(raw_frame, "Synth.csv"))
+    assert plan.model_dump() == {"null_strategy": "drop", "outliers_strategy": "drop",
+                                 "encoding_strategy": "get_dummies", "use_smote": "yes"}
+
+    numeric = raw_frame.select_dtypes(include=[np.number]).assign(y=np.arange(len(raw_frame)) % 2)
+    numeric.loc[numeric.index[:len(numeric) // 2], "horas"] = np.nan
+    plan = plan_strategy(profile_dataframe(numeric, "Synth.csv"))
+    assert plan.null_strategy == "knn" and plan.encoding_strategy == "skip" and plan.use_smote == "no"
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.encoding import CategoricalEncoder, OTHER_LEVEL
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        "edad": [12, 13, 14, 15, 16, 17],
+        "centro": ["Publico", "Privado", "Concertado", "Publico", "Privado", "Publico"],
+        "genero": ["M", "F", "F", "M", "F", "M"],
+        "bullying": ["No", "Si", "No", "No", "Si", "No"],
+    })
+
+
+def test_features_match_get_dummies(frame):
+    encoded = CategoricalEncoder().fit_transform(frame, ["centro", "genero", "bullying"], target="bullying")
+    dummies = pd.get_dummies(frame[["centro", "genero"]], drop_first=True, dtype=np.uint8)
+    assert list(encoded.columns) == ["edad", "centro_Privado", "centro_Publico", "genero", "bullying"]
+    np.testing.assert_array_equal(encoded[["centro_Privado", "centro_Publico"]], dummies[["centro_Privado", "centro_Publico"]])
+    np.testing.assert_array_equal(encoded["genero"], dummies["genero_M"])
+    np.testing.assert_array_equal(encoded["bullying"], [0, 1, 0, 0, 1, 0])
+
+
+def test_numeric_target_stays_last(frame):
+    frame = frame.assign(bullying=[0, 1, 0, 0, 1, 0])
+    encoded = CategoricalEncoder().fit_transform(frame, ["centro", "genero"])
+    assert encoded.columns[-1] == "bullying"
+    np.testing.assert_array_equal(encoded["bullying"], frame["bullying"])
+
+
+def test_scoring_data_without_target(frame):
+    encoder = CategoricalEncoder().fit(frame, ["centro", "genero", "bullying"], target="bullying")
+    features = frame.drop(columns="bullying")
+    encoded = encoder.transform(features)
+    assert list(encoded.columns) == ["edad", "centro_Privado", "centro_Publico", "genero"]
+
+
+def test_vocabulary_round_trip(frame, tmp_path):
+    encoder = CategoricalEncoder(max_levels=2).fit(frame, ["centro", "genero", "bullying"], target="bullying")
+    path = tmp_path / "vocabulary.json"
+    encoder.save(path)
+    loaded = CategoricalEncoder.load(path)
+    new = frame.assign(centro=["Publico", "Rural", "Concertado", "Privado", "Publico", "Publico"])
+    pd.testing.assert_frame_equal(loaded.transform(new), encoder.transform(new))
+
+
+def test_vocabulary_round_trip_keeps_the_level_types(tmp_path):
+    # Levels that are not text (and a column name that is not either) must still match the raw values after loading
+    df = pd.DataFrame({
+        "curso": [1, 2, 3, 1, 2, 1, 4, 1],
+        "repite": [True, False, False, True, False, False, True, False],
+        "alta": pd.to_datetime(["2024-09-01", "2024-09-15", "2024-09-01", "2024-10-01"] * 2),
+        7: ["x", "y", "x", "z", "x", "y", "x", "x"],
+        "bullying": ["No", "Si"] * 4,
+    })
+    encoder = CategoricalEncoder(max_levels=2).fit(df, ["curso", "repite", "alta", 7, "bullying"], target="bullying")
+    path = tmp_path / "vocabulary.json"
+    encoder.save(path)
+    loaded = CategoricalEncoder.load(path)
+    assert loaded.vocabulary == encoder.vocabulary
+    encoded = loaded.transform(df)
+    pd.testing.assert_frame_equal(encoded, encoder.transform(df))
+    assert encoded["curso_2"].sum() == 2 # Only the unkept levels (3, 4) are grouped as OTHER_LEVEL
+    np.testing.assert_array_equal(encoded["repite"], df["repite"].astype(np.uint8))
+
+
+def test_rare_and_unseen_levels(frame):
+    capped = CategoricalEncoder(max_levels=2).fit(frame, ["centro"])
+    assert capped.vocabulary["centro"]["levels"] == ["Privado", "Publico", OTHER_LEVEL]
+    encoded = capped.transform(pd.DataFrame({"centro": ["Rural", "Publico"], "y": [0, 1]}))
+    np.testing.assert_array_equal(encoded[f"centro_{OTHER_LEVEL}"], [1, 0])
+
+    # Without an 'other' level an unseen value is an all-zero row
+    plain = CategoricalEncoder().fit(frame, ["centro"])
+    encoded = plain.transform(pd.DataFrame({"centro": ["Rural"], "y": [0]}))
+    assert encoded[["centro_Privado", "centro_Publico"]].to_numpy().sum() == 0
+
+
+def test_sparse_matches_dense(frame):
+    encoder = CategoricalEncoder().fit(frame, ["centro", "genero", "bullying"], target="bullying")
+    sparse = encoder.transform(frame, sparse=True)
+    dense = encoder.transform(frame)
+    assert list(sparse.columns) == list(dense.columns)
+    assert any(isinstance(dtype, pd.SparseDtype) for dtype in sparse.dtypes)
+    np.testing.assert_array_equal(sparse.to_numpy(dtype=float), dense.to_numpy(dtype=float))
+
+
+def test_counts_fit_matches_frame_fit(frame):
+    columns = ["centro", "genero", "bullying"]
+    halves = [frame.iloc[:3], frame.iloc[3:]]
+    counts = {col: halves[0][col].value_counts().add(halves[1][col].value_counts(), fill_value=0) for col in columns}
+    from_counts = CategoricalEncoder(min_frequency=2).fit_counts(counts, target="bullying")
+    from_frame = CategoricalEncoder(min_frequency=2).fit(frame, columns, target="bullying")
+    assert from_counts.vocabulary == from_frame.vocabulary
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.impute import KNNImputer
+from utils import imputation
+from utils.imputation import knn_impute, select_donors
+
+
+def test_knn_impute_matches_sklearn_on_complete_donors():
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame(rng.normal(size=(2000, 5)), columns=list("abcde"))
+    mask = rng.random(df.shape) < 0.04
+    mask[:, 0] &= rng.random(len(df)) < 0.5
+    df = df.mask(mask)
+    imputed, stats = knn_impute(df, n_neighbors=5)
+    complete = df.dropna()
+    expected = KNNImputer(n_neighbors=5).fit(complete).transform(df)
+    assert stats["backend"] == "tree" and stats["rows_imputed"] == int(mask.any(axis=1).sum())
+    np.testing.assert_allclose(imputed.to_numpy(), expected)
+    # Memory is measured by the imputation itself, with or without tracing
+    assert stats["peak_mb"] >= 0 and not np.isnan(stats["peak_mb"])
+
+
+def test_knn_impute_without_complete_rows_uses_partial_donors(monkeypatch):
+    # Wide table with scattered nulls: no row is complete
+    rng = np.random.default_rng(2)
+    base = rng.normal(size=(600, 1))
+    df = pd.DataFrame(base + rng.normal(scale=0.05, size=(600, 40)))
+    df = df.mask(rng.random(df.shape) < 0.2)
+    assert len(df.dropna()) == 0
+
+    # The all-rows sklearn imputer must never be used
+    monkeypatch.setattr("sklearn.impute.KNNImputer.fit", lambda *args, **kwargs: pytest.fail("quadratic fallback"))
+    imputed, stats = knn_impute(df, n_neighbors=5)
+    assert stats["backend"] == "tree-partial" and stats["donors"] == 600
+    assert not imputed.isna().any().any()
+    # Every column follows the shared factor: the imputed values are close to it
+    missing = df.isna().to_numpy()
+    errors = np.abs(imputed.to_numpy() - base)[missing]
+    assert errors.mean() < 0.1
+    np.testing.assert_array_equal(imputed.to_numpy()[~missing], df.to_numpy()[~missing])
+
+
+def test_partial_donors_are_capped(monkeypatch):
+    monkeypatch.setattr(imputation, "MAX_DONORS", 50)
+    values = np.random.default_rng(0).normal(size=(500, 4))
+    values[np.arange(500), np.arange(500) % 4] = np.nan
+    donors = select_donors(values, n_neighbors=5)
+    assert len(donors) == 50 and np.isnan(donors).any(axis=1).all()
+    # Enough complete rows: only those are donors
+    values[:10] = 1.0
+    assert (select_donors(values, n_neighbors=5) == 1.0).all()
+
+
+def test_fitted_pipeline_imputes_new_rows_from_partial_donors():
+    from utils.preprocessing import NullHandler
+    rng = np.random.default_rng(3)
+    train = pd.DataFrame(rng.normal(size=(300, 6)), columns=list("abcdef"))
+    train = train.mask(np.eye(6, dtype=bool)[np.arange(300) % 6])
+    handler = NullHandler("knn").fit(train)
+    assert np.isnan(handler.donors_).any()
+    new = pd.DataFrame(rng.normal(size=(20, 6)), columns=list("abcdef")).mask(rng.random((20, 6)) < 0.3)
+    assert not handler.transform(new).isna().any().any()
@@ -0,0 +1,47 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from conftest import PLAN
+from utils.inference import BUNDLE_VERSION, load_bundle, predict, save_bundle, score_frame
+from utils.loader import loader
+from utils.preprocessing import compile_plan, fit_pipeline
+
+
+def test_bundle_round_trip_and_version(workdir):
+    X = np.random.default_rng(0).normal(size=(50, 2))
+    y = (X[:, 0] > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    path = save_bundle(os.path.join(workdir, "model.joblib"), model, StandardScaler().fit(X), ["a", "b"], "y",
+                       labels=["No", "Si"], model_name="random_forest")
+    bundle = load_bundle(path)
+    assert bundle["version"] == BUNDLE_VERSION and bundle["features"] == ["a", "b"]
+    assert bundle["metadata"]["model_name"] == "random_forest"
+
+    # The loaded bundle is memory-mapped: write the newer version to another file
+    newer = os.path.join(workdir, "newer.joblib")
+    joblib.dump(dict(bundle, version=BUNDLE_VERSION + 1), newer)
+    with pytest.raises(ValueError):
+        load_bundle(newer)
+
+
+def test_chunked_predict_matches_scoring_the_whole_file(raw_csv, workdir):
+    df = loader.read(raw_csv)
+    preprocessing = compile_plan(PLAN)
+    train = fit_pipeline(preprocessing, df)
+    X, y = train.drop(columns="bullying"), train["bullying"]
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(scaler.transform(X), y)
+    path = save_bundle(os.path.join(workdir, "model.joblib"), model, scaler, X.columns, "bullying", preprocessing, labels=["No", "Si"])
+
+    bundle = load_bundle(path)
+    expected = score_frame(bundle, pd.read_csv(raw_csv))
+    assert len(expected) == len(df) and set(expected["prediction"]) <= {"No", "Si"}
+    stats = predict(bundle, raw_csv, os.path.join(workdir, "predictions.csv"), chunksize=700, n_jobs=2)
+    assert stats["rows"] == len(df) and stats["chunks"] == 5
+    scored = pd.read_csv(os.path.join(workdir, "predictions.csv"))
+    assert list(scored["prediction"]) == list(expected["prediction"])
+    np.testing.assert_allclose(scored["probability"], expected["probability"])
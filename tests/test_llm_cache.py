@@ -0,0 +1,96 @@
+import os
+import time
+from types import SimpleNamespace
+from utils.llm_cache import ResponseCache
+
+
+def make_agent(instructions="Analiza el dataset."):
+    return SimpleNamespace(name="Agente", model=SimpleNamespace(id="stub"), description="", instructions=[instructions],
+                           output_schema=None, tools=[])
+
+
+def age(path, seconds):
+    # Moves the last access time of a cache entry into the past
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_response_cache_key():
+    cache = ResponseCache(folder="llm")
+    key = cache.key(make_agent(), "prompt", ["v1"])
+    assert key == cache.key(make_agent(), "prompt", ["v1"])
+    assert key != cache.key(make_agent(), "prompt", ["v2"])
+    assert key != cache.key(make_agent(), "otro prompt", ["v1"])
+    assert key != cache.key(make_agent("Otras instrucciones."), "prompt", ["v1"])
+
+
+def test_response_cache_round_trip_and_ttl():
+    cache = ResponseCache(folder="llm", ttl=60)
+    cache.put("a", "respuesta", [{"tool_name": "manage_nulls", "tool_args": {"strategy": "drop"}}])
+    entry = cache.get("a")
+    assert entry["content"] == "respuesta"
+    assert entry["tools"][0]["tool_args"] == {"strategy": "drop"}
+    assert cache.get("missing") is None
+
+    expired = ResponseCache(folder="llm", ttl=0)
+    time.sleep(0.01)
+    assert expired.get("a") is None
+    assert not os.path.exists(os.path.join("llm", "a.json"))
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(folder="llm", max_bytes=10_000)
+    for key in ("a", "b"):
+        cache.put(key, "x" * 4000)
+    age(cache._path("a"), 200)
+    age(cache._path("b"), 100)
+    assert cache.get("a") is not None # Hit: 'a' becomes the most recently used
+    cache.put("c", "x" * 4000)
+    assert os.path.exists(cache._path("a"))
+    assert not os.path.exists(cache._path("b"))
+    assert os.path.exists(cache._path("c"))
+
+
+def make_tool_agent(calls):
+    # Agent with one tool that registers a dataset and counts its executions
+    from utils.store import store
+
+    def clean(filepath, strategy="drop"):
+        calls.append(filepath)
+        store.put(f"{filepath}_no_nulls", store.get(filepath).dropna(), parent=filepath, snapshot=False)
+        return f"Dataset limpio en: {filepath}_no_nulls"
+
+    agent = make_agent()
+    agent.tools = [SimpleNamespace(name="manage_nulls", entrypoint=clean)]
+    return agent, clean
+
+
+def test_replay_skips_tools_whose_outputs_exist(raw_frame):
+    from utils.llm_cache import recorded_tools
+    from utils.store import store
+
+    calls = []
+    agent, clean = make_tool_agent(calls)
+    store.put("Synth", raw_frame, snapshot=False)
+    handles, since = store.handles(), time.time()
+    result = clean("Synth")
+    run = SimpleNamespace(content="Hecho", tools=[SimpleNamespace(tool_name="manage_nulls", tool_args={"filepath": "Synth"}, result=result)])
+    cache = ResponseCache(folder="llm")
+    cache.put("k", run.content, recorded_tools(run, handles, since))
+    assert cache.get("k")["tools"][0]["outputs"] == {"handles": ["Synth_no_nulls"], "files": []}
+
+    # The output is still registered: the tool is not executed again
+    replayed = cache.replay(agent, cache.get("k"))
+    assert replayed.content == "Hecho" and replayed.tools[0]["result"] == result
+    assert calls == ["Synth"]
+
+    # The output is gone: the tool runs again to restore it
+    store.drop("Synth_no_nulls")
+    replayed = cache.replay(agent, cache.get("k"))
+    assert calls == ["Synth", "Synth"]
+    assert store.exists("Synth_no_nulls")
+
+    # A recorded result that no longer matches its hash rejects the replay
+    entry = cache.get("k")
+    entry["tools"][0]["result"] = "Otro resultado"
+    assert cache.replay(agent, entry) is None
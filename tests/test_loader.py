@@ -0,0 +1,54 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.loader import TypedLoader, infer_schema, loader
+
+
+def test_compact_schema_keeps_the_values(raw_csv):
+    schema = infer_schema(raw_csv, chunk_rows=500)
+    assert schema["ausencias"] == "int8"
+    assert schema["centro"] == "category"
+    # Decimals keep float64: the later stages compute the same statistics as on the default types
+    assert "edad" not in schema and "notas" not in schema
+    compact = loader.read(raw_csv)
+    default = pd.read_csv(raw_csv)
+    for col in default.columns:
+        if isinstance(compact[col].dtype, pd.CategoricalDtype):
+            pd.testing.assert_series_equal(compact[col].astype(object), default[col])
+        else:
+            pd.testing.assert_series_equal(compact[col], default[col], check_dtype=compact[col].dtype.kind == "f")
+    assert compact.memory_usage(deep=True).sum() < default.memory_usage(deep=True).sum()
+
+
+def test_float32_schema_is_opt_in(raw_csv):
+    typed = TypedLoader(float32=True, folder="schemas")
+    schema = typed.schema(raw_csv)
+    assert schema["edad"] == "float32" and schema["notas"] == "float32"
+    # Short decimals round-trip through float32 exactly as text
+    compact = typed.read(raw_csv)
+    default = pd.read_csv(raw_csv)
+    np.testing.assert_array_equal(compact["notas"].to_numpy(), default["notas"].to_numpy(dtype=np.float32))
+    # The cached schema of the default loader is a separate entry
+    assert "notas" not in TypedLoader(folder="schemas").schema(raw_csv)
+    assert len(os.listdir("schemas")) == 2
+
+
+def test_chunks_use_the_same_schema(raw_csv):
+    whole = loader.read(raw_csv)
+    chunks = list(loader.chunks(raw_csv, 700, columns=["edad", "centro", "bullying"]))
+    assert len(chunks) == 5
+    # Categories are unioned across chunks, so compare the values
+    joined = pd.concat([chunk.astype(object) for chunk in chunks], ignore_index=True)
+    pd.testing.assert_frame_equal(joined, whole[["edad", "centro", "bullying"]].astype(object))
+    assert chunks[0]["edad"].dtype == whole["edad"].dtype
+
+
+def test_schema_cache_follows_the_file(raw_csv, raw_frame):
+    typed = TypedLoader(folder="schemas")
+    assert typed.schema(raw_csv)["ausencias"] == "int8"
+    assert len(os.listdir("schemas")) == 1
+    # A rewritten file gets a new schema: wider integers no longer fit int8
+    raw_frame.assign(ausencias=raw_frame["ausencias"] * 1000).to_csv(raw_csv, index=False)
+    os.utime(raw_csv, ns=(0, os.stat(raw_csv).st_mtime_ns + 1_000_000))
+    assert typed.schema(raw_csv)["ausencias"] == "int16"
+    assert TypedLoader(folder="schemas").schema(raw_csv)["ausencias"] == "int16" # From the disk cache
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from utils.model_selection import FIDELITY, MIN_ESTIMATORS, SEARCH_SPACES, sample_configs, select_model, tune_model
+
+
+@pytest.fixture
+def data():
+    return make_classification(n_samples=600, n_features=8, n_informative=4, weights=[0.7], random_state=0)
+
+
+def test_sample_configs_start_with_the_defaults():
+    configs = sample_configs("random_forest", 9, random_state=1)
+    assert len(configs) == 9 and configs[0] == {}
+    for config in configs[1:]:
+        assert set(config) == set(SEARCH_SPACES["random_forest"])
+        assert all(value in SEARCH_SPACES["random_forest"][param] for param, value in config.items())
+    assert sample_configs("random_forest", 9, random_state=1) == configs
+    c = [config["C"] for config in sample_configs("logistic_regression", 20)[1:]]
+    assert 0.01 <= min(c) and max(c) <= 100.0
+
+
+def test_successive_halving_keeps_the_best_third(data):
+    X, y = data
+    tuning = tune_model(X, y, "random_forest", budget_s=600, n_candidates=9, eta=3, cv_folds=3, n_jobs=2)
+    rungs = tuning["rungs"]
+    # 9 -> 3 -> 1 candidates, with three times the trees at every rung up to a full fit
+    assert [rung["candidates"] for rung in rungs] == [9, 3, 1]
+    full = FIDELITY["random_forest"][1]
+    assert [rung["resource"] for rung in rungs] == [max(MIN_ESTIMATORS, round(full / 9)), full // 3, full]
+    # The whole training fold is used one rung before the end; then only the trees grow
+    assert [rung["data"] for rung in rungs] == pytest.approx([1 / 3, 1.0, 1.0])
+    assert not tuning["stopped"]
+    assert tuning["best_params"]["n_estimators"] == full
+    assert 0 < tuning["f1_cv"] <= 1
+
+
+def test_budget_stops_the_search(data):
+    X, y = data
+    tuning = tune_model(X, y, "logistic_regression", budget_s=0.0, n_candidates=9, cv_folds=3, n_jobs=1)
+    assert tuning["stopped"] and len(tuning["rungs"]) == 1
+    assert tuning["rungs"][0]["candidates"] == 9
+    with pytest.raises(ValueError):
+        tune_model(X, y, "svm")
+
+
+def test_select_model_leaderboard(data):
+    X, y = data
+    leaderboard = select_model(X, y, candidates="logistic_regression, random_forest", cv_folds=3, n_jobs=2)
+    assert set(leaderboard.index) == {"logistic_regression", "random_forest"}
+    assert leaderboard["f1_cv"].is_monotonic_decreasing
+    assert np.all(leaderboard[["fit_s", "predict_s"]].to_numpy() > 0)
+    with pytest.raises(ValueError):
+        select_model(X, y, candidates="svm")
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+from agents import get_tool
+from utils.profiling import iqr_bounds
+from utils.store import store
+
+
+def test_iqr_bounds_match_pandas_quantiles(raw_frame):
+    numeric = raw_frame.select_dtypes(include=[np.number])
+    lower, upper = iqr_bounds(numeric.to_numpy(dtype=np.float64))
+    q1, q3 = numeric.quantile(0.25), numeric.quantile(0.75)
+    np.testing.assert_allclose(lower, q1 - 1.5 * (q3 - q1))
+    np.testing.assert_allclose(upper, q3 + 1.5 * (q3 - q1))
+
+
+@pytest.mark.parametrize("strategy", ["drop", "capping"])
+def test_vectorized_tool_uses_the_bounds_of_the_input(raw_frame, monkeypatch, strategy):
+    monkeypatch.setattr(store, "snapshots", False)
+    handle = store.put("Synth", raw_frame)
+    get_tool("outliers")(handle, strategy=strategy)
+    result = store.get("Synth_no_outliers")
+
+    # Every bound comes from the original data, whatever the order of the columns
+    numeric = raw_frame.select_dtypes(include=[np.number]).columns
+    q1, q3 = raw_frame[numeric].quantile(0.25), raw_frame[numeric].quantile(0.75)
+    lower, upper = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    if strategy == "drop":
+        outside = ((raw_frame[numeric] < lower) | (raw_frame[numeric] > upper)).any(axis=1)
+        pd.testing.assert_frame_equal(result, raw_frame[~outside])
+    else:
+        pd.testing.assert_frame_equal(result[numeric], raw_frame[numeric].clip(lower, upper, axis=1), check_dtype=False)
+        pd.testing.assert_frame_equal(result.drop(columns=numeric), raw_frame.drop(columns=numeric))
@@ -0,0 +1,22 @@
+from conftest import PLAN, assert_same_frame
+from utils.loader import loader
+from utils.preprocessing import compile_plan, fit_pipeline, load_pipeline, save_pipeline
+
+
+def test_fused_pipeline_matches_agent_stages(raw_csv, in_memory):
+    fused = fit_pipeline(compile_plan(PLAN), loader.read(raw_csv))
+    assert_same_frame(fused, in_memory)
+
+
+def test_saved_pipeline_keeps_every_new_row(raw_csv, workdir):
+    df = loader.read(raw_csv)
+    pipeline = compile_plan(PLAN)
+    fitted = fit_pipeline(pipeline, df)
+    path = save_pipeline(pipeline, str(workdir / "preprocessing.joblib"))
+    # New data is imputed and clipped instead of dropped, and encoded with the training columns
+    scored = load_pipeline(path).transform(df)
+    assert len(scored) == len(df) and list(scored.columns) == list(fitted.columns)
+    assert not scored.isna().any().any()
+    outliers = pipeline.named_steps["outliers"]
+    numeric = list(outliers.lower_.index)
+    assert (scored[numeric] >= outliers.lower_).all().all() and (scored[numeric] <= outliers.upper_).all().all()
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+from utils.loader import loader
+from utils.profiling import profile_csv_chunked, profile_dataframe
+
+
+def test_profile_matches_per_column_statistics(raw_frame, monkeypatch):
+    # Blocks of two columns: the numeric columns are split over several blocks
+    monkeypatch.setattr("utils.profiling.BLOCK_COLUMNS", 2)
+    profile = profile_dataframe(raw_frame, "Synth.csv")
+    assert (profile.n_rows, profile.n_cols, profile.target_col) == (3000, 8, "bullying")
+    assert profile.rows_with_nulls == int(raw_frame.isna().any(axis=1).sum())
+    assert profile.duplicates == int(raw_frame.duplicated().sum())
+    assert profile.class_counts == raw_frame["bullying"].value_counts().to_dict()
+    assert profile.cols_cat == ["centro", "genero", "bullying"]
+    for column in profile.columns:
+        series = raw_frame[column.name]
+        assert column.nulls == series.isna().sum()
+        assert column.uniques == series.nunique()
+        if pd.api.types.is_numeric_dtype(series):
+            q1, q3 = series.quantile(0.25), series.quantile(0.75)
+            iqr = q3 - q1
+            assert column.outliers == ((series < q1 - 1.5 * iqr) | (series > q3 + 1.5 * iqr)).sum()
+        else:
+            assert column.outliers is None
+
+
+def test_profile_of_empty_and_null_columns():
+    df = pd.DataFrame({"a": [np.nan] * 4, "b": [1.0, 1.0, 1.0, 1.0], "y": ["x", "x", "z", None]})
+    profile = profile_dataframe(df)
+    a, b, y = profile.columns
+    assert (a.nulls, a.uniques, a.outliers) == (4, 0, 0)
+    assert (b.nulls, b.uniques, b.outliers) == (0, 1, 0)
+    assert (y.nulls, y.uniques) == (1, 2)
+    assert profile.null_percentage == 5 / 12 * 100
+
+
+def test_chunked_profile_matches_in_memory(raw_csv):
+    # Sketches large enough to stay exact: the IQR bounds are then the in-memory ones
+    chunked = profile_csv_chunked(raw_csv, chunksize=400, k=5000)
+    in_memory = profile_dataframe(loader.read(raw_csv), "Synth.csv")
+    assert chunked.class_counts == in_memory.class_counts
+    assert chunked.rows_with_nulls == in_memory.rows_with_nulls
+    for left, right in zip(chunked.columns, in_memory.columns):
+        assert (left.name, left.dtype, left.nulls, left.uniques, left.outliers) == \
+               (right.name, right.dtype, right.nulls, right.uniques, right.outliers)
+
+
+def test_chunked_profile_outliers_are_close_with_small_sketches(raw_csv):
+    chunked = profile_csv_chunked(raw_csv, chunksize=400, k=64)
+    in_memory = profile_dataframe(loader.read(raw_csv), "Synth.csv")
+    for left, right in zip(chunked.columns, in_memory.columns):
+        if right.outliers is not None:
+            assert abs(left.outliers - right.outliers) <= max(10, 0.2 * right.outliers)
@@ -0,0 +1,108 @@
+import os
+from types import SimpleNamespace
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from utils.incremental import RunningStats, check_drift, grow_model, read_delta, record_build, _conform
+
+
+def append_rows(path, df):
+    df.to_csv(path, mode="a", header=False, index=False)
+
+
+def test_running_stats_merge_equals_whole(raw_frame):
+    whole = RunningStats().update(raw_frame)
+    merged = RunningStats().update(raw_frame.iloc[:1000]).merge(RunningStats().update(raw_frame.iloc[1000:]))
+    assert merged.rows == whole.rows == len(raw_frame)
+    for col, entry in whole.numeric.items():
+        valid = raw_frame[col].dropna()
+        assert merged.numeric[col]["n"] == entry["n"] == len(valid)
+        assert merged.numeric[col]["mean"] == pytest.approx(valid.mean())
+        assert merged.numeric[col]["m2"] / (len(valid) - 1) == pytest.approx(valid.var())
+        assert merged.null_rate(col) == pytest.approx(raw_frame[col].isna().mean())
+    for col, entry in whole.levels.items():
+        pd.testing.assert_series_equal(merged.levels[col]["counts"].sort_index(), entry["counts"].sort_index(), check_names=False, check_dtype=False)
+
+
+def test_check_drift(raw_frame):
+    reference = RunningStats().update(raw_frame.iloc[:2000])
+    assert check_drift(reference, RunningStats().update(raw_frame.iloc[2000:])) == []
+
+    shifted = raw_frame.iloc[2000:].assign(notas=lambda df: df["notas"] + 8, genero=None)
+    checks = {(f["column"], f["check"]) for f in check_drift(reference, RunningStats().update(shifted))}
+    assert ("notas", "distribución") in checks
+    assert ("genero", "nulos") in checks
+
+
+def test_read_delta_reads_only_appended_rows(raw_csv, raw_frame, workdir):
+    head = raw_frame.iloc[:2500]
+    head.to_csv(raw_csv, index=False)
+    path = record_build(os.path.join(workdir, "state.joblib"), raw_csv, len(head), "clean.parquet", "model.joblib")
+    state = joblib.load(path)
+    assert read_delta(state) is None
+    assert state["schema"]["ausencias"] == "int8"
+
+    append_rows(raw_csv, raw_frame.iloc[2500:])
+    delta = read_delta(state)
+    assert len(delta) == 500
+    assert delta["notas"].dtype == np.float64
+    np.testing.assert_array_equal(delta["notas"].to_numpy(), raw_frame["notas"].iloc[2500:].to_numpy())
+    assert delta["ausencias"].dtype == np.int8
+
+    # Rewriting a row already processed is not an append
+    rewritten = raw_frame.copy()
+    rewritten.loc[3, "notas"] = 99.0
+    rewritten.to_csv(raw_csv, index=False)
+    with pytest.raises(ValueError):
+        read_delta(state)
+
+
+def test_conform_casts_only_when_values_fit():
+    df = pd.DataFrame({"a": [1.0, 2.0], "b": [1, None], "c": [1, 300], "d": ["x", "z"]})
+    out = _conform(df, {"a": "float32", "b": "int8", "c": "int8", "d": pd.CategoricalDtype(["x", "y"])})
+    assert out["a"].dtype == np.float32
+    assert out["b"].dtype == np.float64 and out["c"].dtype == np.int64 and out["d"].dtype == object
+
+
+@pytest.mark.parametrize("model", [RandomForestClassifier(n_estimators=20, random_state=0),
+                                   HistGradientBoostingClassifier(max_iter=20, random_state=0)])
+def test_grow_model_adds_trees(model):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 4))
+    y = (X[:, 0] + rng.normal(scale=0.5, size=400) > 0).astype(int)
+    model.fit(X[:300], y[:300])
+    added = grow_model(model, X, y, share=0.25)
+    assert added > 0
+    if hasattr(model, "estimators_"):
+        assert len(model.estimators_) == model.n_estimators == 20
+    else:
+        assert model.n_iter_ == 20 + added
+    assert model.score(X, y) > 0.7
+
+
+
+def test_out_of_core_build_without_profile_records_the_raw_rows(raw_frame, workdir, monkeypatch):
+    import main
+
+    monkeypatch.setenv("AGENT_MODEL", "stub")
+    os.makedirs(os.path.join("data", "raw"))
+    raw_frame.to_csv(os.path.join("data", "raw", "Synth.csv"), index=False)
+
+    def no_profile(*args, **kwargs):
+        raise MemoryError("sin memoria")
+
+    def answer(function, agent, prompt, **kwargs):
+        # Without a profile the plan comes from the Director LLM (and the report from the narrator)
+        if agent == "director":
+            return SimpleNamespace(content={"null_strategy": "drop", "outliers_strategy": "drop", "encoding_strategy": "get_dummies", "use_smote": "no"})
+        return SimpleNamespace(content="Informe")
+
+    monkeypatch.setattr(main, "profile_csv_chunked", no_profile)
+    monkeypatch.setattr(main, "get_agent", lambda name: name)
+    monkeypatch.setattr(main, "retry", answer)
+    summary = main.main(["--out-of-core", "--chunksize", "700", "--tools-first", "--no-cache", "--no-stage-cache", "--no-snapshots"])
+    assert summary["shape_raw"] == (3000, 8)
+    state = joblib.load(os.path.join("data", "clean_data", "Synth_state.joblib"))
+    assert state["rows"] == 3000
@@ -0,0 +1,175 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from utils import scheduler as scheduling
+from utils.scheduler import RequestScheduler, TokenBucket, is_retryable, retry_delay
+
+
+class ModelError(Exception):
+    def __init__(self, code, message="", headers=None, details=None):
+        super().__init__(message or f"{code} error")
+        self.status_code = code
+        self.response = SimpleNamespace(headers=headers or {})
+        self.details = details
+
+
+def fast_scheduler(**kwargs):
+    # Quota large enough that the buckets never make a request wait
+    return RequestScheduler(rpm=10_000, tpm=10_000_000, **kwargs)
+
+
+def test_token_bucket_reservations_wait_in_order():
+    bucket = TokenBucket(limit=60, burst=2) # 58 units refilled per minute
+    now = bucket.updated
+    assert bucket.reserve(2, now) == 0.0
+    first = bucket.reserve(1, now)
+    second = bucket.reserve(1, now)
+    assert first == pytest.approx(60 / 58) and second == pytest.approx(2 * 60 / 58)
+    # Once the debt is paid off, the burst is available again
+    assert bucket.reserve(1, now + 3 * 60 / 58) == pytest.approx(0.0, abs=1e-9)
+
+
+def test_retry_delay_sources():
+    assert retry_delay(ModelError(429, headers={"retry-after": "7"})) == 7.0
+    details = {"error": {"details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "37s"}]}}
+    assert retry_delay(ModelError(429, details=details)) == 37.0
+    assert retry_delay(ModelError(429, "Quota exceeded. Please retry in 12.5s.")) == 12.5
+    # The delay of a wrapped error is found through its cause
+    try:
+        try:
+            raise ModelError(429, headers={"retry-after": "3"})
+        except ModelError as e:
+            raise RuntimeError("model failed") from e
+    except RuntimeError as wrapped:
+        assert retry_delay(wrapped) == 3.0 and is_retryable(wrapped)
+    assert retry_delay(ModelError(503)) is None
+    assert not is_retryable(ModelError(400))
+
+
+def test_transient_errors_back_off_and_retry(monkeypatch):
+    monkeypatch.setattr(scheduling.random, "uniform", lambda low, high: high)
+    sleeps = []
+    monkeypatch.setattr(scheduling.time, "sleep", sleeps.append)
+    failures = iter([ModelError(503), ModelError(503)])
+
+    def request():
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        return "ok"
+
+    scheduler = fast_scheduler(base_wait=1.0)
+    assert scheduler.call(request) == "ok"
+    assert sleeps == [1.0, 2.0] # Exponential backoff: base_wait * 2^attempt
+    assert scheduler.metrics()["retries"] == 2 and scheduler.metrics()["requests"] == 3
+
+
+def test_errors_that_are_not_retried(monkeypatch):
+    monkeypatch.setattr(scheduling.time, "sleep", lambda seconds: None)
+    scheduler = fast_scheduler(attempts=3)
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise ModelError(400)
+
+    with pytest.raises(ModelError):
+        scheduler.call(bad_request)
+    assert len(calls) == 1
+
+    def unavailable():
+        calls.append(1)
+        raise ModelError(503)
+
+    with pytest.raises(ModelError):
+        scheduler.call(unavailable)
+    assert len(calls) == 1 + 3 # All the attempts, then the last error
+
+
+def test_rate_limit_pauses_every_caller(monkeypatch):
+    monkeypatch.setattr(scheduling.random, "uniform", lambda low, high: 0.0)
+    scheduler = fast_scheduler()
+    failures = iter([ModelError(429, headers={"retry-after": "0.3"})])
+
+    def request():
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        return time.monotonic()
+
+    start = time.monotonic()
+    assert scheduler.call(request) - start >= 0.3
+    # Another caller arriving during the pause also waits for it
+    assert scheduler._paused_until >= start + 0.3
+    assert scheduler.metrics()["throttled"] == 1
+
+
+def test_concurrency_slots_limit_requests_in_flight():
+    scheduler = fast_scheduler(max_concurrency=2)
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def request():
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+
+    threads = [threading.Thread(target=scheduler.call, args=(request,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert state["peak"] == 2
+    assert scheduler.metrics()["requests"] == 6
+
+
+def test_backoff_releases_the_concurrency_slot(monkeypatch):
+    # A request backing off after a 503 must not hold the only slot
+    monkeypatch.setattr(scheduling.random, "uniform", lambda low, high: high)
+    scheduler = fast_scheduler(max_concurrency=1, base_wait=0.5)
+    events = []
+    failed = threading.Event()
+
+    def flaky():
+        if not failed.is_set():
+            failed.set()
+            raise ModelError(503)
+        events.append("flaky")
+
+    def other():
+        events.append("other")
+
+    first = threading.Thread(target=scheduler.call, args=(flaky,))
+    first.start()
+    failed.wait()
+    start = time.monotonic()
+    scheduler.call(other)
+    assert time.monotonic() - start < 0.4 # Sent during the backoff of the first request
+    first.join()
+    assert events == ["other", "flaky"]
+
+
+def test_stream_retries_before_the_first_chunk(monkeypatch):
+    monkeypatch.setattr(scheduling.time, "sleep", lambda seconds: None)
+    scheduler = fast_scheduler()
+    failures = iter([ModelError(503)])
+
+    def chunks():
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        yield from ("a", "b")
+
+    assert list(scheduler.stream(chunks)) == ["a", "b"]
+    assert scheduler.metrics()["retries"] == 1
+
+    def broken():
+        yield "a"
+        raise ModelError(503)
+
+    with pytest.raises(ModelError):
+        list(scheduler.stream(broken))
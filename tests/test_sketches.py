@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from utils.sketches import HyperLogLog, KLLSketch, hash_values
+
+
+def test_hash_values_ignores_the_numeric_type():
+    np.testing.assert_array_equal(hash_values(np.array([1, 2, 3])), hash_values(np.array([1.0, 2.0, 3.0])))
+
+
+def test_hyperloglog_is_exact_below_the_limit():
+    sketch = HyperLogLog(exact_limit=1000)
+    sketch.update(hash_values(np.arange(800) % 500))
+    assert sketch.count() == 500
+
+
+@pytest.mark.parametrize("distinct", [20_000, 200_000])
+def test_hyperloglog_estimate_within_error(distinct):
+    sketch = HyperLogLog(p=12, exact_limit=1000)
+    values = np.arange(distinct)
+    for chunk in np.array_split(values, 7):
+        sketch.update(hash_values(chunk))
+    assert abs(sketch.count() - distinct) / distinct < 0.05
+
+
+def test_hyperloglog_merge_equals_single_sketch():
+    values = np.arange(50_000)
+    whole, left, right = HyperLogLog(exact_limit=100), HyperLogLog(exact_limit=100), HyperLogLog(exact_limit=100)
+    whole.update(hash_values(values))
+    left.update(hash_values(values[:30_000]))
+    right.update(hash_values(values[20_000:]))
+    left.merge(right)
+    assert left.count() == whole.count()
+
+
+def test_kll_exact_mode_matches_numpy():
+    values = np.random.default_rng(0).normal(size=150)
+    sketch = KLLSketch(k=200)
+    sketch.update(values)
+    assert sketch.exact
+    for q in (0.0, 0.25, 0.5, 0.75, 1.0):
+        assert sketch.quantile(q) == pytest.approx(np.quantile(values, q))
+    assert sketch.count_below(0.0) == np.count_nonzero(values < 0.0)
+
+
+def test_kll_rank_error_after_compaction():
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(size=200_000)
+    left, right = KLLSketch(k=200), KLLSketch(k=200, seed=1)
+    for chunk in np.array_split(values[:120_000], 12):
+        left.update(chunk)
+    right.update(values[120_000:])
+    left.merge(right)
+    assert not left.exact and left.n == values.size
+    ordered = np.sort(values)
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        rank = np.searchsorted(ordered, left.quantile(q)) / values.size
+        assert abs(rank - q) < 0.02
+    below = left.count_below(np.quantile(values, 0.9))
+    assert abs(below - 0.9 * values.size) < 0.02 * values.size
+
+
+def test_kll_ignores_nulls_and_handles_empty():
+    sketch = KLLSketch()
+    assert np.isnan(sketch.quantile(0.5))
+    sketch.update(np.array([1.0, np.nan, 3.0]))
+    assert sketch.n == 2
+    assert sketch.quantile(0.5) == 2.0
@@ -0,0 +1,81 @@
+import os
+import time
+import pandas as pd
+import pytest
+from utils.stage_cache import StageCache
+from utils.store import store
+
+
+def age(path, seconds):
+    # Moves the last access time of a cache entry into the past
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+@pytest.fixture
+def dataset(raw_csv, monkeypatch):
+    monkeypatch.setattr(store, "snapshots", False)
+    return store.load(raw_csv, handle="Synth")
+
+
+def test_stage_cache_round_trip(dataset):
+    cache = StageCache(folder="stages")
+    df = store.get(dataset).dropna()
+    store.put("Synth_no_nulls", df, parent=dataset)
+    assert cache.record("no_nulls", dataset, {"strategy": "drop"}, "Synth_no_nulls")
+
+    assert not cache.restore("no_nulls", dataset, {"strategy": "knn"}, "Synth_other")
+    assert cache.restore("no_nulls", dataset, {"strategy": "drop"}, "Synth_restored")
+    pd.testing.assert_frame_equal(store.get("Synth_restored"), df)
+
+
+def test_stage_cache_files(dataset, tmp_path):
+    cache = StageCache(folder="stages")
+    report = tmp_path / "Synth_vocabulary.json"
+    report.write_text("{}")
+    cache.record_files("vocabulary", dataset, {}, [str(report), str(tmp_path / "missing.png")], text="informe")
+    destination = tmp_path / "restored"
+    destination.mkdir()
+    meta = cache.restore_files("vocabulary", dataset, {}, str(destination))
+    assert meta["files"] == ["Synth_vocabulary.json"] and meta["text"] == "informe"
+    assert (destination / "Synth_vocabulary.json").read_text() == "{}"
+    assert cache.restore_files("vocabulary", dataset, {"other": 1}, str(destination)) is None
+
+
+def test_stage_cache_evicts_least_recently_used(dataset):
+    cache = StageCache(folder="stages")
+    store.put("Synth_no_nulls", store.get(dataset).dropna(), parent=dataset)
+    entry = lambda n: cache.entry(cache.key("no_nulls", dataset, {"n": n}))
+    for n in (1, 2):
+        cache.record("no_nulls", dataset, {"n": n}, "Synth_no_nulls")
+    size = sum(f.stat().st_size for f in os.scandir(entry(1)))
+    age(os.path.join(entry(1), "meta.json"), 200)
+    age(os.path.join(entry(2), "meta.json"), 100)
+    assert cache.restore("no_nulls", dataset, {"n": 1}, "Synth_restored") # Hit: entry 1 becomes the most recently used
+
+    cache.max_bytes = int(size * 2.5)
+    cache.record("no_nulls", dataset, {"n": 3}, "Synth_no_nulls")
+    assert os.path.exists(entry(1))
+    assert not os.path.exists(entry(2))
+    assert os.path.exists(entry(3))
+
+    # An entry larger than the cap is still kept until the next one is written
+    cache.max_bytes = 1
+    cache.record("no_nulls", dataset, {"n": 4}, "Synth_no_nulls")
+    assert sorted(os.listdir("stages")) == [os.path.basename(entry(4))]
+
+
+def test_stage_params_follow_the_arguments_of_the_tool_call():
+    from types import SimpleNamespace
+    import main
+
+    planned = main.stage_params("nan_imputer", {"filepath": "Synth", "strategy": "knn", "chunksize": 500})
+    assert planned == {"strategy": "knn", "n_neighbors": 5, "sample_size": 0}
+    assert main.stage_params("one_hot", {"filepath": "Synth"}) == {"max_levels": 0, "min_frequency": 0, "sparse": False, "vocabulary": ""}
+
+    # The agent chose more neighbours than the plan implies: the stage is keyed by its choice
+    agent_run = SimpleNamespace(tools=[SimpleNamespace(tool_name="manage_nulls", tool_args={"filepath": "Synth", "strategy": "knn", "n_neighbors": 7})])
+    assert main.called_params("nan_imputer", agent_run) == dict(planned, n_neighbors=7)
+    replayed = SimpleNamespace(tools=[{"name": "manage_nulls", "args": {"filepath": "Synth", "strategy": "knn"}}])
+    assert main.called_params("nan_imputer", replayed) == planned
+    assert main.called_params("nan_imputer", SimpleNamespace(tools=[])) is None
@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import PLAN, assert_same_frame, run_agent_stages
+from utils import streaming
+from utils.artifacts import read_frame
+from utils.loader import loader
+from utils.preprocessing import compile_plan
+from utils.store import store
+from utils.streaming import StreamingQuantiles, fit_chunked, fit_transform_chunked, _mode
+
+CHUNKSIZE = 350
+
+
+def test_chunked_pipeline_matches_agent_stages(raw_csv, workdir, in_memory):
+    output = os.path.join(workdir, "chunked.parquet")
+    stats = fit_transform_chunked(compile_plan(PLAN), raw_csv, output, CHUNKSIZE)
+    assert stats["chunks"] > 1
+    assert_same_frame(read_frame(output), in_memory)
+
+
+@pytest.mark.parametrize("artifact_format", ["parquet", "feather", "csv"])
+def test_out_of_core_stages_match_agent_stages(raw_csv, workdir, in_memory, monkeypatch, artifact_format):
+    monkeypatch.setattr(store, "artifact_format", artifact_format)
+    assert_same_frame(run_agent_stages(raw_csv, workdir, chunksize=CHUNKSIZE), in_memory)
+
+
+def test_fit_chunked_fits_the_same_parameters(raw_csv, monkeypatch):
+    # A tiny initial margin makes the sketch ranges miss, so the exact quantiles need the widening retries
+    monkeypatch.setattr(streaming, "QUANTILE_MARGIN", 1e-6)
+    df = loader.read(raw_csv)
+    expected = compile_plan(PLAN).fit(df)
+    chunked = fit_chunked(compile_plan(PLAN), raw_csv, CHUNKSIZE)
+
+    nulls, nulls_chunked = expected.named_steps["nulls"], chunked.named_steps["nulls"]
+    assert nulls.fill_values_ == nulls_chunked.fill_values_
+    outliers, outliers_chunked = expected.named_steps["outliers"], chunked.named_steps["outliers"]
+    pd.testing.assert_series_equal(outliers.lower_, outliers_chunked.lower_)
+    pd.testing.assert_series_equal(outliers.upper_, outliers_chunked.upper_)
+    encoder, encoder_chunked = expected.named_steps["encoding"].encoder_, chunked.named_steps["encoding"].encoder_
+    assert encoder.vocabulary == encoder_chunked.vocabulary
+    assert encoder.target == encoder_chunked.target
+
+
+def test_fit_chunked_rejects_knn(raw_csv):
+    with pytest.raises(ValueError):
+        fit_chunked(compile_plan(dict(PLAN, null_strategy="knn")), raw_csv, CHUNKSIZE)
+
+
+def test_streaming_quantiles_are_exact_after_retries():
+    rng = np.random.default_rng(3)
+    values = np.concatenate([rng.integers(0, 50, 20_000).astype(float), rng.normal(size=5000)])
+    rng.shuffle(values)
+    values[rng.choice(values.size, 500, replace=False)] = np.nan
+    quantiles = StreamingQuantiles(["x"], (0.25, 0.5, 0.75), k=64)
+    quantiles.margin = 1e-6
+    passes = 0
+    while not quantiles.done:
+        for start in range(0, values.size, 1000):
+            quantiles.collect(values[start:start + 1000, None])
+        quantiles.end_pass()
+        passes += 1
+    assert passes > 2
+    valid = values[~np.isnan(values)]
+    for q in (0.25, 0.5, 0.75):
+        assert quantiles.quantile("x", q) == np.quantile(valid, q)
+
+
+def test_mode_breaks_ties_like_pandas():
+    series = pd.Series(["b", "a", "c", "b", "a", "c", "d"])
+    assert _mode(series.value_counts()) == series.mode().iloc[0] == "a"
+    assert _mode(pd.Series([0, 0], index=["x", "y"])) is None
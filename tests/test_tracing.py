@@ -0,0 +1,17 @@
+import subprocess
+import sys
+import pytest
+from utils.tracing import PeakRSS, rss_bytes, tree_rss_bytes
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="lee /proc")
+def test_peak_rss_counts_the_child_processes():
+    # A worker process holding 64 MB, like a loky worker training a model
+    code = "import time; block = b'x' * (64 * 2 ** 20); print(flush=True); time.sleep(0.5)"
+    with PeakRSS(interval=0.01) as own, PeakRSS(interval=0.01, children=True) as tree:
+        worker = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE)
+        worker.stdout.readline() # The block is allocated
+        assert tree_rss_bytes() - rss_bytes() > 60 * 2 ** 20
+        worker.wait()
+    assert tree.delta_mb > 60
+    assert own.delta_mb < 60
@@ -0,0 +1,205 @@
+import os
+import shutil
+import importlib.util
+import pandas as pd
+from utils.tracing import tracer
+
+# Artifact format -> file extension of the stage outputs in processed_data and clean_data
+FORMATS = {"parquet": ".parquet", "feather": ".feather", "csv": ".csv"}
+# Parquet (zstd compressed) when pyarrow is installed, CSV otherwise
+DEFAULT_FORMAT = "parquet" if importlib.util.find_spec("pyarrow") else "csv"
+PARQUET_COMPRESSION = "zstd"
+
+
+def file_format(path):
+    """Artifact format of a path from its extension ('csv' for anything unknown)."""
+    extension = os.path.splitext(path)[1].lower()
+    return next((name for name, ext in FORMATS.items() if ext == extension), "csv")
+
+
+def write_frame(df, path):
+    """
+    Writes a DataFrame in the format of its extension. The file is written aside
+    and renamed, so a path that is a hard link of another artifact (see
+    link_or_copy) is replaced instead of modified, and readers never see half a file.
+
+    Feather files are written uncompressed, so that read_frame can memory-map them.
+
+    Args:
+        df (pd.DataFrame): Data (sparse columns are written dense in the binary formats).
+        path (str): Destination path (.parquet, .feather or .csv).
+
+    Returns:
+        str: The path.
+    """
+    kind = file_format(path)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with tracer.span(f"write_{kind}", "io", path=path, rows_in=df.shape[0], cols_in=df.shape[1]):
+        if kind == "csv":
+            df.to_csv(tmp, index=False)
+        else:
+            df = _columnar(df)
+            if kind == "parquet":
+                df.to_parquet(tmp, index=False, compression=PARQUET_COMPRESSION)
+            else:
+                df.reset_index(drop=True).to_feather(tmp, compression="uncompressed")
+        os.replace(tmp, path)
+    return path
+
+
+def read_frame(path, columns=None):
+    """
+    Reads an artifact written by write_frame. Only the requested columns are read
+    from Parquet and Feather files; Feather files are memory-mapped, so numeric
+    columns without nulls are not copied.
+
+    Args:
+        path (str): Artifact path.
+        columns (list): Read only these columns (default: all).
+
+    Returns:
+        pd.DataFrame: The data.
+    """
+    kind = file_format(path)
+    with tracer.span(f"read_{kind}", "io", path=path, bytes=os.path.getsize(path)) as span:
+        if kind == "parquet":
+            df = pd.read_parquet(path, columns=columns)
+        elif kind == "feather":
+            from pyarrow import feather
+            df = feather.read_table(path, columns=columns, memory_map=True).to_pandas(split_blocks=True)
+        else:
+            df = pd.read_csv(path, usecols=columns)
+        span.set(rows_out=df.shape[0], cols_out=df.shape[1])
+    return df
+
+
+def iter_frames(path, chunksize, columns=None):
+    """
+    Streams a Parquet or Feather artifact in chunks of rows.
+
+    Args:
+        path (str): Artifact path (.parquet or .feather).
+        chunksize (int): Rows per chunk.
+        columns (list): Read only these columns (default: all).
+
+    Yields:
+        pd.DataFrame: Consecutive chunks.
+    """
+    if file_format(path) == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    from pyarrow import feather
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    for start in range(0, table.num_rows, chunksize):
+        yield table.slice(start, chunksize).to_pandas()
+
+
+class FrameWriter:
+    """
+    Writes a DataFrame chunk by chunk in the format of its extension (out-of-core
+    stages): CSV rows are appended, Parquet chunks become row groups and Feather
+    chunks record batches. Every chunk is cast to the schema of the first one.
+
+    Args:
+        path (str): Destination path.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.kind = file_format(path)
+        self.tmp = f"{path}.tmp-{os.getpid()}"
+        self._writer = None
+        self._schema = None
+        self.chunks = 0
+
+    def write(self, df):
+        """Appends one chunk."""
+        if self.kind == "csv":
+            df.to_csv(self.tmp, mode="w" if self.chunks == 0 else "a", header=self.chunks == 0, index=False)
+        else:
+            import pyarrow as pa
+            table = pa.Table.from_pandas(_columnar(df), schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                if self.kind == "parquet":
+                    import pyarrow.parquet as pq
+                    self._writer = pq.ParquetWriter(self.tmp, self._schema, compression=PARQUET_COMPRESSION)
+                else:
+                    self._writer = pa.ipc.new_file(self.tmp, self._schema)
+            self._writer.write_table(table)
+        self.chunks += 1
+
+    def close(self):
+        """Finishes the file and moves it to its path."""
+        if self._writer is not None:
+            self._writer.close()
+        if self.chunks:
+            os.replace(self.tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            if self._writer is not None:
+                self._writer.close()
+            if os.path.exists(self.tmp):
+                os.remove(self.tmp)
+        return False
+
+
+def append_frame(df, path):
+    """
+    Adds rows at the end of an artifact. CSV files are appended to in place (after
+    breaking a hard link, so the files it shares its data with are not modified);
+    Parquet and Feather files are rewritten.
+
+    Args:
+        df (pd.DataFrame): Rows, with the columns of the artifact in its order.
+        path (str): Artifact path.
+    """
+    if file_format(path) != "csv":
+        write_frame(pd.concat([read_frame(path), df], ignore_index=True), path)
+        return
+    if os.stat(path).st_nlink > 1:
+        tmp = f"{path}.tmp-{os.getpid()}"
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, path)
+    with tracer.span("append_csv", "io", path=path, rows_in=df.shape[0]):
+        df.to_csv(path, mode="a", header=False, index=False)
+
+
+def link_or_copy(source, destination):
+    """
+    Makes destination a hard link of source (no bytes copied), or a copy if the
+    file system does not allow it. Artifacts are never modified in place
+    (write_frame and append_frame replace them), so linked files stay independent.
+
+    Args:
+        source (str): Existing file.
+        destination (str): New path (replaced if it exists).
+
+    Returns:
+        str: The destination.
+    """
+    tmp = f"{destination}.tmp-{os.getpid()}"
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, destination)
+    return destination
+
+
+def _columnar(df):
+    # Arrow needs dense columns and text column names
+    sparse = [col for col, dtype in df.dtypes.items() if isinstance(dtype, pd.SparseDtype)]
+    if sparse:
+        df = df.astype({col: df[col].dtype.subtype for col in sparse})
+    if not all(isinstance(col, str) for col in df.columns):
+        df = df.rename(columns=str)
+    return df
@@ -0,0 +1,206 @@
+import json
+import datetime
+import numpy as np
+import pandas as pd
+
+# Level that groups the rare categories when the vocabulary is capped
+OTHER_LEVEL = "__otros__"
+
+
+class CategoricalEncoder:
+    """
+    One-hot encoder with a persistable vocabulary.
+
+    Every categorical feature is encoded in one shot from its category codes into
+    uint8 columns (or a sparse block), dropping the first level like
+    pd.get_dummies(drop_first=True). Binary columns keep their original name.
+    The target variable (last column) stays last, label-encoded into a single
+    column when it is categorical.
+
+    Args:
+        max_levels (int): If > 0, keep only the most frequent levels of each feature and
+            group the rest under OTHER_LEVEL.
+        min_frequency (int): If > 0, group the levels seen fewer times under OTHER_LEVEL.
+    """
+
+    def __init__(self, max_levels=0, min_frequency=0):
+        self.max_levels = max_levels
+        self.min_frequency = min_frequency
+        self.vocabulary = {}
+        self.target = None
+
+    def fit(self, df, columns, target=None):
+        """
+        Learns the levels of the categorical columns.
+
+        Args:
+            df (pd.DataFrame): Training data.
+            columns (list): Categorical columns to encode.
+            target (str): Categorical target column to label-encode, if any.
+
+        Returns:
+            CategoricalEncoder: self.
+        """
+        return self.fit_counts({col: df[col].value_counts() for col in columns}, target=target)
+
+    def fit_counts(self, level_counts, target=None):
+        """
+        Learns the levels from their counts, e.g. accumulated over the chunks of a file.
+
+        Args:
+            level_counts (dict): Categorical column -> pd.Series with the count of every level.
+            target (str): Categorical target column to label-encode, if any.
+
+        Returns:
+            CategoricalEncoder: self.
+        """
+        self.vocabulary = {}
+        self.target = target
+        for col, counts in level_counts.items():
+            counts = counts[counts > 0].sort_values(ascending=False, kind="stable") # Category columns also count their unused levels
+            capped = col != target and (self.max_levels > 0 or self.min_frequency > 0)
+            if capped:
+                keep = counts[counts >= max(self.min_frequency, 1)]
+                if self.max_levels > 0:
+                    keep = keep.iloc[:self.max_levels]
+                other = len(keep) < len(counts)
+                levels = _sorted_levels(keep.index)
+                if other:
+                    levels.append(OTHER_LEVEL)
+            else:
+                other = False
+                levels = _sorted_levels(counts.index)
+            self.vocabulary[col] = {"levels": levels, "other": other}
+        return self
+
+    def transform(self, df, sparse=False):
+        """
+        Encodes a DataFrame with the fitted vocabulary. Unseen levels are mapped to
+        OTHER_LEVEL when it exists, otherwise to all-zero rows.
+
+        Args:
+            df (pd.DataFrame): Data to encode.
+            sparse (bool): Return the one-hot blocks as pandas sparse columns (default False).
+
+        Returns:
+            pd.DataFrame: Non-categorical columns, encoded features and the target last.
+        """
+        encoded_cols = [col for col in self.vocabulary if col in df.columns]
+        features = [col for col in encoded_cols if col != self.target]
+        # The target (last column, unless it is an encoded feature: scoring data has no target) stays last
+        target = self.target if self.target in df.columns else (df.columns[-1] if df.columns[-1] not in features else None)
+        blocks = [df.drop(columns=[col for col in df.columns if col in encoded_cols or col == target])]
+        for col in features:
+            blocks.append(self._one_hot(df[col], col, sparse))
+        if target in encoded_cols:
+            codes = self._codes(df[target], target)
+            blocks.append(pd.DataFrame({target: codes.astype(_code_dtype(len(self.vocabulary[target]["levels"])))}, index=df.index))
+        elif target is not None:
+            blocks.append(df[[target]])
+        # Single concatenation of all blocks
+        return pd.concat(blocks, axis=1)
+
+    def fit_transform(self, df, columns, target=None, sparse=False):
+        """Fits the vocabulary and encodes the same DataFrame."""
+        return self.fit(df, columns, target).transform(df, sparse=sparse)
+
+    def output_columns(self, col):
+        """Names of the columns generated for a categorical feature."""
+        levels = self.vocabulary[col]["levels"]
+        if len(levels) <= 2:
+            return [col]
+        return [f"{col}_{level}" for level in levels[1:]]
+
+    def _codes(self, series, col):
+        entry = self.vocabulary[col]
+        values = series
+        if entry["other"]:
+            known = pd.Index(entry["levels"][:-1])
+            values = series.astype(object).where(series.isna() | series.isin(known), OTHER_LEVEL)
+        return pd.Categorical(values, categories=entry["levels"]).codes
+
+    def _one_hot(self, series, col, sparse):
+        codes = self._codes(series, col)
+        n_levels = len(self.vocabulary[col]["levels"])
+        rows = np.flatnonzero(codes >= 0)
+        if sparse:
+            from scipy import sparse as sp
+            matrix = sp.csr_matrix(
+                (np.ones(len(rows), dtype=np.uint8), (rows, codes[rows])),
+                shape=(len(series), max(n_levels, 1)),
+            )[:, 1:]
+            block = pd.DataFrame.sparse.from_spmatrix(matrix, index=series.index)
+        else:
+            matrix = np.zeros((len(series), max(n_levels, 1)), dtype=np.uint8)
+            matrix[rows, codes[rows]] = 1
+            block = pd.DataFrame(matrix[:, 1:], index=series.index)
+        block.columns = self.output_columns(col)[:block.shape[1]]
+        return block
+
+    def save(self, path):
+        """
+        Writes the vocabulary as JSON. Column names and levels keep their type, so
+        the loaded vocabulary matches the raw values (e.g. int, bool or date levels).
+        """
+        data = {
+            "max_levels": self.max_levels,
+            "min_frequency": self.min_frequency,
+            "target": _to_json(self.target),
+            # A list, not an object: JSON object keys would turn every column name into text
+            "vocabulary": [{"column": _to_json(col), "levels": [_to_json(level) for level in entry["levels"]], "other": entry["other"]}
+                           for col, entry in self.vocabulary.items()],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a vocabulary written by save."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        encoder = cls(max_levels=data["max_levels"], min_frequency=data["min_frequency"])
+        encoder.target = _from_json(data["target"])
+        vocabulary = data["vocabulary"]
+        if isinstance(vocabulary, dict):
+            # Older files: levels and column names as plain JSON values
+            encoder.vocabulary = vocabulary
+        else:
+            encoder.vocabulary = {_from_json(entry["column"]): {"levels": [_from_json(level) for level in entry["levels"]], "other": entry["other"]}
+                                  for entry in vocabulary}
+        return encoder
+
+
+def _to_json(value):
+    # JSON keeps str, int, float, bool and None; dates and durations are tagged with their type
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, (datetime.datetime, np.datetime64)):
+        return {"type": "timestamp", "value": pd.Timestamp(value).isoformat()}
+    if isinstance(value, datetime.date):
+        return {"type": "date", "value": value.isoformat()}
+    if isinstance(value, (datetime.timedelta, np.timedelta64)):
+        return {"type": "timedelta", "value": pd.Timedelta(value).isoformat()}
+    raise TypeError(f"Tipo de nivel no admitido en el vocabulario: {type(value).__name__} ({value!r})")
+
+
+def _from_json(value):
+    if not isinstance(value, dict):
+        return value
+    parse = {"timestamp": pd.Timestamp, "date": datetime.date.fromisoformat, "timedelta": pd.Timedelta}[value["type"]]
+    return parse(value["value"])
+
+
+def _sorted_levels(index):
+    # Same level order as pd.get_dummies (sorted); mixed types are sorted by their text
+    levels = pd.Index(index).tolist()
+    try:
+        return sorted(levels)
+    except TypeError:
+        return sorted(levels, key=str)
+
+
+def _code_dtype(n_levels):
+    # Signed, so that nulls and unseen levels keep the code -1
+    return np.int8 if n_levels <= np.iinfo(np.int8).max else np.int32
@@ -0,0 +1,33 @@
+from agno.models.google import Gemini
+from utils.scheduler import scheduler, estimate_tokens
+from utils.tracing import tracer
+
+
+class ScheduledGemini(Gemini):
+    """
+    Gemini model whose requests go through the process-wide scheduler. Each model
+    request (including the ones an agent makes after a tool call) is scheduled and
+    retried on its own, so a rate limit never re-runs the agent's tools.
+    """
+
+    def invoke(self, messages, assistant_message, *args, **kwargs):
+        tokens = estimate_tokens(messages, kwargs.get("tools"))
+        with tracer.span(self.id, "llm", estimated_tokens=tokens):
+            response = scheduler.call(super().invoke, messages, assistant_message, *args, tokens=tokens, **kwargs)
+            _settle(tokens, getattr(response, "response_usage", None))
+        return response
+
+    def invoke_stream(self, messages, assistant_message, *args, **kwargs):
+        tokens = estimate_tokens(messages, kwargs.get("tools"))
+        usage = None
+        with tracer.span(self.id, "llm", estimated_tokens=tokens, stream=True):
+            for chunk in scheduler.stream(super().invoke_stream, messages, assistant_message, *args, tokens=tokens, **kwargs):
+                usage = getattr(chunk, "response_usage", None) or usage
+                yield chunk
+            _settle(tokens, usage)
+
+
+def _settle(tokens, usage):
+    if usage is not None:
+        scheduler.settle(tokens, usage.input_tokens or 0, usage.output_tokens or 0)
+        tracer.current().set(input_tokens=usage.input_tokens or 0, output_tokens=usage.output_tokens or 0)
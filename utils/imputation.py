@@ -0,0 +1,142 @@
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from utils.tracing import PeakRSS, tracer
+
+
+# Below this number of rows with the same missing pattern, neighbours are searched by brute force
+BRUTE_FORCE_ROWS = 1000
+# Donors kept when partially observed rows have to be used as donors (and kept in a fitted pipeline)
+MAX_DONORS = 10_000
+# With partially observed donors, candidates searched per neighbour: some of them miss the imputed column
+PARTIAL_CANDIDATES = 4
+
+
+def knn_impute(df_numeric, n_neighbors=5, sample_size=0, chunk_size=50_000, n_jobs=-1, random_state=42, donors=None):
+    """
+    Scalable KNN imputation of a numeric DataFrame.
+
+    Only the rows that contain nulls are queried. For every pattern of missing
+    columns a tree index (KD-tree / ball tree) is built over the observed columns
+    of the donors, and each missing value is replaced by the mean of its
+    n_neighbors nearest donors. Queries run in chunks on all cores, so the search
+    is O(m log n) instead of O(m * n) for m rows with nulls.
+
+    The donors are the complete rows. When fewer than n_neighbors rows are
+    complete (e.g. wide tables with scattered nulls), partially observed rows are
+    used instead, at most MAX_DONORS of them: distances are measured on the
+    observed columns of the query with the missing donor values at the column
+    mean, and every missing value is the mean of its nearest n_neighbors donors
+    that observed that column.
+
+    Args:
+        df_numeric (pd.DataFrame): Numeric columns to impute.
+        n_neighbors (int): Number of neighbours (default 5).
+        sample_size (int): If > 0, fit the index on at most this many randomly sampled donors.
+        chunk_size (int): Rows with nulls queried per chunk (default 50000).
+        n_jobs (int): Parallel jobs for the neighbour queries (default -1, all cores).
+        random_state (int): Seed of the donor sample.
+        donors (np.ndarray): Rows to take the neighbours from, possibly with nulls, e.g. the
+            donors of a fitted preprocessing pipeline (default: taken from df_numeric).
+
+    Returns:
+        tuple: (imputed DataFrame, stats dict with backend, seconds, peak_mb,
+        rows_imputed, donors and patterns). peak_mb is the resident memory the
+        imputation added on top of what the process held when it started.
+    """
+    with tracer.span("knn_impute", "compute", rows_in=df_numeric.shape[0], cols_in=df_numeric.shape[1]) as span, PeakRSS() as memory:
+        df_imputed, stats = _knn_impute(df_numeric, n_neighbors, sample_size, chunk_size, n_jobs, random_state, donors)
+        span.set(**stats)
+    stats["peak_mb"] = memory.delta_mb
+    return df_imputed, stats
+
+
+def select_donors(values, n_neighbors=5, sample_size=0, random_state=42):
+    """
+    Donor rows of a KNN imputation: the complete rows or, when fewer than
+    n_neighbors rows are complete, the rows with at least one observed value
+    (sampled down to MAX_DONORS).
+
+    Args:
+        values (np.ndarray): Numeric data, NaN for the nulls.
+        n_neighbors (int): Number of neighbours of the imputation.
+        sample_size (int): If > 0, keep at most this many randomly sampled donors.
+        random_state (int): Seed of the sample.
+
+    Returns:
+        np.ndarray: Donor rows.
+    """
+    missing = np.isnan(values)
+    donors = values[~missing.any(axis=1)]
+    if len(donors) < n_neighbors and missing.any():
+        donors = values[~missing.all(axis=1)]
+        sample_size = min(sample_size or MAX_DONORS, MAX_DONORS)
+    if sample_size and len(donors) > sample_size:
+        rng = np.random.default_rng(random_state)
+        donors = donors[rng.choice(len(donors), size=sample_size, replace=False)]
+    return donors
+
+
+def _knn_impute(df_numeric, n_neighbors, sample_size, chunk_size, n_jobs, random_state, donors=None):
+    from sklearn.neighbors import NearestNeighbors
+
+    start = time.perf_counter()
+
+    values = df_numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+    missing = np.isnan(values)
+    incomplete_rows = np.flatnonzero(missing.any(axis=1))
+    if donors is None:
+        donors = select_donors(values, n_neighbors, sample_size, random_state)
+    donor_missing = np.isnan(donors)
+
+    stats = {"backend": "tree", "rows_imputed": int(len(incomplete_rows)), "donors": int(len(donors)), "patterns": 0}
+
+    imputed = values.copy()
+    if len(incomplete_rows) and len(donors):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning) # Columns without any observed donor value
+            means = np.nanmean(donors, axis=0)
+        # Donors with every column observed give the exact KNN means; otherwise all the donors take part
+        complete = ~donor_missing.any(axis=1)
+        partial = complete.sum() < n_neighbors
+        if partial:
+            stats["backend"] = "tree-partial"
+            pool = np.where(donor_missing, np.nan_to_num(means), donors)
+            k = min(len(donors), n_neighbors * PARTIAL_CANDIDATES)
+        else:
+            pool = donors[complete]
+            k = n_neighbors
+        # Group the incomplete rows by their pattern of missing columns
+        patterns, pattern_ids = np.unique(missing[incomplete_rows], axis=0, return_inverse=True)
+        pattern_ids = pattern_ids.reshape(-1)
+        stats["patterns"] = int(len(patterns))
+        for pattern_id, pattern in enumerate(patterns):
+            rows = incomplete_rows[pattern_ids == pattern_id]
+            observed = ~pattern
+            if not observed.any():
+                # Nothing to measure distances on: use the donor means
+                imputed[np.ix_(rows, pattern)] = means[pattern]
+                continue
+            # Few query rows: a brute-force scan is cheaper than building a tree
+            algorithm = "brute" if len(rows) < BRUTE_FORCE_ROWS else "auto"
+            index = NearestNeighbors(n_neighbors=k, algorithm=algorithm, n_jobs=n_jobs).fit(pool[:, observed])
+            donor_targets = (donors if partial else pool)[:, pattern]
+            for chunk_start in range(0, len(rows), chunk_size):
+                chunk = rows[chunk_start:chunk_start + chunk_size]
+                neighbours = index.kneighbors(values[np.ix_(chunk, observed)], return_distance=False)
+                candidates = donor_targets[neighbours]
+                if not partial:
+                    imputed[np.ix_(chunk, pattern)] = candidates.mean(axis=1)
+                    continue
+                # The nearest n_neighbors candidates that observed each column
+                seen = ~np.isnan(candidates)
+                take = seen & (np.cumsum(seen, axis=1) <= n_neighbors)
+                counts = take.sum(axis=1)
+                totals = np.where(take, candidates, 0.0).sum(axis=1)
+                imputed[np.ix_(chunk, pattern)] = np.where(counts > 0, totals / np.maximum(counts, 1), means[pattern])
+
+    stats["seconds"] = time.perf_counter() - start
+
+    df_imputed = pd.DataFrame(imputed, columns=df_numeric.columns, index=df_numeric.index)
+    return df_imputed, stats
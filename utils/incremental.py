@@ -0,0 +1,570 @@
+import os
+import copy
+import time
+import hashlib
+import joblib
+import numpy as np
+import pandas as pd
+from utils.artifacts import read_frame, append_frame
+from utils.loader import loader
+from utils.profiling import is_numeric_column
+from utils.sketches import KLLSketch
+from utils.tracing import tracer
+
+STATE_VERSION = 1
+# Bytes hashed at the start of the file and before the end of the rows already processed, to tell an append from a rewrite
+TAIL_BYTES = 1 << 16
+# Accuracy of the quantile sketches of the running statistics
+SKETCH_K = 2000
+# Bins of the population stability index of numeric columns (reference deciles)
+PSI_BINS = 10
+# Drift thresholds: PSI (on top of its sampling noise, about (bins - 1) / rows), change of the null rate,
+# shift of an IQR bound (fraction of the IQR), share of unseen levels, drop of the test F1 and rows added
+# since the last full build
+PSI_THRESHOLD = 0.25
+NULL_RATE_SHIFT = 0.10
+BOUND_SHIFT = 0.25
+NEW_LEVEL_SHARE = 0.01
+F1_DROP = 0.05
+MAX_GROWTH = 0.5
+
+
+class RunningStats:
+    """
+    Mergeable statistics of the raw columns of a dataset, updated with every batch
+    of appended rows instead of recomputed over the whole file.
+
+    Numeric columns keep their count, nulls, mean and sum of squared deviations
+    (merged with Chan's formula) and a KLL quantile sketch; the other columns keep
+    the count of every level.
+
+    Args:
+        k (int): Accuracy parameter of the sketches (default SKETCH_K).
+    """
+
+    def __init__(self, k=SKETCH_K):
+        self.k = k
+        self.rows = 0
+        self.numeric = {} # column -> {"n", "nulls", "mean", "m2", "sketch"}
+        self.levels = {} # column -> {"nulls", "counts"}
+
+    def update(self, df):
+        """
+        Adds a batch of raw rows.
+
+        Args:
+            df (pd.DataFrame): Rows.
+
+        Returns:
+            RunningStats: self.
+        """
+        batch = RunningStats(self.k)
+        batch.rows = len(df)
+        for col in df.columns:
+            series = df[col]
+            if is_numeric_column(series):
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+                valid = values[~np.isnan(values)]
+                sketch = KLLSketch(k=self.k)
+                sketch.update(valid)
+                batch.numeric[col] = {
+                    "n": len(valid), "nulls": len(values) - len(valid),
+                    "mean": float(valid.mean()) if len(valid) else 0.0,
+                    "m2": float(((valid - valid.mean()) ** 2).sum()) if len(valid) else 0.0,
+                    "sketch": sketch,
+                }
+            else:
+                counts = series.value_counts()
+                counts = counts[counts > 0] # Category columns also count their unused levels
+                counts.index = counts.index.astype(object)
+                batch.levels[col] = {"nulls": int(series.isna().sum()), "counts": counts}
+        return self.merge(batch)
+
+    def merge(self, other):
+        """
+        Merges the statistics of other rows of the same dataset.
+
+        Args:
+            other (RunningStats): Statistics to add.
+
+        Returns:
+            RunningStats: self.
+        """
+        self.rows += other.rows
+        for col, b in other.numeric.items():
+            a = self.numeric.get(col)
+            if a is None:
+                self.numeric[col] = copy.deepcopy(b)
+                continue
+            n = a["n"] + b["n"]
+            delta = b["mean"] - a["mean"]
+            if n:
+                a["m2"] += b["m2"] + delta ** 2 * a["n"] * b["n"] / n
+                a["mean"] += delta * b["n"] / n
+            a["n"], a["nulls"] = n, a["nulls"] + b["nulls"]
+            a["sketch"].merge(b["sketch"])
+        for col, b in other.levels.items():
+            a = self.levels.get(col)
+            if a is None:
+                self.levels[col] = copy.deepcopy(b)
+                continue
+            a["nulls"] += b["nulls"]
+            a["counts"] = a["counts"].add(b["counts"], fill_value=0)
+        return self
+
+    def null_rate(self, col):
+        """Share of null values of a column."""
+        entry = self.numeric.get(col) or self.levels.get(col)
+        total = entry["n"] + entry["nulls"] if "n" in entry else entry["counts"].sum() + entry["nulls"]
+        return entry["nulls"] / total if total else 0.0
+
+    def quantile(self, col, q):
+        """(Approximate) quantile of a numeric column."""
+        return self.numeric[col]["sketch"].quantile(q)
+
+
+def state_path(clean_folder, handle):
+    """Path of the refresh state of a dataset, next to its model bundle."""
+    return os.path.join(clean_folder, f"{handle}_state.joblib")
+
+
+def record_build(path, raw_path, rows, clean_path, bundle_path):
+    """
+    Writes the refresh state of a full build: how much of the raw file it processed,
+    the compact schema it was read with and where its clean data and model bundle are. The reference statistics are
+    computed by the first refresh, so a full run does not pay for them.
+
+    Args:
+        path (str): State path (state_path).
+        raw_path (str): Raw CSV file of the build.
+        rows (int): Rows of the raw file the build read.
+        clean_path (str): Clean data written by the build (CSV, Parquet or Feather).
+        bundle_path (str): Model bundle written by the build.
+    """
+    size = os.path.getsize(raw_path)
+    state = {
+        "version": STATE_VERSION,
+        "source": os.path.abspath(raw_path),
+        "bytes": size,
+        "tail": _tail_hash(raw_path, size),
+        "rows": rows,
+        "built_rows": rows,
+        "schema": loader.schema(raw_path) if loader.compact else {},
+        "clean": clean_path,
+        "bundle": bundle_path,
+        "stats": None,
+        "test": None,
+        "refreshes": [],
+    }
+    _dump(state, path)
+    return path
+
+
+def read_delta(state):
+    """
+    Reads the rows appended to the raw file since the state was written, seeking
+    straight past the rows already processed, with the compact schema of the build.
+    Columns whose new values do not fit it (e.g. nulls in an integer column) keep
+    the pandas default types.
+
+    Args:
+        state (dict): Refresh state.
+
+    Returns:
+        pd.DataFrame: New rows (None if the file has not grown).
+
+    Raises:
+        ValueError: If the file was rewritten or truncated instead of appended to.
+    """
+    path = state["source"]
+    size = os.path.getsize(path)
+    if size < state["bytes"] or _tail_hash(path, state["bytes"]) != state["tail"]:
+        raise ValueError(f"El archivo '{path}' ha cambiado, no solo ha crecido: hace falta una reconstrucción completa.")
+    if size == state["bytes"]:
+        return None
+    columns = pd.read_csv(path, nrows=0).columns.tolist()
+    with tracer.span("read_delta", "io", path=path, bytes=size - state["bytes"]) as span:
+        with open(path, "rb") as f:
+            f.seek(state["bytes"])
+            delta = pd.read_csv(f, header=None, names=columns)
+        delta = _conform(delta, state.get("schema") or {})
+        span.set(rows_out=len(delta))
+    return delta
+
+
+def reference_stats(state, chunksize=100_000):
+    """Running statistics of the rows of the last full build, in one pass by chunks with its schema."""
+    stats = RunningStats()
+    with tracer.span("reference_stats", "compute", path=state["source"]):
+        for chunk in pd.read_csv(state["source"], chunksize=chunksize, nrows=state["rows"], dtype=state.get("schema") or None):
+            stats.update(chunk)
+    return stats
+
+
+def population_stability(reference, current):
+    """
+    Population stability index of a numeric column over the deciles of the reference.
+
+    Args:
+        reference (KLLSketch): Sketch of the reference values.
+        current (KLLSketch): Sketch of the new values.
+
+    Returns:
+        float: PSI (0 if either side is empty).
+    """
+    if reference.n == 0 or current.n == 0:
+        return 0.0
+    edges = np.unique([reference.quantile(i / PSI_BINS) for i in range(1, PSI_BINS)])
+    below_ref = np.array([reference.count_below(edge) for edge in edges] + [reference.n]) / reference.n
+    below_cur = np.array([current.count_below(edge) for edge in edges] + [current.n]) / current.n
+    return _psi(np.diff(below_ref, prepend=0), np.diff(below_cur, prepend=0))
+
+
+def check_drift(reference, delta, preprocessing=None):
+    """
+    Compares the statistics of the new rows with the ones of the data seen so far
+    and with the fitted preprocessing, which is kept frozen by refresh.
+
+    Args:
+        reference (RunningStats): Statistics of the rows already processed.
+        delta (RunningStats): Statistics of the new rows.
+        preprocessing (Pipeline): Fitted preprocessing of the model bundle, if any.
+
+    Returns:
+        list: One dict (column, check, detail) per finding; empty if nothing drifted.
+    """
+    findings = []
+    known = set(reference.numeric) | set(reference.levels)
+    for col in sorted(known - set(delta.numeric) - set(delta.levels)):
+        findings.append({"column": col, "check": "columna ausente", "detail": "no está en las filas nuevas"})
+    for col in sorted(set(delta.numeric) | set(delta.levels)):
+        if col not in known:
+            findings.append({"column": col, "check": "columna nueva", "detail": "no estaba en los datos del modelo"})
+        elif (col in reference.numeric) != (col in delta.numeric):
+            findings.append({"column": col, "check": "cambio de tipo", "detail": "numérica y texto mezclados"})
+        else:
+            shift = delta.null_rate(col) - reference.null_rate(col)
+            if abs(shift) > NULL_RATE_SHIFT:
+                findings.append({"column": col, "check": "nulos", "detail": f"{reference.null_rate(col):.1%} -> {delta.null_rate(col):.1%}"})
+            if col in reference.numeric:
+                psi = population_stability(reference.numeric[col]["sketch"], delta.numeric[col]["sketch"])
+                bins, rows = PSI_BINS, delta.numeric[col]["n"]
+            else:
+                psi = _level_psi(reference.levels[col]["counts"], delta.levels[col]["counts"])
+                bins, rows = len(reference.levels[col]["counts"]) + 1, delta.levels[col]["counts"].sum()
+            if psi > PSI_THRESHOLD + (bins - 1) / max(rows, 1):
+                findings.append({"column": col, "check": "distribución", "detail": f"PSI {psi:.2f}"})
+
+    steps = dict(preprocessing.steps) if preprocessing is not None else {}
+    outliers = steps.get("outliers")
+    if outliers not in (None, "passthrough"):
+        # IQR bounds of the raw data with and without the new rows (the fitted bounds come from
+        # the output of the null step, so they are not comparable with raw statistics)
+        merged = copy.deepcopy(reference).merge(delta)
+        for col in outliers.columns_:
+            if col not in reference.numeric or col not in delta.numeric:
+                continue
+            before, after = _iqr_bounds(reference, col), _iqr_bounds(merged, col)
+            width = (before[1] - before[0]) / 4 # IQR
+            shift = max(abs(after[0] - before[0]), abs(after[1] - before[1]))
+            if width > 0 and shift / width > BOUND_SHIFT:
+                findings.append({"column": col, "check": "límites IQR", "detail": f"[{before[0]:.4g}, {before[1]:.4g}] -> [{after[0]:.4g}, {after[1]:.4g}]"})
+    encoding = steps.get("encoding")
+    if encoding not in (None, "passthrough"):
+        for col, entry in encoding.encoder_.vocabulary.items():
+            if entry["other"] or col not in delta.levels:
+                continue
+            counts = delta.levels[col]["counts"]
+            unseen = counts[~counts.index.isin(entry["levels"])]
+            share = unseen.sum() / counts.sum() if counts.sum() else 0.0
+            if col == encoding.encoder_.target and len(unseen):
+                findings.append({"column": col, "check": "clases nuevas", "detail": ", ".join(map(str, unseen.index[:5]))})
+            elif share > NEW_LEVEL_SHARE:
+                findings.append({"column": col, "check": "niveles nuevos", "detail": f"{share:.1%} de las filas ({', '.join(map(str, unseen.index[:5]))})"})
+    return findings
+
+
+def transform_rows(preprocessing, df):
+    """
+    Applies the fitted preprocessing to new training rows as the full build did
+    with its data: rows with nulls (strategy 'drop') or outliers (strategy 'drop')
+    are dropped, KNN imputes from the stored donors and the rest is clipped or encoded.
+
+    Args:
+        preprocessing (Pipeline): Fitted preprocessing (None: rows unchanged).
+        df (pd.DataFrame): Raw rows, target last.
+
+    Returns:
+        pd.DataFrame: Preprocessed rows.
+    """
+    from utils.preprocessing import NullHandler
+    from utils.streaming import train_transform
+
+    if preprocessing is None:
+        return df
+    for _, step in preprocessing.steps:
+        if step == "passthrough":
+            continue
+        df = step.transform(df) if isinstance(step, NullHandler) and step.strategy == "knn" else train_transform(step, df)
+    return df
+
+
+def grow_model(model, X, y, share):
+    """
+    Updates a fitted model with warm start instead of refitting it. Forests grow
+    as many new trees on X as the share of new rows and drop as many of their
+    oldest ones; gradient boosting adds as many iterations; other models with
+    warm_start refit starting from their current solution.
+
+    Args:
+        model (estimator): Fitted classifier (updated in place).
+        X (array-like): Training features (old and new rows).
+        y (array-like): Training target.
+        share (float): New rows / all the rows.
+
+    Returns:
+        int: Trees or iterations added (0 for a warm refit).
+    """
+    params = model.get_params()
+    if hasattr(model, "estimators_") and "n_estimators" in params:
+        total = len(model.estimators_)
+        added = min(total, max(1, int(np.ceil(total * share))))
+        model.set_params(warm_start=True, n_estimators=total + added)
+        model.fit(X, y)
+        model.estimators_ = model.estimators_[added:]
+        model.set_params(warm_start=False, n_estimators=total)
+        return added
+    if hasattr(model, "n_iter_") and "max_iter" in params and "early_stopping" in params:
+        done = model.n_iter_
+        model.set_params(warm_start=True, max_iter=done + max(1, int(np.ceil(done * share))))
+        model.fit(X, y)
+        model.set_params(warm_start=False)
+        return model.n_iter_ - done
+    if "warm_start" in params:
+        model.set_params(warm_start=True)
+        model.fit(X, y)
+        model.set_params(warm_start=False)
+        return 0
+    model.fit(X, y)
+    return 0
+
+
+def refresh(path, force=False, chunksize=100_000):
+    """
+    Brings a trained dataset up to date with the rows appended to its raw file
+    since the last full build or refresh, without rerunning the pipeline.
+
+    Only the new rows are read, profiled and preprocessed, with the frozen
+    preprocessing and scaler of the model bundle. The running statistics are
+    updated with them and checked for drift (check_drift, plus the F1 of the
+    current model on the new rows and the growth since the last full build). If
+    anything drifted, nothing is changed unless force is set: the caller should
+    rebuild. Otherwise the model is updated with warm start (grow_model) on the old
+    and new training rows, evaluated on the old and new test rows, and the clean
+    data, the bundle and the state are updated.
+
+    Args:
+        path (str): State path written by record_build.
+        force (bool): Apply the refresh even if drift was found.
+        chunksize (int): Rows per chunk of the one-time reference statistics pass.
+
+    Returns:
+        dict: rows (new raw rows), findings, rebuild (drift found and nothing changed),
+        applied, f1_reference and f1_delta (test F1 of the build and F1 on the new rows),
+        metrics_before and metrics_after (on the old and new test rows), added and seconds.
+
+    Raises:
+        ValueError: If the state or the bundle cannot be used, or the raw file was rewritten.
+    """
+    from sklearn.model_selection import train_test_split
+    from utils.inference import load_bundle, save_bundle
+
+    start = time.perf_counter()
+    state = joblib.load(path)
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        raise ValueError(f"Estado de actualización no soportado en '{path}': hace falta una reconstrucción completa.")
+    result = {"rows": 0, "findings": [], "rebuild": False, "applied": False}
+    delta = read_delta(state)
+    if delta is None or delta.empty:
+        result["seconds"] = time.perf_counter() - start
+        return result
+    result["rows"] = len(delta)
+
+    bundle = load_bundle(state["bundle"], mmap=False)
+    model, scaler, target = bundle["model"], bundle["scaler"], bundle["target"]
+    reference = state["stats"] or reference_stats(state, chunksize)
+    delta_stats = RunningStats(reference.k).update(delta)
+    findings = check_drift(reference, delta_stats, bundle["preprocessing"])
+    growth = (state["rows"] + len(delta) - state["built_rows"]) / max(state["built_rows"], 1)
+    if growth > MAX_GROWTH:
+        findings.append({"column": "-", "check": "crecimiento", "detail": f"{growth:.0%} de filas desde la última reconstrucción"})
+
+    # New rows through the frozen preprocessing; rows of classes the model does not know cannot be learned incrementally
+    with tracer.span("refresh_transform", "compute", rows_in=len(delta)) as span:
+        data = transform_rows(bundle["preprocessing"], delta)
+        data = data[data[target].isin(model.classes_)]
+        span.set(rows_out=len(data))
+    X_new = scaler.transform(data.drop(columns=[target]).reindex(columns=bundle["features"], fill_value=0))
+    y_new = data[target].to_numpy()
+    result["f1_reference"] = (bundle["metadata"].get("metrics_test") or {}).get("F1-Score")
+    result["f1_delta"] = _metrics(y_new, model.predict(X_new))["F1-Score"] if len(y_new) else None
+    if result["f1_reference"] is not None and result["f1_delta"] is not None and result["f1_reference"] - result["f1_delta"] > F1_DROP:
+        findings.append({"column": target, "check": "rendimiento", "detail": f"F1 {result['f1_reference']:.3f} (test) -> {result['f1_delta']:.3f} (filas nuevas)"})
+    result["findings"] = findings
+    if (findings and not force) or data.empty:
+        result["rebuild"] = bool(findings)
+        state["stats"] = reference # Kept, so the next attempt does not compute it again
+        _dump(state, path)
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    # Old rows: the clean data of the build, split as the modeling tool did (then the stored split)
+    clean = read_frame(state["clean"])
+    y_old = clean[target].to_numpy()
+    X_old = scaler.transform(clean.drop(columns=[target]).reindex(columns=bundle["features"], fill_value=0))
+    test = state["test"]
+    if test is None:
+        _, test_index = train_test_split(np.arange(len(clean)), test_size=0.2, random_state=42, stratify=y_old)
+        test = np.isin(np.arange(len(clean)), test_index)
+    stratify = y_new if pd.Series(y_new).value_counts().min() >= 2 and len(y_new) >= 10 else None
+    test_new = np.zeros(len(y_new), dtype=bool)
+    if len(y_new) >= 5:
+        _, new_index = train_test_split(np.arange(len(y_new)), test_size=0.2, random_state=42, stratify=stratify)
+        test_new[new_index] = True
+    X_train = np.vstack([X_old[~test], X_new[~test_new]])
+    y_train = np.concatenate([y_old[~test], y_new[~test_new]])
+    X_test = np.vstack([X_old[test], X_new[test_new]])
+    y_test = np.concatenate([y_old[test], y_new[test_new]])
+    if bundle["metadata"].get("use_smote") == "yes":
+        from imblearn.over_sampling import SMOTE
+        X_train, y_train = SMOTE(random_state=42).fit_resample(X_train, y_train)
+
+    result["metrics_before"] = _metrics(y_test, model.predict(X_test))
+    with tracer.span("refresh_model", "compute", rows_in=len(y_train)):
+        result["added"] = grow_model(model, X_train, y_train, share=len(y_new) / (len(y_old) + len(y_new)))
+    result["metrics_after"] = _metrics(y_test, model.predict(X_test))
+
+    # Persist: new clean rows, updated bundle (written aside, then swapped) and state
+    append_frame(_conform(data[clean.columns], clean.dtypes), state["clean"]) # Same column types, so the file schema does not widen
+    metadata = dict(bundle["metadata"], metrics_test=result["metrics_after"],
+                    refreshes=bundle["metadata"].get("refreshes", 0) + 1, refreshed=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    tmp = f"{state['bundle']}.tmp-{os.getpid()}"
+    save_bundle(tmp, model, scaler, bundle["features"], target, preprocessing=bundle["preprocessing"],
+                labels=bundle["labels"], **metadata)
+    os.replace(tmp, state["bundle"])
+    size = os.path.getsize(state["source"])
+    state.update(
+        bytes=size, tail=_tail_hash(state["source"], size), rows=state["rows"] + len(delta),
+        stats=reference.merge(delta_stats), test=np.concatenate([test, test_new]),
+    )
+    state["refreshes"].append({"date": metadata["refreshed"], "rows": len(delta), "clean_rows": len(data),
+                               "added": result["added"], "forced": bool(findings)})
+    _dump(state, path)
+    result["applied"] = True
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def refresh_markdown(result):
+    """
+    Renders the result of refresh as markdown.
+
+    Args:
+        result (dict): Output of refresh.
+
+    Returns:
+        str: Markdown.
+    """
+    if not result["rows"]:
+        return "No hay filas nuevas desde la última ejecución."
+    lines = [f"### Actualización incremental ({result['rows']} filas nuevas, {result['seconds']:.2f} s)"]
+    if result.get("f1_delta") is not None:
+        reference = f"{result['f1_reference']:.3f}" if result.get("f1_reference") is not None else "-"
+        lines.append(f"**F1 del modelo actual en las filas nuevas:** {result['f1_delta']:.3f} (test: {reference})")
+    if result["findings"]:
+        table = "| Columna | Comprobación | Detalle |\n| :--- | :--- | :--- |\n"
+        table += "".join(f"| {f['column']} | {f['check']} | {f['detail']} |\n" for f in result["findings"])
+        lines.append(f"**Drift detectado:**\n{table}")
+    if result["rebuild"]:
+        lines.append("**Hace falta una reconstrucción completa**: el modelo no se ha modificado.")
+    elif result["applied"]:
+        before, after = result["metrics_before"], result["metrics_after"]
+        lines.append(
+            f"| Métrica | Antes | Después |\n| :--- | :--- | :--- |\n"
+            + "".join(f"| **{name}** | {before[name]:.3f} | {after[name]:.3f} |\n" for name in before)
+        )
+        lines.append(f"**Modelo actualizado con warm start** ({result['added']} árboles/iteraciones nuevos).")
+    return "\n\n".join(lines)
+
+
+def _metrics(y_true, y_pred):
+    # Same metrics as the modeling tool (binary averaging for two classes, macro otherwise)
+    from sklearn.metrics import f1_score, accuracy_score, recall_score, precision_score
+
+    average = "binary" if len(np.unique(y_true)) <= 2 else "macro"
+    return {
+        "Accuracy": accuracy_score(y_true, y_pred),
+        "F1-Score": f1_score(y_true, y_pred, average=average, zero_division=0),
+        "Recall": recall_score(y_true, y_pred, average=average, zero_division=0),
+        "Precision": precision_score(y_true, y_pred, average=average, zero_division=0),
+    }
+
+
+def _level_psi(reference, current):
+    # PSI over the levels of a text column; unseen levels count as one more bin
+    levels = reference.index.union(current.index)
+    ref = reference.reindex(levels, fill_value=0).to_numpy(dtype=np.float64)
+    cur = current.reindex(levels, fill_value=0).to_numpy(dtype=np.float64)
+    if ref.sum() == 0 or cur.sum() == 0:
+        return 0.0
+    return _psi(ref / ref.sum(), cur / cur.sum())
+
+
+def _iqr_bounds(stats, col):
+    q1, q3 = stats.quantile(col, 0.25), stats.quantile(col, 0.75)
+    return q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+
+
+def _psi(expected, actual, eps=1e-4):
+    expected = np.clip(expected, eps, None)
+    actual = np.clip(actual, eps, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def _tail_hash(path, end):
+    # Hash of the first TAIL_BYTES bytes of a file and of the TAIL_BYTES bytes before position end
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read(min(TAIL_BYTES, end)))
+        f.seek(max(0, end - TAIL_BYTES))
+        digest.update(f.read(end - max(0, end - TAIL_BYTES)))
+    return digest.hexdigest()
+
+
+def _conform(df, dtypes):
+    # Casts columns to the given types when their values fit (integers without nulls in range, known levels)
+    df = df.copy()
+    for col, dtype in dict(dtypes).items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        dtype = pd.api.types.pandas_dtype(dtype)
+        values = df[col]
+        if isinstance(dtype, pd.CategoricalDtype):
+            if dtype.categories is not None and not values.dropna().isin(dtype.categories).all():
+                continue
+        elif pd.api.types.is_integer_dtype(dtype):
+            if not pd.api.types.is_numeric_dtype(values) or values.isna().any():
+                continue
+            info = np.iinfo(dtype)
+            if len(values) and (values.min() < info.min or values.max() > info.max or (values % 1 != 0).any()):
+                continue
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_numeric_dtype(values):
+            continue
+        df[col] = values.astype(dtype)
+    return df
+
+
+def _dump(state, path):
+    # Written aside and swapped, so an interrupted refresh never leaves half a state
+    tmp = f"{path}.tmp-{os.getpid()}"
+    joblib.dump(state, tmp)
+    os.replace(tmp, path)
@@ -0,0 +1,146 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from utils.tracing import tracer
+
+# Format of the model bundle; bumped whenever its keys change
+BUNDLE_VERSION = 1
+
+
+def save_bundle(path, model, scaler, features, target, preprocessing=None, labels=None, **metadata):
+    """
+    Writes every artifact needed to score new data as one versioned joblib bundle.
+
+    The bundle is written uncompressed, so that load_bundle can memory-map its
+    numpy arrays (KNN donors, coefficients, scaler statistics) instead of copying
+    them. Tree models still copy their nodes when they are unpickled.
+
+    Args:
+        path (str): Destination .joblib path.
+        model (estimator): Fitted classifier.
+        scaler (StandardScaler): Fitted scaler of the features.
+        features (list): Feature columns the model was trained on, in order.
+        target (str): Target column.
+        preprocessing (Pipeline): Fitted preprocessing pipeline (utils.preprocessing), if any.
+        labels (list): Original class labels by code, if the target was label-encoded.
+        **metadata: Extra information (model name, metrics, SMOTE decision...).
+
+    Returns:
+        str: The path.
+    """
+    import joblib
+    import sklearn
+
+    bundle = {
+        "version": BUNDLE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "sklearn": sklearn.__version__,
+        "model": model,
+        "scaler": scaler,
+        "preprocessing": preprocessing,
+        "features": list(features),
+        "target": target,
+        "labels": list(labels) if labels is not None else None,
+        "metadata": metadata,
+    }
+    with tracer.span("write_bundle", "io", path=path):
+        joblib.dump(bundle, path)
+    return path
+
+
+def load_bundle(path, mmap=True):
+    """
+    Reads a bundle written by save_bundle.
+
+    Args:
+        path (str): Bundle path.
+        mmap (bool): Memory-map the arrays of the model (read-only) instead of loading them.
+
+    Returns:
+        dict: The bundle.
+
+    Raises:
+        ValueError: If the bundle was written with another format version.
+    """
+    import joblib
+
+    with tracer.span("read_bundle", "io", path=path):
+        bundle = joblib.load(path, mmap_mode="r" if mmap else None)
+    if not isinstance(bundle, dict) or bundle.get("version") != BUNDLE_VERSION:
+        found = bundle.get("version") if isinstance(bundle, dict) else None
+        raise ValueError(f"Versión de modelo no soportada ({found}); se esperaba la {BUNDLE_VERSION}. Vuelve a entrenar el modelo.")
+    return bundle
+
+
+def score_frame(bundle, df):
+    """
+    Scores a DataFrame of raw rows with a bundle.
+
+    Args:
+        bundle (dict): Bundle read by load_bundle.
+        df (pd.DataFrame): Raw rows, with or without the target column.
+
+    Returns:
+        pd.DataFrame: 'prediction' (original label) and 'probability' (of the predicted class), same index as df.
+    """
+    X = df.drop(columns=[bundle["target"]], errors="ignore")
+    if bundle["preprocessing"] is not None:
+        X = bundle["preprocessing"].transform(X)
+    # One-hot columns absent from the data are all zeros
+    X = X.reindex(columns=bundle["features"], fill_value=0)
+    X = bundle["scaler"].transform(X)
+    model = bundle["model"]
+    if hasattr(model, "predict_proba"):
+        proba = model.predict_proba(X)
+        codes = model.classes_[proba.argmax(axis=1)]
+        probability = proba.max(axis=1)
+    else:
+        codes = model.predict(X)
+        probability = np.full(len(codes), np.nan)
+    labels = bundle["labels"]
+    prediction = [labels[int(code)] for code in codes] if labels else codes
+    return pd.DataFrame({"prediction": prediction, "probability": probability}, index=df.index)
+
+
+def predict(bundle, input_path, output_path, chunksize=100_000, n_jobs=-1, keep_columns=True):
+    """
+    Scores a CSV of any size: it is streamed in chunks through the preprocessing
+    and the model, several chunks at a time on a thread pool, and the predictions
+    are appended to the output CSV in input order. Memory stays bounded by a few chunks.
+
+    Args:
+        bundle (dict | str): Bundle or path of a bundle.
+        input_path (str): CSV with the rows to score.
+        output_path (str): Destination CSV.
+        chunksize (int): Rows per chunk (default 100000).
+        n_jobs (int): Chunks scored in parallel (default -1, all cores).
+        keep_columns (bool): Write the input columns next to the predictions (default True).
+
+    Returns:
+        dict: rows scored, chunks, seconds and rows per second.
+    """
+    from joblib import Parallel, delayed
+
+    if isinstance(bundle, str):
+        bundle = load_bundle(bundle)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    start = time.perf_counter()
+    rows = chunks = 0
+
+    def score(chunk):
+        scored = score_frame(bundle, chunk)
+        return pd.concat([chunk, scored], axis=1) if keep_columns else scored
+
+    with tracer.span("predict", "compute", path=input_path) as span:
+        reader = pd.read_csv(input_path, chunksize=chunksize)
+        # Threads: the model arrays are shared (and memory-mapped) instead of copied to every worker
+        results = Parallel(n_jobs=n_jobs, prefer="threads", return_as="generator")(delayed(score)(chunk) for chunk in reader)
+        for scored in results:
+            scored.to_csv(output_path, mode="w" if chunks == 0 else "a", header=chunks == 0, index=False)
+            rows += len(scored)
+            chunks += 1
+        span.set(rows_out=rows, chunks=chunks)
+
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "chunks": chunks, "seconds": seconds, "rows_per_s": rows / seconds if seconds > 0 else None}
@@ -0,0 +1,258 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from utils.store import store
+from utils.tracing import tracer
+
+CACHE_FOLDER = os.path.join("data", "cache", "llm")
+
+
+class CachedRun:
+    """
+    Minimal stand-in of an agent RunOutput replayed from the cache.
+
+    Attributes:
+        content: Response content (str or the agent's output_schema model).
+        tools (list): Tool calls recorded with the response, with the result of the replay.
+        cached (bool): Always True.
+    """
+
+    def __init__(self, content, tools=None):
+        self.content = content
+        self.tools = tools or []
+        self.cached = True
+
+
+class ResponseCache:
+    """
+    Disk-backed cache of agent responses with TTL and size-bounded LRU eviction.
+
+    Each entry is a JSON file named after the hash of the agent identity (name,
+    model id, description, instructions, output schema and tools), the prompt
+    and the fingerprints of the datasets the tools will read. Entries store the
+    response content and the tool calls made, with their results and outputs
+    (registered datasets and written files), so a replay can restore the
+    response without calling the model. Tools whose outputs are gone are
+    re-executed (they are deterministic) for their side effects.
+
+    Args:
+        folder (str): Cache folder (default data/cache/llm).
+        ttl (int): Seconds an entry stays valid (default 7 days).
+        max_bytes (int): Maximum size of the cache folder (default 50 MB).
+    """
+
+    def __init__(self, folder=CACHE_FOLDER, ttl=7 * 24 * 3600, max_bytes=50 * 1024 ** 2):
+        self.folder = folder
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def key(self, agent, prompt, context=None):
+        """
+        Computes the cache key of an agent call.
+
+        Args:
+            agent (Agent): Agent to call.
+            prompt (str): Prompt sent to the agent.
+            context (list): Extra key material, e.g. fingerprints of the input datasets.
+
+        Returns:
+            str: Hex digest identifying the call.
+        """
+        model = getattr(agent, "model", None)
+        schema = getattr(agent, "output_schema", None)
+        identity = {
+            "agent": getattr(agent, "name", None),
+            "model": getattr(model, "id", None),
+            "description": getattr(agent, "description", None),
+            "instructions": getattr(agent, "instructions", None),
+            "output_schema": getattr(schema, "__name__", None),
+            "tools": [getattr(t, "name", str(t)) for t in (getattr(agent, "tools", None) or [])],
+            "prompt": prompt,
+            "context": context or [],
+        }
+        payload = json.dumps(identity, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+    def get(self, key):
+        """
+        Returns a valid entry and marks it as recently used.
+
+        Returns:
+            dict | None: The entry, or None if missing or expired.
+        """
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self.misses += 1
+                return None
+            if time.time() - entry.get("created", 0) > self.ttl:
+                os.remove(path)
+                self.misses += 1
+                return None
+            os.utime(path) # Last access time drives the LRU eviction
+            self.hits += 1
+            return entry
+
+    def put(self, key, content, tools=None):
+        """
+        Stores a response and evicts expired and least recently used entries.
+
+        Args:
+            key (str): Cache key.
+            content: Response content (str or pydantic model).
+            tools (list): Recorded tool calls as dicts with name and args.
+        """
+        if hasattr(content, "model_dump"):
+            entry = {"content": content.model_dump(), "content_type": "schema"}
+        else:
+            entry = {"content": content if isinstance(content, str) else str(content), "content_type": "text"}
+        entry["created"] = time.time()
+        entry["tools"] = tools or []
+        with self._lock:
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self._path(key))
+            self._evict()
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.folder, name)
+            stat = os.stat(path)
+            # mtime is refreshed on every hit; creation time is checked in get()
+            if now - stat.st_mtime > self.ttl:
+                os.remove(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def replay(self, agent, entry):
+        """
+        Rebuilds a response from an entry. A recorded tool call whose outputs
+        (registered datasets and written files) still exist is not executed again:
+        its recorded result is used. The others are re-executed so that their
+        outputs exist again. The replay is rejected if a tool result does not match
+        the recorded hash.
+
+        Args:
+            agent (Agent): Agent the entry belongs to.
+            entry (dict): Entry returned by get().
+
+        Returns:
+            CachedRun | None: Replayed response, or None if a tool result changed.
+        """
+        tools = {getattr(t, "name", None): t for t in (getattr(agent, "tools", None) or [])}
+        calls = []
+        for call in entry.get("tools", []):
+            function = tools.get(call["name"])
+            if function is None:
+                return None
+            if outputs_exist(call):
+                # Nothing to recompute (e.g. the model is already trained): only the recorded result is checked
+                result = call["result"]
+            else:
+                with tracer.span(call["name"], "tool", arguments=call["args"], cached=True):
+                    result = function.entrypoint(**call["args"])
+            if call.get("result_hash") and result_hash(result) != call["result_hash"]:
+                return None
+            calls.append(dict(call, result=result))
+        content = entry["content"]
+        schema = getattr(agent, "output_schema", None)
+        if entry.get("content_type") == "schema" and schema is not None:
+            content = schema(**content)
+        return CachedRun(content, calls)
+
+
+def recorded_tools(run_output, handles=None, since=None):
+    """
+    Extracts the tool calls of an agent RunOutput in the format stored by the cache.
+
+    Args:
+        run_output (RunOutput): Response of agent.run.
+        handles (list): Handles registered in the store before the run. Given with
+            since, the outputs of every call on a dataset (filepath argument) are recorded.
+        since (float): time.time() when the run started.
+
+    Returns:
+        list: Dicts with the tool name, arguments, result, result hash and outputs.
+    """
+    calls = []
+    for tool in getattr(run_output, "tools", None) or []:
+        args = tool.tool_args or {}
+        call = {"name": tool.tool_name, "args": args, "result": str(tool.result), "result_hash": result_hash(tool.result)}
+        if handles is not None and args.get("filepath"):
+            call["outputs"] = tool_outputs(args["filepath"], handles, since)
+        calls.append(call)
+    return calls
+
+
+def tool_outputs(ref, handles, since):
+    """
+    Outputs of a tool call on a dataset: the datasets it registered from it and
+    the files written since the call started in the folders of the dataset
+    (snapshots of registered datasets excluded).
+
+    Args:
+        ref (str): Handle or path of the input dataset.
+        handles (list): Handles registered before the call.
+        since (float): time.time() when the call started.
+
+    Returns:
+        dict: 'handles' and 'files' lists.
+    """
+    before = set(handles)
+    files = []
+    for folder in sorted({store.processed_folder(ref), store.clean_folder(ref)}):
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path) and os.path.getmtime(path) >= since and store.handle_of(path) is None:
+                files.append(path)
+    return {"handles": [h for h in store.children(ref) if h not in before], "files": files}
+
+
+def outputs_exist(call):
+    """Checks whether every recorded output of a tool call is still registered or on disk."""
+    outputs = call.get("outputs")
+    if outputs is None or "result" not in call:
+        return False # Recorded without its outputs: only a new execution can restore them
+    return (all(store.exists(h) or store.path_of(h) is not None for h in outputs["handles"])
+            and all(os.path.exists(path) for path in outputs["files"]))
+
+
+def result_hash(result):
+    """
+    Hashes a tool result ignoring decimal numbers, which carry timings that change
+    between otherwise identical runs.
+
+    Args:
+        result: Tool result (converted to str).
+
+    Returns:
+        str: Hex digest of the stable part of the result.
+    """
+    stable = re.sub(r"\d+\.\d+", "#", str(result))
+    return hashlib.sha256(stable.encode("utf-8")).hexdigest()
@@ -0,0 +1,217 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from utils.artifacts import file_format, read_frame, iter_frames
+from utils.tracing import tracer
+
+SCHEMA_CACHE_FOLDER = os.path.join("data", "cache", "schemas")
+# Text columns with at most this many distinct values (and at most half as many as rows) become category
+CATEGORY_MAX_LEVELS = 1000
+# Rows per chunk of the schema inference pass
+SCHEMA_CHUNK_ROWS = 200_000
+# Integers up to this magnitude are exact in float32
+FLOAT32_EXACT_INT = 2 ** 24
+INT_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+class TypedLoader:
+    """
+    Memory-lean CSV loader shared by every stage (through utils.store).
+
+    The first time a file is read, one streaming pass infers a compact schema:
+    integers are downcast to the smallest type that holds their range and
+    low-cardinality text to category. Decimal columns stay float64 unless
+    float32 is set, since the statistics of the later stages (IQR bounds, KNN
+    distances, medians) would no longer match those of the full-precision data.
+    The schema is cached on disk under the path, size and modification time of
+    the file, so later runs parse the file once, straight into the compact types.
+    Parquet and Feather artifacts (utils.artifacts) carry their own types and are
+    read as they are.
+
+    Args:
+        engine (str): pandas CSV engine: 'c' (default) or 'pyarrow' (multi-threaded, if installed).
+        compact (bool): Apply the compact schema (default True); False reads with the pandas defaults.
+        float32 (bool): Also downcast decimals with at most 6 significant digits and integer
+            columns with nulls to float32 (default False).
+        folder (str): Schema cache folder (default data/cache/schemas).
+    """
+
+    def __init__(self, engine="c", compact=True, float32=False, folder=SCHEMA_CACHE_FOLDER):
+        self.engine = engine
+        self.compact = compact
+        self.float32 = float32
+        self.folder = folder
+        self._schemas = {}
+        self._lock = threading.Lock()
+
+    def read(self, filepath, columns=None):
+        """
+        Reads a CSV file with its compact schema (or a Parquet or Feather artifact).
+
+        Args:
+            filepath (str): Path to the file.
+            columns (list): Read only these columns (default: all).
+
+        Returns:
+            pd.DataFrame: The dataset.
+        """
+        if file_format(filepath) != "csv":
+            return read_frame(filepath, columns=columns)
+        dtype = self.schema(filepath) if self.compact else None
+        if dtype and columns is not None:
+            dtype = {col: t for col, t in dtype.items() if col in columns}
+        with tracer.span("read_csv", "io", path=filepath, bytes=os.path.getsize(filepath), engine=self.engine) as span:
+            df = pd.read_csv(filepath, dtype=dtype or None, usecols=columns, engine=self.engine)
+            span.set(rows_out=df.shape[0], cols_out=df.shape[1], mb=df.memory_usage(deep=True).sum() / 1024 ** 2)
+        return df
+
+    def chunks(self, filepath, chunksize, columns=None):
+        """
+        Streams a CSV file in chunks of rows with its compact schema. The C engine is
+        always used (pyarrow does not read by chunks). Parquet and Feather artifacts
+        are streamed by row batches.
+
+        Args:
+            filepath (str): Path to the file.
+            chunksize (int): Rows per chunk.
+            columns (list): Read only these columns (default: all).
+
+        Yields:
+            pd.DataFrame: Consecutive chunks of the dataset.
+        """
+        if file_format(filepath) != "csv":
+            yield from iter_frames(filepath, chunksize, columns=columns)
+            return
+        dtype = self.schema(filepath) if self.compact else None
+        if dtype and columns is not None:
+            dtype = {col: t for col, t in dtype.items() if col in columns}
+        with pd.read_csv(filepath, dtype=dtype or None, usecols=columns, chunksize=chunksize) as reader:
+            yield from reader
+
+    def remember(self, filepath, schema):
+        """
+        Registers the schema of a file this process has just written, so that it is
+        not inferred again when the file is read.
+
+        Args:
+            filepath (str): Path to the CSV file (already written and closed).
+            schema (dict): Column -> dtype name.
+        """
+        key = self._key(filepath)
+        with self._lock:
+            self._schemas[key] = schema
+
+    def schema(self, filepath):
+        """
+        Compact schema of a CSV file, from the memory or disk cache or inferred.
+
+        Args:
+            filepath (str): Path to the CSV file.
+
+        Returns:
+            dict: Column -> dtype name, for the columns whose type can be reduced
+            (empty for Parquet and Feather files, which keep their types).
+        """
+        if file_format(filepath) != "csv":
+            return {}
+        key = self._key(filepath)
+        with self._lock:
+            if key in self._schemas:
+                return self._schemas[key]
+        path = os.path.join(self.folder, f"{key}.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                schema = json.load(f)
+        else:
+            with tracer.span("infer_schema", "io", path=filepath):
+                schema = infer_schema(filepath, float32=self.float32)
+            os.makedirs(self.folder, exist_ok=True)
+            tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(schema, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        with self._lock:
+            self._schemas[key] = schema
+        return schema
+
+    def _key(self, filepath):
+        stat = os.stat(filepath)
+        identity = f"{os.path.abspath(filepath)}|{stat.st_size}|{stat.st_mtime_ns}" + ("|float32" if self.float32 else "")
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+def infer_schema(filepath, chunk_rows=SCHEMA_CHUNK_ROWS, max_levels=CATEGORY_MAX_LEVELS, float32=False):
+    """
+    Infers the compact schema of a CSV file in one streaming pass of bounded memory.
+
+    Args:
+        filepath (str): Path to the CSV file.
+        chunk_rows (int): Rows per chunk.
+        max_levels (int): Maximum distinct values of a category column.
+        float32 (bool): Downcast short decimals and integer columns with nulls to float32
+            (default False: they keep float64).
+
+    Returns:
+        dict: Column -> dtype name. Columns left out keep the pandas default type. Text
+        columns with too many levels, and columns whose values change kind between
+        chunks, are read as object, so every chunk of a chunked read parses them alike.
+    """
+    stats = {}
+    rows = 0
+    for chunk in pd.read_csv(filepath, chunksize=chunk_rows):
+        rows += len(chunk)
+        for col in chunk.columns:
+            series = chunk[col]
+            s = stats.setdefault(col, {"kind": series.dtype.kind, "min": np.inf, "max": -np.inf,
+                                       "nulls": False, "integral": True, "short": True, "levels": set()})
+            kind = series.dtype.kind
+            if kind != s["kind"]:
+                # Ints in one chunk and floats in another are still numbers; anything else is mixed
+                if {kind, s["kind"]} <= {"i", "f"}:
+                    s["kind"] = "f"
+                else:
+                    s["kind"] = "mixed"
+            if s["kind"] in ("i", "f"):
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+                valid = values[~np.isnan(values)]
+                s["nulls"] |= len(valid) < len(values)
+                if len(valid):
+                    s["min"] = min(s["min"], float(valid.min()))
+                    s["max"] = max(s["max"], float(valid.max()))
+                    s["integral"] &= bool(np.all(valid == np.floor(valid)))
+                    s["short"] &= _short_decimals(valid)
+            elif s["kind"] == "O" and s["levels"] is not None:
+                s["levels"].update(series.dropna().unique())
+                if len(s["levels"]) > max_levels:
+                    s["levels"] = None # Too many distinct values: stays as text
+
+    schema = {}
+    for col, s in stats.items():
+        if s["kind"] == "i" and not s["nulls"]:
+            schema[col] = next(np.dtype(t).name for t in INT_TYPES
+                               if np.iinfo(t).min <= s["min"] and s["max"] <= np.iinfo(t).max)
+        elif s["kind"] in ("i", "f") and float32:
+            small_ints = s["integral"] and max(abs(s["min"]), abs(s["max"])) < FLOAT32_EXACT_INT
+            if small_ints or s["short"]:
+                schema[col] = "float32"
+        elif s["kind"] == "O" and s["levels"] is not None and len(s["levels"]) <= max(rows // 2, 1):
+            schema[col] = "category"
+        elif s["kind"] in ("O", "mixed"):
+            schema[col] = "object"
+    return schema
+
+
+def _short_decimals(values):
+    # True if every value has at most 6 significant digits (exact text round-trip through float32)
+    values = values[np.isfinite(values) & (values != 0)]
+    if not len(values):
+        return True
+    scaled = values * 10.0 ** (5 - np.floor(np.log10(np.abs(values))))
+    return bool(np.all(np.abs(scaled - np.round(scaled)) <= 1e-6))
+
+
+# Process-wide loader shared by utils.store and utils.profiling (main.py --csv-engine / --no-compact-types / --float32 reconfigure it)
+loader = TypedLoader(engine=os.environ.get("CSV_ENGINE", "c"))
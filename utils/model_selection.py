@@ -0,0 +1,335 @@
+import time
+import numpy as np
+import pandas as pd
+
+# Hyperparameters sampled by tune_model: a list is a set of choices, ("log", low, high) a log-uniform range
+SEARCH_SPACES = {
+    "random_forest": {"max_depth": [None, 8, 16, 32], "min_samples_leaf": [1, 2, 4, 8], "max_features": ["sqrt", "log2", 0.5], "class_weight": [None, "balanced"]},
+    "extra_trees": {"max_depth": [None, 8, 16, 32], "min_samples_leaf": [1, 2, 4, 8], "max_features": ["sqrt", "log2", 0.5], "class_weight": [None, "balanced"]},
+    "gradient_boosting": {"learning_rate": ("log", 0.02, 0.3), "max_leaf_nodes": [15, 31, 63], "min_samples_leaf": [10, 20, 50], "l2_regularization": [0.0, 0.1, 1.0]},
+    "logistic_regression": {"C": ("log", 0.01, 100.0), "class_weight": [None, "balanced"]},
+}
+# Parameter grown with warm start along the rungs of tune_model and its value in a full fit (None: only the data grows)
+FIDELITY = {
+    "random_forest": ("n_estimators", 300),
+    "extra_trees": ("n_estimators", 300),
+    "gradient_boosting": ("max_iter", 300),
+    "logistic_regression": (None, None),
+}
+# Fewest trees (or boosting iterations) of a low-fidelity round
+MIN_ESTIMATORS = 10
+
+
+def build_candidates(random_state=42):
+    """
+    Candidate models of the selection stage. Every model runs on one core: the
+    parallelism is spread over (model, fold) tasks instead.
+
+    Args:
+        random_state (int): Seed of the models.
+
+    Returns:
+        dict: Model name -> unfitted estimator.
+    """
+    from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier, HistGradientBoostingClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    return {
+        "random_forest": RandomForestClassifier(n_estimators=100, random_state=random_state, n_jobs=1),
+        "extra_trees": ExtraTreesClassifier(n_estimators=100, random_state=random_state, n_jobs=1),
+        "gradient_boosting": HistGradientBoostingClassifier(random_state=random_state),
+        "logistic_regression": LogisticRegression(max_iter=1000),
+    }
+
+
+def build_pipeline(model, use_smote="no", random_state=42):
+    """
+    Scaling, optional SMOTE and model. SMOTE is only applied when fitting, so in
+    cross-validation the validation folds are never oversampled.
+
+    Args:
+        model (estimator): Classifier.
+        use_smote (str): 'yes' to oversample the training data with SMOTE.
+        random_state (int): Seed of SMOTE.
+
+    Returns:
+        imblearn.pipeline.Pipeline: Unfitted pipeline.
+    """
+    from sklearn.preprocessing import StandardScaler
+    from imblearn.pipeline import Pipeline
+    from imblearn.over_sampling import SMOTE
+
+    steps = [("scaler", StandardScaler())]
+    if use_smote.lower() == "yes":
+        steps.append(("smote", SMOTE(random_state=random_state)))
+    steps.append(("model", model))
+    return Pipeline(steps)
+
+
+def _fit_fold(name, pipeline, X, y, train_idx, test_idx, average):
+    # One (model, fold) task: fit, predict and time both
+    from sklearn.metrics import f1_score
+
+    start = time.perf_counter()
+    pipeline.fit(X[train_idx], y[train_idx])
+    fit_time = time.perf_counter() - start
+    start = time.perf_counter()
+    y_pred = pipeline.predict(X[test_idx])
+    predict_time = time.perf_counter() - start
+    return name, f1_score(y[test_idx], y_pred, average=average), fit_time, predict_time
+
+
+def select_model(X, y, candidates="all", use_smote="no", cv_folds=5, n_jobs=-1, random_state=42):
+    """
+    Cross-validates several candidate models in parallel. All (model, fold) pairs
+    are independent tasks run in a process pool, so every core is used.
+
+    Args:
+        X (array-like): Features.
+        y (array-like): Target.
+        candidates (str): Comma separated model names from build_candidates, or 'all'.
+        use_smote (str): 'yes' to apply SMOTE inside each training fold.
+        cv_folds (int): Number of stratified folds (default 5).
+        n_jobs (int): Worker processes (default -1, all cores).
+        random_state (int): Seed of the folds and the models.
+
+    Returns:
+        pd.DataFrame: Leaderboard sorted by mean F1, with the F1 deviation and the
+        mean fit and predict time per fold.
+
+    Raises:
+        ValueError: If a candidate name is unknown.
+    """
+    from joblib import Parallel, delayed
+    from sklearn.base import clone
+    from sklearn.model_selection import StratifiedKFold
+
+    models = build_candidates(random_state)
+    if candidates == "all":
+        names = list(models)
+    else:
+        names = [name.strip() for name in candidates.split(",") if name.strip()]
+        unknown = [name for name in names if name not in models]
+        if unknown:
+            raise ValueError(f"Modelos no reconocidos: {unknown}. Disponibles: {list(models)}")
+
+    X = np.asarray(X)
+    y = np.asarray(y)
+    average = "binary" if len(np.unique(y)) == 2 else "macro"
+    folds = list(StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=random_state).split(X, y))
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(name, build_pipeline(clone(models[name]), use_smote, random_state), X, y, train_idx, test_idx, average)
+        for name in names
+        for train_idx, test_idx in folds
+    )
+
+    scores = pd.DataFrame(results, columns=["modelo", "f1", "fit_s", "predict_s"])
+    leaderboard = scores.groupby("modelo").agg(
+        f1_cv=("f1", "mean"),
+        f1_std=("f1", "std"),
+        fit_s=("fit_s", "mean"),
+        predict_s=("predict_s", "mean"),
+    )
+    return leaderboard.sort_values("f1_cv", ascending=False)
+
+
+def sample_configs(name, n_candidates, random_state=42):
+    """
+    Random hyperparameter configurations of a candidate model. The first one is
+    empty (the defaults of build_candidates), so the defaults always compete.
+
+    Args:
+        name (str): Model name from SEARCH_SPACES.
+        n_candidates (int): Number of configurations.
+        random_state (int): Seed of the sampling.
+
+    Returns:
+        list: Dicts of parameters.
+    """
+    rng = np.random.default_rng(random_state)
+    configs = [{}]
+    while len(configs) < n_candidates:
+        config = {}
+        for param, values in SEARCH_SPACES[name].items():
+            if isinstance(values, tuple):
+                config[param] = float(np.exp(rng.uniform(np.log(values[1]), np.log(values[2]))))
+            else:
+                config[param] = values[int(rng.integers(len(values)))]
+        configs.append(config)
+    return configs
+
+
+def _fit_rung(key, pipeline, X, y, train_idx, test_idx, average):
+    # One (candidate, fold) task of a rung; a candidate that cannot be fitted (e.g. SMOTE on a tiny sample) scores NaN
+    from sklearn.metrics import f1_score
+
+    start = time.perf_counter()
+    try:
+        pipeline.fit(X[train_idx], y[train_idx])
+        score = f1_score(y[test_idx], pipeline.predict(X[test_idx]), average=average)
+    except ValueError:
+        score = np.nan
+    return key, pipeline, score, time.perf_counter() - start
+
+
+def tune_model(X, y, name, use_smote="no", budget_s=60.0, n_candidates=27, eta=3, cv_folds=3, n_jobs=-1, random_state=42):
+    """
+    Tunes the hyperparameters of a candidate model with successive halving under a
+    wall-clock budget.
+
+    All the sampled configurations are cross-validated in a cheap first rung (few
+    trees on a subsample of every training fold); only the best 1/eta go on to the
+    next rung, which multiplies the resource by eta, until a full fit. Forests and
+    boosting grow their trees with warm start from one rung to the next once they
+    see the whole fold. The (candidate, fold) fits of a rung run in parallel on a
+    thread pool. Before every rung its time is estimated from the previous one: if
+    it would exceed the budget, the search stops with the best configuration so far.
+
+    Args:
+        X (array-like): Features.
+        y (array-like): Target.
+        name (str): Model name from build_candidates.
+        use_smote (str): 'yes' to apply SMOTE inside each training fold.
+        budget_s (float): Wall-clock budget of the search in seconds (default 60).
+        n_candidates (int): Configurations of the first rung (default 27).
+        eta (int): Halving factor (default 3).
+        cv_folds (int): Number of stratified folds (default 3).
+        n_jobs (int): Fits run at the same time (default -1, all cores).
+        random_state (int): Seed of the sampling, the folds and the models.
+
+    Returns:
+        dict: best_params (with the full-fit resource), f1_cv of the best configuration in
+        the last rung run, rungs (candidates, resource, data fraction, best F1 and seconds
+        per rung), seconds and stopped (True if the budget cut the search short).
+
+    Raises:
+        ValueError: If the model is unknown.
+    """
+    from joblib import Parallel, delayed
+    from sklearn.base import clone
+    from sklearn.model_selection import StratifiedKFold
+    from sklearn.utils.class_weight import compute_class_weight
+
+    if name not in SEARCH_SPACES:
+        raise ValueError(f"Modelo '{name}' no reconocido. Disponibles: {list(SEARCH_SPACES)}")
+    start = time.perf_counter()
+    X = np.asarray(X)
+    y = np.asarray(y)
+    average = "binary" if len(np.unique(y)) == 2 else "macro"
+    rng = np.random.default_rng(random_state)
+    # Training indices of every fold in a fixed random order: each subsample contains the previous one
+    folds = [(rng.permutation(train_idx), test_idx)
+             for train_idx, test_idx in StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=random_state).split(X, y)]
+    model = build_candidates(random_state)[name]
+    param, full = FIDELITY[name]
+    configs = sample_configs(name, n_candidates, random_state)
+    # 'balanced' weights of the whole training set: the preset recomputed on each subsample does not mix with warm start
+    classes = np.unique(y)
+    balanced = dict(zip(classes, compute_class_weight("balanced", classes=classes, y=y)))
+    n_rungs = int(np.floor(np.log(len(configs)) / np.log(eta) + 1e-9)) + 1
+
+    alive = list(range(len(configs)))
+    fitted = {} # (candidate, fold) -> pipeline of the previous rung, grown with warm start
+    rungs = []
+    best, best_score, stopped = 0, np.nan, False
+    for rung in range(n_rungs):
+        resource = float(eta) ** (rung - n_rungs + 1) # Fraction of a full fit: 1/eta^(n-1) ... 1
+        # Forests see the whole fold one rung before the end and then only grow; other models grow with the data
+        fraction = min(1.0, resource * eta) if param else resource
+        size = max(MIN_ESTIMATORS, int(round(full * resource))) if param else None
+        work = (size or 1) * fraction
+        if rungs:
+            previous = rungs[-1]
+            estimate = previous["seconds"] * len(alive) / previous["candidates"] * work / previous["work"]
+            if time.perf_counter() - start + estimate > budget_s:
+                stopped = True
+                break
+        rung_start = time.perf_counter()
+        tasks = []
+        for candidate in alive:
+            for fold, (train_idx, test_idx) in enumerate(folds):
+                pipeline = fitted.get((candidate, fold))
+                if pipeline is None or not param or fraction != rungs[-1]["data"]:
+                    params = {key: balanced if value == "balanced" else value for key, value in configs[candidate].items()}
+                    pipeline = build_pipeline(clone(model).set_params(**params), use_smote, random_state)
+                if param:
+                    pipeline.set_params(**{f"model__{param}": size, "model__warm_start": True})
+                train = train_idx[:max(cv_folds, int(np.ceil(len(train_idx) * fraction)))]
+                tasks.append(((candidate, fold), pipeline, train, test_idx))
+        results = Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(_fit_rung)(key, pipeline, X, y, train, test_idx, average) for key, pipeline, train, test_idx in tasks
+        )
+        scores = {}
+        for (candidate, fold), pipeline, score, _ in results:
+            fitted[(candidate, fold)] = pipeline
+            scores.setdefault(candidate, []).append(score)
+        mean = {candidate: np.mean(values) for candidate, values in scores.items()}
+        ranking = sorted(alive, key=lambda candidate: -np.nan_to_num(mean[candidate], nan=-1.0))
+        best, best_score = ranking[0], mean[ranking[0]]
+        rungs.append({"rung": rung + 1, "candidates": len(alive), "resource": size, "data": fraction,
+                      "f1_best": best_score, "seconds": time.perf_counter() - rung_start, "work": work})
+        alive = ranking[:max(1, len(alive) // eta)]
+        fitted = {key: pipeline for key, pipeline in fitted.items() if key[0] in alive}
+
+    best_params = dict(configs[best])
+    if param:
+        best_params[param] = full
+    return {
+        "model": name,
+        "best_params": best_params,
+        "f1_cv": best_score,
+        "rungs": rungs,
+        "parameter": param,
+        "seconds": time.perf_counter() - start,
+        "budget_s": budget_s,
+        "stopped": stopped,
+    }
+
+
+def tuning_markdown(tuning):
+    """
+    Renders the result of tune_model as markdown: one row per rung, the best
+    configuration and the time spent.
+
+    Args:
+        tuning (dict): Output of tune_model.
+
+    Returns:
+        str: Markdown.
+    """
+    resource = tuning["parameter"] or "-"
+    table = (
+        f"| Ronda | Candidatos | {resource} | Datos | Mejor F1 (CV) | Tiempo (s) |\n"
+        "| :--- | :--- | :--- | :--- | :--- | :--- |\n"
+    )
+    for rung in tuning["rungs"]:
+        table += (f"| {rung['rung']} | {rung['candidates']} | {rung['resource'] or '-'} | {rung['data']:.0%} | "
+                  f"{rung['f1_best']:.3f} | {rung['seconds']:.2f} |\n")
+    params = ", ".join(f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}" for key, value in tuning["best_params"].items())
+    stop = " Se detuvo antes de la última ronda por el presupuesto." if tuning["stopped"] else ""
+    return (
+        f"### Ajuste de hiperparámetros de {tuning['model']} (successive halving)\n"
+        f"{table}\n"
+        f"**Mejor configuración:** {params or 'parámetros por defecto'} (F1 CV {tuning['f1_cv']:.3f})\n\n"
+        f"**Tiempo de búsqueda:** {tuning['seconds']:.1f} s de un presupuesto de {tuning['budget_s']:.0f} s.{stop}"
+    )
+
+
+def leaderboard_markdown(leaderboard):
+    """
+    Renders the leaderboard as a markdown table.
+
+    Args:
+        leaderboard (pd.DataFrame): Output of select_model.
+
+    Returns:
+        str: Markdown table.
+    """
+    table = (
+        "| Modelo | F1 (CV) | Desv. | Fit (s/fold) | Predict (s/fold) |\n"
+        "| :--- | :--- | :--- | :--- | :--- |\n"
+    )
+    for name, row in leaderboard.iterrows():
+        table += f"| **{name}** | {row['f1_cv']:.3f} | {row['f1_std']:.3f} | {row['fit_s']:.3f} | {row['predict_s']:.4f} |\n"
+    return table.rstrip("\n")
@@ -0,0 +1,216 @@
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.pipeline import Pipeline
+from utils.encoding import CategoricalEncoder
+from utils.imputation import MAX_DONORS, knn_impute, select_donors
+from utils.profiling import iqr_bounds
+from utils.tracing import tracer
+
+class NullHandler(BaseEstimator, TransformerMixin):
+    """
+    Null handling step, same result as the manage_nulls tool.
+
+    fit_transform works on the training data: 'drop' removes the rows with nulls and
+    'knn' imputes the numeric columns (numeric columns first, then the rest, like the
+    tool). transform reapplies the fitted step to new data without dropping rows:
+    'drop' fills the nulls with the training medians (or most frequent level) and
+    'knn' searches the neighbours among the stored training donors.
+
+    Args:
+        strategy (str): 'drop' or 'knn'.
+        n_neighbors (int): Neighbours of the KNN imputation (default 5).
+        sample_size (int): If > 0, KNN donors sampled while fitting (default 0, all).
+    """
+
+    def __init__(self, strategy="drop", n_neighbors=5, sample_size=0):
+        self.strategy = strategy
+        self.n_neighbors = n_neighbors
+        self.sample_size = sample_size
+
+    def fit(self, X, y=None):
+        if self.strategy not in ("drop", "knn"):
+            raise ValueError(f"Estrategia de nulos '{self.strategy}' no soportada. Usa 'drop' o 'knn'.")
+        self.numeric_ = X.select_dtypes(include=[np.number]).columns.tolist()
+        numeric = X[self.numeric_].to_numpy(dtype=np.float64, na_value=np.nan)
+        self.fill_values_ = {col: X[col].median() for col in self.numeric_}
+        for col in X.columns.difference(self.numeric_):
+            mode = X[col].mode()
+            self.fill_values_[col] = mode.iloc[0] if not mode.empty else None
+        # Rows kept to impute new data with KNN (partially observed ones if too few are complete)
+        self.donors_ = select_donors(numeric, self.n_neighbors, sample_size=MAX_DONORS)
+        return self
+
+    def fit_transform(self, X, y=None):
+        self.fit(X)
+        if self.strategy == "drop":
+            return X.dropna()
+        if not self.numeric_:
+            return X
+        imputed, _ = knn_impute(X[self.numeric_], n_neighbors=self.n_neighbors, sample_size=self.sample_size)
+        return pd.concat([imputed, X.drop(columns=self.numeric_)], axis=1)
+
+    def transform(self, X):
+        numeric = [col for col in self.numeric_ if col in X.columns]
+        if self.strategy == "knn" and numeric:
+            positions = [self.numeric_.index(col) for col in numeric]
+            imputed, _ = knn_impute(X[numeric], n_neighbors=self.n_neighbors, donors=self.donors_[:, positions])
+            X = pd.concat([imputed, X.drop(columns=numeric)], axis=1)
+        fill = {col: value for col, value in self.fill_values_.items() if col in X.columns and value is not None}
+        return X.fillna(fill) if fill else X
+
+
+class OutlierHandler(BaseEstimator, TransformerMixin):
+    """
+    IQR outlier step, same result as the vectorized mode of the manage_outliers tool.
+
+    The bounds of every numeric column are fitted on the training data. fit_transform
+    drops the rows with any outlier ('drop') or clips them to the bounds ('capping');
+    transform always clips, so new data keeps all its rows.
+
+    Args:
+        strategy (str): 'drop' or 'capping'.
+    """
+
+    def __init__(self, strategy="drop"):
+        self.strategy = strategy
+
+    def fit(self, X, y=None):
+        if self.strategy not in ("drop", "capping"):
+            raise ValueError(f"Estrategia de outliers '{self.strategy}' no soportada. Usa 'drop' o 'capping'.")
+        self.columns_ = X.select_dtypes(include=[np.number]).columns.tolist()
+        lower, upper = iqr_bounds(X[self.columns_].to_numpy(dtype=np.float64, na_value=np.nan))
+        self.lower_ = pd.Series(lower, index=self.columns_)
+        self.upper_ = pd.Series(upper, index=self.columns_)
+        return self
+
+    def fit_transform(self, X, y=None):
+        self.fit(X)
+        if self.strategy == "drop" and self.columns_:
+            return X[~self.outliers(X).any(axis=1)]
+        return self.transform(X)
+
+    def outliers(self, X):
+        """Boolean matrix of the values outside the fitted bounds (one column per fitted numeric column)."""
+        values = X[self.columns_].to_numpy(dtype=np.float64, na_value=np.nan)
+        return (values < self.lower_.to_numpy()) | (values > self.upper_.to_numpy())
+
+    def transform(self, X):
+        columns = [col for col in self.columns_ if col in X.columns]
+        if not columns:
+            return X
+        X = X.copy()
+        X[columns] = X[columns].clip(lower=self.lower_[columns], upper=self.upper_[columns], axis=1)
+        return X
+
+
+class DummiesEncoder(BaseEstimator, TransformerMixin):
+    """
+    One-hot step, same result as the apply_dummies tool: a CategoricalEncoder fitted on
+    the object and category columns, with the last column label-encoded as the target.
+
+    Args:
+        max_levels (int): Levels kept per feature (default 0, all).
+        min_frequency (int): Minimum count of a kept level (default 0).
+        sparse (bool): Return the one-hot blocks as sparse columns (default False).
+    """
+
+    def __init__(self, max_levels=0, min_frequency=0, sparse=False):
+        self.max_levels = max_levels
+        self.min_frequency = min_frequency
+        self.sparse = sparse
+
+    def fit(self, X, y=None):
+        columns = X.select_dtypes(include=["object", "category"]).columns.tolist()
+        target = X.columns[-1]
+        self.encoder_ = CategoricalEncoder(self.max_levels, self.min_frequency)
+        self.encoder_.fit(X, columns, target=target if target in columns else None)
+        return self
+
+    def transform(self, X):
+        return self.encoder_.transform(X, sparse=self.sparse)
+
+
+def compile_plan(plan, n_neighbors=5, sample_size=0, sparse=False):
+    """
+    Compiles a Director plan into one preprocessing pipeline.
+
+    The steps the plan skips are left out, so the pipeline runs every remaining
+    transformation in a single in-memory pass, without intermediate datasets.
+
+    Args:
+        plan (dict): DirectorResponse as a dict (null_strategy, outliers_strategy, encoding_strategy).
+        n_neighbors (int): Neighbours of the KNN imputation.
+        sample_size (int): KNN donors sampled while fitting (0 = all).
+        sparse (bool): Sparse one-hot columns.
+
+    Returns:
+        Pipeline: Unfitted sklearn pipeline with the 'nulls', 'outliers' and 'encoding' steps.
+    """
+    nulls = plan.get("null_strategy", "skip")
+    outliers = plan.get("outliers_strategy", "skip")
+    steps = [
+        ("nulls", NullHandler(nulls, n_neighbors, sample_size) if nulls != "skip" else "passthrough"),
+        ("outliers", OutlierHandler(outliers) if outliers != "skip" else "passthrough"),
+        ("encoding", DummiesEncoder(sparse=sparse) if plan.get("encoding_strategy") == "get_dummies" else "passthrough"),
+    ]
+    return Pipeline(steps)
+
+
+def fit_pipeline(pipeline, df):
+    """
+    Fits a compiled pipeline and transforms the training data in one pass.
+
+    Args:
+        pipeline (Pipeline): Pipeline built by compile_plan.
+        df (pd.DataFrame): Raw training data (target as last column).
+
+    Returns:
+        pd.DataFrame: Preprocessed data.
+    """
+    with tracer.span("preprocessing", "compute", rows_in=df.shape[0], cols_in=df.shape[1]) as span:
+        df_final = pipeline.fit_transform(df)
+        span.set(rows_out=df_final.shape[0], cols_out=df_final.shape[1])
+    return df_final
+
+
+def fit_steps(plan, inputs, chunksize=0):
+    """
+    Fits a compiled pipeline step by step on the data each step received elsewhere
+    (e.g. the inputs of the agent stages), without transforming anything.
+
+    Args:
+        plan (dict): DirectorResponse as a dict.
+        inputs (dict): Step name ('nulls', 'outliers', 'encoding') -> DataFrame the step was applied to
+            (or its CSV file if chunksize > 0). Steps without an input were not applied and are left out.
+        chunksize (int): If > 0, fit every step on its file read in chunks of this many rows (utils.streaming).
+
+    Returns:
+        Pipeline: Fitted pipeline.
+    """
+    pipeline = compile_plan(plan)
+    for index, (name, step) in enumerate(pipeline.steps):
+        if step == "passthrough":
+            continue
+        if name in inputs and chunksize > 0:
+            from utils.streaming import fit_chunked
+            fit_chunked(Pipeline([(name, step)]), inputs[name], chunksize)
+        elif name in inputs:
+            step.fit(inputs[name])
+        else:
+            pipeline.steps[index] = (name, "passthrough")
+    return pipeline
+
+
+def save_pipeline(pipeline, path):
+    """Writes a fitted pipeline with joblib."""
+    with tracer.span("write_pipeline", "io", path=path):
+        joblib.dump(pipeline, path, compress=3)
+    return path
+
+
+def load_pipeline(path):
+    """Reads a pipeline written by save_pipeline."""
+    with tracer.span("read_pipeline", "io", path=path):
+        return joblib.load(path)
@@ -0,0 +1,445 @@
+import os
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional
+import pandas as pd
+import numpy as np
+from utils.loader import loader
+from utils.sketches import HyperLogLog, KLLSketch, hash_values
+
+
+# Identifier of the compact profile format sent to the agents
+PROFILE_SCHEMA = "profile/v1"
+# Fields of every row of the compact profile 'columns' table
+COLUMN_FIELDS = ["name", "dtype", "nulls_pct", "uniques", "outliers_pct"]
+# Default token budget of the compact profile (main.py --profile-tokens overrides it)
+PROFILE_TOKENS = int(os.environ.get("PROFILE_MAX_TOKENS", 2000))
+# Classes of the target listed in the compact profile
+MAX_CLASSES = 20
+
+
+@dataclass
+class ColumnProfile:
+    """
+    Quality statistics of a single column.
+
+    Attributes:
+        name (str): Column name.
+        dtype (str): Pandas data type of the column.
+        nulls (int): Number of null values.
+        uniques (int): Number of distinct non-null values.
+        outliers (int | None): IQR outlier count, None for non-numeric columns.
+    """
+    name: str
+    dtype: str
+    nulls: int
+    uniques: int
+    outliers: Optional[int] = None
+
+
+@dataclass
+class DatasetProfile:
+    """
+    Structured quality profile of a dataset. The last column is the target.
+
+    Attributes:
+        file_name (str): Name of the profiled file.
+        n_rows (int): Number of rows.
+        n_cols (int): Number of columns.
+        duplicates (int): Number of duplicated rows.
+        rows_with_nulls (int): Number of rows with at least one null value.
+        target_col (str): Name of the target variable.
+        class_counts (dict): Frequency of each class of the target variable.
+        columns (list): One ColumnProfile per column, in file order.
+    """
+    file_name: str
+    n_rows: int
+    n_cols: int
+    duplicates: int
+    rows_with_nulls: int
+    target_col: str
+    class_counts: Dict[str, int] = field(default_factory=dict)
+    columns: List[ColumnProfile] = field(default_factory=list)
+
+    @property
+    def cols_cat(self) -> List[str]:
+        """Names of the categorical (non-numeric) columns."""
+        return [c.name for c in self.columns if c.outliers is None]
+
+    @property
+    def total_nulls(self) -> int:
+        """Total number of null cells."""
+        return sum(c.nulls for c in self.columns)
+
+    @property
+    def null_percentage(self) -> float:
+        """Percentage of null cells over all the cells of the dataset."""
+        cells = self.n_rows * self.n_cols
+        return (self.total_nulls / cells) * 100 if cells else 0.0
+
+    @property
+    def total_outliers(self) -> int:
+        """Total number of IQR outliers over all numeric columns."""
+        return sum(c.outliers or 0 for c in self.columns)
+
+    @property
+    def null_rows_percentage(self) -> float:
+        """Percentage of rows that contain at least one null value."""
+        return (self.rows_with_nulls / self.n_rows) * 100 if self.n_rows else 0.0
+
+    @property
+    def class_percentages(self) -> Dict[str, float]:
+        """Percentage of each class of the target variable."""
+        total = sum(self.class_counts.values())
+        return {k: (v / total) * 100 for k, v in self.class_counts.items()} if total else {}
+
+    @property
+    def minority_class_percentage(self) -> float:
+        """Percentage of the least frequent class of the target variable."""
+        percentages = self.class_percentages
+        return min(percentages.values()) if percentages else 100.0
+
+    def to_compact(self, max_tokens=None) -> dict:
+        """
+        Compact, schema-defined version of the profile for the agents: aggregated
+        summaries plus one short row per column (see COLUMN_FIELDS). If the whole
+        profile does not fit the token budget (4 characters per token), the columns
+        are ranked by nulls and outliers and only the most relevant ones are kept;
+        'omitted' counts the rest, which the summaries still cover.
+
+        Args:
+            max_tokens (int): Token budget (default PROFILE_TOKENS).
+
+        Returns:
+            dict: The compact profile.
+        """
+        budget = (max_tokens or PROFILE_TOKENS) * 4
+        pct = lambda count: round(count / self.n_rows * 100, 2) if self.n_rows else 0.0
+        classes = sorted(self.class_percentages.items(), key=lambda item: item[1], reverse=True)
+        numeric = [c for c in self.columns if c.outliers is not None]
+        profile = {
+            "schema": PROFILE_SCHEMA,
+            "file": self.file_name,
+            "rows": self.n_rows,
+            "cols": self.n_cols,
+            "duplicates": self.duplicates,
+            "nulls": {"cells": self.total_nulls, "pct": round(self.null_percentage, 2), "rows_pct": round(self.null_rows_percentage, 2),
+                      "cols": sum(1 for c in self.columns if c.nulls)},
+            "outliers": {"cells": self.total_outliers, "cols": sum(1 for c in numeric if c.outliers)},
+            "target": {"name": self.target_col, "classes_pct": {str(k): round(v, 2) for k, v in classes[:MAX_CLASSES]},
+                       "n_classes": len(classes), "minority_pct": round(self.minority_class_percentage, 2)},
+            "numeric_cols": len(numeric),
+            "cols_cat": [],
+            "fields": COLUMN_FIELDS,
+            "columns": [],
+            "omitted": 0,
+        }
+        rows = [[c.name, c.dtype, pct(c.nulls), c.uniques, pct(c.outliers) if c.outliers is not None else None] for c in self.columns]
+        cols_cat = self.cols_cat
+        used = len(_dumps(profile))
+        needed = sum(len(_dumps(row)) + 1 for row in rows) + sum(len(_dumps(name)) + 1 for name in cols_cat)
+        if used + needed <= budget:
+            profile["columns"], profile["cols_cat"] = rows, cols_cat
+            return profile
+
+        # Too wide: the target and then the columns with most nulls and outliers, until the budget is spent
+        order = sorted(range(len(rows)), key=lambda i: (self.columns[i].name != self.target_col,
+                                                        -(self.columns[i].nulls + (self.columns[i].outliers or 0))))
+        kept_cat = set()
+        for i in order:
+            row = rows[i]
+            cost = len(_dumps(row)) + 1
+            is_cat = self.columns[i].outliers is None
+            if is_cat:
+                cost += len(_dumps(row[0])) + 1
+            if used + cost > budget:
+                break
+            used += cost
+            profile["columns"].append(row)
+            if is_cat:
+                kept_cat.add(row[0])
+        profile["cols_cat"] = [name for name in cols_cat if name in kept_cat]
+        profile["cols_cat_total"] = len(cols_cat)
+        profile["omitted"] = len(rows) - len(profile["columns"])
+        return profile
+
+    def render_json(self, max_tokens=None) -> str:
+        """
+        Renders the compact profile (to_compact) as minified JSON.
+
+        Args:
+            max_tokens (int): Token budget (default PROFILE_TOKENS).
+
+        Returns:
+            str: JSON text.
+        """
+        return _dumps(self.to_compact(max_tokens))
+
+
+def _dumps(value):
+    # Minified JSON, the form the compact profile is sent in
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def is_numeric_column(series):
+    """
+    Checks whether a column is numeric for IQR purposes (booleans are excluded).
+
+    Args:
+        series (pd.Series | dtype): Column (or its data type) to check.
+
+    Returns:
+        bool: True if the column holds numeric values.
+    """
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+# Number of numeric columns processed per vectorized block (bounds peak memory on wide tables)
+BLOCK_COLUMNS = 512
+
+
+def _sorted_quantiles(sorted_values, n_valid, q):
+    # Linear interpolation between order statistics (same method as pandas quantile)
+    position = np.maximum(n_valid - 1, 0) * q
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, np.maximum(n_valid - 1, 0))
+    fraction = position - low
+    v_low = np.take_along_axis(sorted_values, low[None, :], axis=0)[0]
+    v_high = np.take_along_axis(sorted_values, high[None, :], axis=0)[0]
+    result = v_low + (v_high - v_low) * fraction
+    return np.where(n_valid > 0, result, np.nan)
+
+
+def iqr_bounds(values):
+    """
+    Computes the IQR outlier bounds (Q1 - 1.5*IQR, Q3 + 1.5*IQR) of every column
+    of a numeric block in one vectorized pass. Nulls (NaN) are ignored.
+
+    Args:
+        values (np.ndarray): 2D float array, one column per variable.
+
+    Returns:
+        tuple: (lower, upper) arrays with one bound per column.
+    """
+    sorted_values = np.sort(values, axis=0)
+    n_valid = values.shape[0] - np.isnan(values).sum(axis=0)
+    q1 = _sorted_quantiles(sorted_values, n_valid, 0.25)
+    q3 = _sorted_quantiles(sorted_values, n_valid, 0.75)
+    iqr = q3 - q1
+    return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def iqr_statistics(values):
+    """
+    Computes Q1, Q3, IQR outlier counts and distinct counts of a numeric block
+    in a single vectorized pass. Nulls (NaN) are ignored like pandas does.
+
+    Args:
+        values (np.ndarray): 2D float array, one column per variable.
+
+    Returns:
+        tuple: (q1, q3, outliers, uniques) arrays with one value per column.
+    """
+    n_rows, n_cols = values.shape
+    # Sorting puts NaN at the end of each column
+    sorted_values = np.sort(values, axis=0)
+    n_valid = n_rows - np.isnan(values).sum(axis=0)
+
+    q1 = _sorted_quantiles(sorted_values, n_valid, 0.25)
+    q3 = _sorted_quantiles(sorted_values, n_valid, 0.75)
+    iqr = q3 - q1
+    lower = q1 - 1.5 * iqr
+    upper = q3 + 1.5 * iqr
+    outliers = ((values < lower) | (values > upper)).sum(axis=0)
+
+    # Distinct values: changes between consecutive sorted non-null values
+    if n_rows > 1:
+        changes = np.diff(sorted_values, axis=0) != 0
+        inside = np.arange(1, n_rows)[:, None] < n_valid[None, :]
+        uniques = (changes & inside).sum(axis=0) + (n_valid > 0)
+    else:
+        uniques = (n_valid > 0).astype(np.int64)
+    return q1, q3, outliers, uniques
+
+
+def profile_dataframe(df, file_name=""):
+    """
+    Computes the quality profile of a DataFrame with vectorized operations.
+    Numeric columns are processed in blocks of BLOCK_COLUMNS columns.
+
+    Args:
+        df (pd.DataFrame): Dataset to profile. The last column is the target.
+        file_name (str): Name of the profiled file.
+
+    Returns:
+        DatasetProfile: Structured quality statistics.
+    """
+    # We assume the target variable is the last column
+    target_col = df.columns[-1]
+    value_counts = df[target_col].value_counts()
+
+    # Null counts of every column from a single null mask
+    null_mask = df.isna().to_numpy()
+    null_counts = null_mask.sum(axis=0)
+    rows_with_nulls = int(null_mask.any(axis=1).sum())
+    del null_mask
+
+    numeric_positions = [i for i, data_type in enumerate(df.dtypes) if is_numeric_column(data_type)]
+    outliers = {}
+    uniques = {}
+    # Numeric columns: quantiles, outliers and distinct counts per block
+    for start in range(0, len(numeric_positions), BLOCK_COLUMNS):
+        block = numeric_positions[start:start + BLOCK_COLUMNS]
+        values = df.iloc[:, block].to_numpy(dtype=np.float64, na_value=np.nan)
+        _, _, block_outliers, block_uniques = iqr_statistics(values)
+        for position, n_out, n_unique in zip(block, block_outliers, block_uniques):
+            outliers[position] = int(n_out)
+            uniques[position] = int(n_unique)
+    # Remaining columns: distinct counts through pandas hashing
+    other_positions = [i for i in range(df.shape[1]) if i not in outliers]
+    if other_positions:
+        other_uniques = df.iloc[:, other_positions].nunique().to_numpy()
+        uniques.update(zip(other_positions, (int(u) for u in other_uniques)))
+
+    columns = [
+        ColumnProfile(
+            name=col,
+            dtype=str(data_type),
+            nulls=int(null_counts[i]),
+            uniques=uniques[i],
+            outliers=outliers.get(i),
+        )
+        for i, (col, data_type) in enumerate(df.dtypes.items())
+    ]
+
+    return DatasetProfile(
+        file_name=file_name,
+        n_rows=int(df.shape[0]),
+        n_cols=int(df.shape[1]),
+        duplicates=int(df.duplicated().sum()),
+        rows_with_nulls=rows_with_nulls,
+        target_col=target_col,
+        class_counts={str(k): int(v) for k, v in value_counts.items()},
+        columns=columns,
+    )
+
+
+def profile_csv_chunked(filepath, chunksize=100_000, k=200, exact_outliers=True):
+    """
+    Computes the quality profile of a CSV file in bounded memory, reading it in
+    batches of chunksize rows with its compact schema (utils.loader). Null counts and the class distribution are exact;
+    duplicates and distinct counts use HyperLogLog sketches and the IQR bounds
+    use KLL quantile sketches, so they are approximate on large files.
+
+    Args:
+        filepath (str): Path to the CSV file.
+        chunksize (int): Rows per batch (default 100000).
+        k (int): Accuracy parameter of the quantile sketches (default 200).
+        exact_outliers (bool): Count the values outside the IQR bounds in a second pass over
+            the numeric columns (default True). If False they are estimated from the
+            sketches in a single pass, which is coarse on the distribution tails.
+
+    Returns:
+        DatasetProfile: Structured quality statistics with the same shape as profile_dataframe.
+    """
+    stat = os.stat(filepath)
+    return _profile_csv_chunked(os.path.abspath(filepath), chunksize, k, exact_outliers, stat.st_size, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=8)
+def _profile_csv_chunked(filepath, chunksize, k, exact_outliers, size, mtime):
+    # size and mtime are part of the cache key so that a modified file is profiled again
+    n_rows = 0
+    rows_with_nulls = 0
+    columns = None
+    null_counts = None
+    dtypes = {}
+    numeric = {}
+    class_counts = pd.Series(dtype="int64")
+    row_hashes = HyperLogLog(p=14, exact_limit=1 << 22)
+    distinct = {}
+    quantiles = {}
+
+    for chunk in loader.chunks(filepath, chunksize):
+        if columns is None:
+            columns = list(chunk.columns)
+            null_counts = np.zeros(len(columns), dtype=np.int64)
+            distinct = {col: HyperLogLog() for col in columns}
+            quantiles = {col: KLLSketch(k=k) for col in columns}
+        n_rows += len(chunk)
+
+        # Nulls
+        null_mask = chunk.isna().to_numpy()
+        null_counts += null_mask.sum(axis=0)
+        rows_with_nulls += int(null_mask.any(axis=1).sum())
+
+        # Duplicate fingerprints and class distribution of the target
+        row_hashes.update(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+        class_counts = class_counts.add(chunk[columns[-1]].value_counts(), fill_value=0)
+
+        # Data types, distinct counts and quantile sketches per column
+        for col in columns:
+            series = chunk[col]
+            previous = dtypes.get(col)
+            dtypes[col] = series.dtype if previous is None else _merge_dtypes(previous, series.dtype)
+            is_numeric = is_numeric_column(series)
+            numeric[col] = numeric.get(col, True) and is_numeric
+            values = series.dropna().to_numpy()
+            distinct[col].update(hash_values(values))
+            if numeric[col]:
+                quantiles[col].update(values)
+
+    if columns is None:
+        raise pd.errors.EmptyDataError(f"El archivo '{filepath}' no tiene filas.")
+
+    # IQR bounds from the quantile sketches
+    bounds = {}
+    for col in columns:
+        if numeric[col]:
+            q1, q3 = quantiles[col].quantile(0.25), quantiles[col].quantile(0.75)
+            bounds[col] = (q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))
+    if exact_outliers and bounds:
+        # Second pass reading only the numeric columns
+        outlier_counts = dict.fromkeys(bounds, 0)
+        lower = np.array([b[0] for b in bounds.values()])
+        upper = np.array([b[1] for b in bounds.values()])
+        for chunk in loader.chunks(filepath, chunksize, columns=list(bounds)):
+            values = chunk[list(bounds)].to_numpy(dtype=np.float64, na_value=np.nan)
+            for col, count in zip(bounds, ((values < lower) | (values > upper)).sum(axis=0)):
+                outlier_counts[col] += int(count)
+    else:
+        outlier_counts = {
+            col: quantiles[col].count_below(low) + quantiles[col].count_above(high)
+            for col, (low, high) in bounds.items()
+        }
+
+    column_profiles = []
+    for i, col in enumerate(columns):
+        outliers = outlier_counts.get(col)
+        column_profiles.append(ColumnProfile(
+            name=col,
+            dtype=str(dtypes[col]),
+            nulls=int(null_counts[i]),
+            uniques=min(distinct[col].count(), n_rows),
+            outliers=outliers,
+        ))
+
+    class_counts = class_counts.astype("int64").sort_values(ascending=False, kind="stable")
+    return DatasetProfile(
+        file_name=os.path.basename(filepath),
+        n_rows=n_rows,
+        n_cols=len(columns),
+        duplicates=max(n_rows - row_hashes.count(), 0),
+        rows_with_nulls=rows_with_nulls,
+        target_col=columns[-1],
+        class_counts={str(key): int(value) for key, value in class_counts.items()},
+        columns=column_profiles,
+    )
+
+
+def _merge_dtypes(left, right):
+    # A column parsed as object in any batch is object; numeric batches promote (int64 + float64 = float64)
+    if is_numeric_column(left) and is_numeric_column(right):
+        return np.result_type(left, right)
+    return left if left == right else np.dtype(object)
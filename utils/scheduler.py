@@ -0,0 +1,327 @@
+import os
+import re
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from utils.tracing import tracer
+
+# HTTP status codes worth retrying: rate limited, or the service is temporarily unavailable
+RATE_LIMIT_CODES = {429}
+TRANSIENT_CODES = {500, 503, 504}
+
+
+class TokenBucket:
+    """
+    Token bucket with reservations.
+
+    A reservation always succeeds and may leave the balance negative: the caller
+    gets back how long it must wait for the balance to be paid off, so waiting
+    callers are served in arrival order without polling. The refill rate is set
+    so that the burst plus one minute of refill equals the per-minute limit, and
+    no 60 s window can exceed it.
+
+    Args:
+        limit (float): Units allowed per minute (requests or tokens).
+        burst (float): Units that may be spent at once (default: a fifth of the limit).
+    """
+
+    def __init__(self, limit, burst=None):
+        self.capacity = max(1.0, burst if burst is not None else limit / 5)
+        self.rate = max(limit - self.capacity, 1.0) / 60.0
+        self.balance = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.balance = min(self.capacity, self.balance + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        """
+        Takes units from the bucket.
+
+        Returns:
+            float: Seconds to wait before the reservation is covered.
+        """
+        self._refill(now)
+        self.balance -= amount
+        return max(0.0, -self.balance / self.rate)
+
+    def refund(self, amount, now):
+        """Gives back units (negative amounts take more), e.g. to settle an estimate."""
+        self._refill(now)
+        self.balance = min(self.capacity, self.balance + amount)
+
+
+class RequestScheduler:
+    """
+    Process-wide scheduler of model requests.
+
+    Every request reserves one unit of a requests-per-minute bucket and its
+    estimated tokens of a tokens-per-minute bucket, waits for a free concurrency
+    slot and is then sent. A failed request gives its slot back before backing
+    off and takes one again to retry. Rate-limit errors pause every caller for the delay
+    suggested by the server (Retry-After header or RetryInfo detail), with jitter;
+    without a suggestion the request backs off exponentially with full jitter.
+
+    Args:
+        rpm (int): Requests per minute allowed by the model quota.
+        tpm (int): Tokens per minute allowed by the model quota.
+        max_concurrency (int): Requests in flight at the same time.
+        attempts (int): Attempts per request before the error is raised.
+        base_wait (float): First backoff delay when the server suggests none (seconds).
+        max_wait (float): Maximum delay of a single backoff (seconds).
+        jitter (float): Fraction of random delay added to server-suggested waits.
+    """
+
+    def __init__(self, rpm=10, tpm=250_000, max_concurrency=4, attempts=5, base_wait=2.0, max_wait=120.0, jitter=0.2):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.attempts = attempts
+        self.base_wait = base_wait
+        self.max_wait = max_wait
+        self.jitter = jitter
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._metrics = {"requests": 0, "retries": 0, "throttled": 0, "queued_s": 0.0, "throttled_s": 0.0, "input_tokens": 0, "output_tokens": 0}
+
+    @classmethod
+    def from_env(cls):
+        """Scheduler configured with GEMINI_RPM, GEMINI_TPM and GEMINI_MAX_CONCURRENCY."""
+        return cls(
+            rpm=int(os.environ.get("GEMINI_RPM", 10)),
+            tpm=int(os.environ.get("GEMINI_TPM", 250_000)),
+            max_concurrency=int(os.environ.get("GEMINI_MAX_CONCURRENCY", 4)),
+        )
+
+    def call(self, function, *args, tokens=0, **kwargs):
+        """
+        Sends one request through the scheduler, retrying rate-limit and transient errors.
+
+        Args:
+            function (callable): Function performing the request.
+            tokens (int): Estimated tokens of the request.
+
+        Returns:
+            The result of the function.
+
+        Raises:
+            Exception: Non-retryable errors, or the last error once the attempts are exhausted.
+        """
+        for attempt in range(self.attempts):
+            self._acquire(tokens)
+            try:
+                return function(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.attempts - 1:
+                    raise
+                error = e
+            finally:
+                self._slots.release()
+            # The slot is free while backing off: other requests can be sent meanwhile
+            self._backoff(error, attempt)
+
+    def stream(self, function, *args, tokens=0, **kwargs):
+        """
+        Streaming version of call. Errors are only retried before the first chunk is yielded.
+
+        Yields:
+            The chunks produced by the function.
+        """
+        for attempt in range(self.attempts):
+            self._acquire(tokens)
+            started = False
+            try:
+                for chunk in function(*args, **kwargs):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or not is_retryable(e) or attempt == self.attempts - 1:
+                    raise
+                error = e
+            finally:
+                self._slots.release()
+            self._backoff(error, attempt)
+
+    def settle(self, estimated, input_tokens, output_tokens):
+        """
+        Corrects the tokens bucket with the real usage of a request.
+
+        Args:
+            estimated (int): Tokens reserved before sending the request.
+            input_tokens (int): Prompt tokens reported by the model.
+            output_tokens (int): Output tokens reported by the model.
+        """
+        with self._lock:
+            self.tokens.refund(estimated - input_tokens - output_tokens, time.monotonic())
+            self._metrics["input_tokens"] += input_tokens
+            self._metrics["output_tokens"] += output_tokens
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Requests sent, retries, rate-limit responses, seconds spent queued
+            (waiting for quota or a slot), seconds spent throttled (backing off) and tokens used.
+        """
+        with self._lock:
+            return dict(self._metrics)
+
+    def report(self):
+        """One-line summary of the metrics."""
+        m = self.metrics()
+        return (f"Peticiones al modelo: {m['requests']} | Reintentos: {m['retries']} | 429 recibidos: {m['throttled']} | "
+                f"En cola: {m['queued_s']:.1f} s | Pausado por límite: {m['throttled_s']:.1f} s | "
+                f"Tokens: {m['input_tokens']} entrada / {m['output_tokens']} salida")
+
+    def _acquire(self, tokens):
+        start = time.monotonic()
+        # A rate-limit response pauses every caller until the suggested time
+        pause = 0.0
+        while True:
+            with self._lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(remaining)
+            pause += remaining
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.requests.reserve(1, now), self.tokens.reserve(tokens, now))
+        if wait:
+            time.sleep(wait)
+        self._slots.acquire()
+        queued = time.monotonic() - start - pause
+        with self._lock:
+            self._metrics["requests"] += 1
+            self._metrics["queued_s"] += queued
+            self._metrics["throttled_s"] += pause
+        span = tracer.current()
+        span.add("queued_s", queued)
+        span.add("throttled_s", pause)
+
+    def _backoff(self, error, attempt):
+        delay = retry_delay(error)
+        if delay is None:
+            # No suggestion from the server: exponential backoff with full jitter
+            delay = random.uniform(0, min(self.max_wait, self.base_wait * 2 ** attempt))
+        else:
+            delay = min(self.max_wait, delay * (1 + random.uniform(0, self.jitter)))
+        limited = is_rate_limited(error)
+        tracer.current().add("retries", 1)
+        with self._lock:
+            self._metrics["retries"] += 1
+            if limited:
+                self._metrics["throttled"] += 1
+                # The quota is shared: make every caller wait, not only this one
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        if limited:
+            print(f"Límite de peticiones alcanzado (intento {attempt + 1}/{self.attempts}). Pausando las llamadas {delay:.1f} s.")
+        else:
+            print(f"Error temporal del modelo (intento {attempt + 1}/{self.attempts}). Reintentando en {delay:.1f} s: {error}")
+            time.sleep(delay)
+            tracer.current().add("throttled_s", delay)
+            with self._lock:
+                self._metrics["throttled_s"] += delay
+
+
+def _errors(error):
+    # The error and its causes (agno wraps the google-genai ClientError)
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _status_codes(error):
+    codes = set()
+    for e in _errors(error):
+        for attr in ("status_code", "code"):
+            value = getattr(e, attr, None)
+            if isinstance(value, int):
+                codes.add(value)
+    return codes
+
+
+def is_rate_limited(error):
+    """Checks whether an error is a rate-limit (429 / RESOURCE_EXHAUSTED) response."""
+    return bool(_status_codes(error) & RATE_LIMIT_CODES) or any("RESOURCE_EXHAUSTED" in str(e) for e in _errors(error))
+
+
+def is_retryable(error):
+    """Checks whether an error is a rate limit or a temporary unavailability of the service."""
+    if is_rate_limited(error) or _status_codes(error) & TRANSIENT_CODES:
+        return True
+    return any("UNAVAILABLE" in str(e) for e in _errors(error))
+
+
+def retry_delay(error):
+    """
+    Retry delay suggested by the server, from the Retry-After header or the
+    google.rpc.RetryInfo detail of the error.
+
+    Args:
+        error (Exception): Error raised by the model call.
+
+    Returns:
+        float | None: Seconds to wait, or None if the server suggested nothing.
+    """
+    for e in _errors(error):
+        headers = getattr(getattr(e, "response", None), "headers", None)
+        value = headers.get("retry-after") if headers is not None else None
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        delay = _find_retry_info(getattr(e, "details", None))
+        if delay is not None:
+            return delay
+        match = re.search(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s|retry in (\d+(?:\.\d+)?)\s*s", str(e))
+        if match:
+            return float(match.group(1) or match.group(2))
+    return None
+
+
+def _find_retry_info(details):
+    # Searches the JSON error body for {"@type": ".../google.rpc.RetryInfo", "retryDelay": "37s"}
+    if isinstance(details, dict):
+        if "RetryInfo" in str(details.get("@type", "")) and details.get("retryDelay"):
+            return float(str(details["retryDelay"]).rstrip("s"))
+        values = details.values()
+    elif isinstance(details, list):
+        values = details
+    else:
+        return None
+    for value in values:
+        delay = _find_retry_info(value)
+        if delay is not None:
+            return delay
+    return None
+
+
+def estimate_tokens(messages, tools=None, output_tokens=1024):
+    """
+    Rough token count of a request (4 characters per token) plus an output allowance.
+
+    Args:
+        messages (list): Messages sent to the model.
+        tools (list): Tool definitions sent with the request.
+        output_tokens (int): Tokens reserved for the response.
+
+    Returns:
+        int: Estimated tokens.
+    """
+    chars = sum(len(str(getattr(m, "content", "") or "")) for m in messages or [])
+    chars += len(str(tools or ""))
+    return chars // 4 + output_tokens
+
+
+# Process-wide scheduler shared by every agent
+scheduler = RequestScheduler.from_env()
+
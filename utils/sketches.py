@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+
+
+def hash_values(values):
+    """
+    Hashes an array of values to uint64 fingerprints.
+
+    Args:
+        values (np.ndarray | pd.Series): Values to hash. Numeric values are cast to float64
+            so that the same number hashes equally whether it was parsed as int or float.
+
+    Returns:
+        np.ndarray: uint64 hashes, one per value.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iuf":
+        values = values.astype(np.float64)
+    return pd.util.hash_array(values)
+
+
+class HyperLogLog:
+    """
+    Mergeable distinct counter. Counts exactly while the number of distinct
+    hashes is below exact_limit and switches to HyperLogLog registers afterwards.
+
+    Args:
+        p (int): Number of register bits; the sketch uses 2**p registers (default 12, ~1.6% error).
+        exact_limit (int): Distinct hashes kept exactly before switching to registers.
+    """
+
+    def __init__(self, p=12, exact_limit=1 << 14):
+        self.p = p
+        self.exact_limit = exact_limit
+        self._exact = np.empty(0, dtype=np.uint64)
+        self._registers = None
+
+    def update(self, hashes):
+        """Adds an array of uint64 hashes."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if hashes.size == 0:
+            return
+        if self._registers is None:
+            self._exact = np.union1d(self._exact, hashes)
+            if self._exact.size > self.exact_limit:
+                self._registers = np.zeros(1 << self.p, dtype=np.uint8)
+                self._add_to_registers(self._exact)
+                self._exact = np.empty(0, dtype=np.uint64)
+        else:
+            self._add_to_registers(hashes)
+
+    def _add_to_registers(self, hashes):
+        p = self.p
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+        # Exact bit length of the remaining bits, split in two halves representable as float
+        high = (rest >> np.uint64(32)).astype(np.float64)
+        low = (rest & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        bit_length = np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+        rank = ((64 - p) - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self._registers, index, rank)
+
+    def merge(self, other):
+        """Merges another sketch with the same precision into this one."""
+        if other._registers is None:
+            self.update(other._exact)
+            return
+        if self._registers is None:
+            self._registers = np.zeros(1 << self.p, dtype=np.uint8)
+            self._add_to_registers(self._exact)
+            self._exact = np.empty(0, dtype=np.uint64)
+        np.maximum(self._registers, other._registers, out=self._registers)
+
+    def count(self):
+        """
+        Returns the (estimated) number of distinct hashes.
+
+        Returns:
+            int: Exact count in exact mode, HyperLogLog estimate otherwise.
+        """
+        if self._registers is None:
+            return int(self._exact.size)
+        m = 1 << self.p
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self._registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self._registers == 0))
+        # Small range correction (linear counting)
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch (KLL compactors). Values are exact while they fit
+    in the first compactor; afterwards quantiles and ranks are approximate with
+    an error of roughly 1.7 / k of the number of values.
+
+    Args:
+        k (int): Accuracy parameter (size of the largest compactor, default 200).
+        seed (int): Seed of the random compaction offsets.
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(8, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """Adds an array of values. NaN values are ignored."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.n += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """Merges another sketch into this one."""
+        self.n += other.n
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0, dtype=np.float64))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compress()
+
+    def _compress(self):
+        # Compact every level over capacity: keep one of each pair, promoted with double weight
+        compacted = True
+        while compacted:
+            compacted = False
+            for level in range(len(self.levels)):
+                items = self.levels[level]
+                if items.size <= self._capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                items = np.sort(items)
+                keep = items[-1:] if items.size % 2 else items[:0]
+                pairs = items[:-1] if items.size % 2 else items
+                offset = int(self._rng.integers(2))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], pairs[offset::2]])
+                self.levels[level] = keep
+                compacted = True
+
+    @property
+    def exact(self):
+        """True while no value has been compacted."""
+        return len(self.levels) == 1
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level.size, 2 ** h, dtype=np.int64) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], weights[order]
+
+    def quantile(self, q):
+        """
+        Returns the q-quantile. In exact mode it uses linear interpolation like pandas.
+
+        Args:
+            q (float): Quantile between 0 and 1.
+
+        Returns:
+            float: Quantile value (NaN if the sketch is empty).
+        """
+        if self.n == 0:
+            return np.nan
+        if self.exact:
+            return float(np.quantile(self.levels[0], q))
+        items, weights = self._weighted()
+        cumulative = np.cumsum(weights)
+        position = min(int(np.searchsorted(cumulative, q * cumulative[-1])), items.size - 1)
+        return float(items[position])
+
+    def count_below(self, value):
+        """(Estimated) number of values strictly lower than value."""
+        if self.exact:
+            return int(np.count_nonzero(self.levels[0] < value))
+        items, weights = self._weighted()
+        return int(weights[items < value].sum())
+
+    def count_above(self, value):
+        """(Estimated) number of values strictly greater than value."""
+        if self.exact:
+            return int(np.count_nonzero(self.levels[0] > value))
+        items, weights = self._weighted()
+        return int(weights[items > value].sum())
@@ -0,0 +1,146 @@
+import os
+import threading
+from itertools import product
+from concurrent.futures import ThreadPoolExecutor
+from utils.tracing import tracer
+
+# Alternatives of every Director decision that can be precomputed
+BRANCHES = {
+    "null_strategy": ("drop", "knn"),
+    "outliers_strategy": ("drop", "capping"),
+}
+PLAN_KEYS = ("null_strategy", "outliers_strategy", "encoding_strategy")
+
+
+def candidate_plans(likely, max_branches=4):
+    """
+    Plans the Director may return, most likely first: the plan of the local rules,
+    then the plans that differ from it in one decision, then in two. Decisions the
+    rules skip (no nulls, no outliers) are not branched.
+
+    Args:
+        likely (dict): Plan of the local rules (agents.director.plan_strategy).
+        max_branches (int): Maximum number of plans.
+
+    Returns:
+        list: Plans (dicts with the PLAN_KEYS).
+    """
+    options = []
+    for key in PLAN_KEYS:
+        choice = likely.get(key, "skip")
+        if choice in BRANCHES.get(key, ()):
+            options.append([choice] + [other for other in BRANCHES[key] if other != choice])
+        else:
+            options.append([choice])
+    plans = [dict(zip(PLAN_KEYS, values)) for values in product(*options)]
+    plans.sort(key=lambda plan: sum(plan[key] != likely.get(key, "skip") for key in PLAN_KEYS))
+    return plans[:max_branches]
+
+
+class Speculator:
+    """
+    Precomputes the preprocessing of several candidate plans while the LLM Director
+    decides. Every branch is a compiled pipeline (utils.preprocessing) run step by
+    step on a background pool; branches sharing a prefix (e.g. the same null
+    strategy) compute it once. When the plan arrives, take() returns the matching
+    branch and cancels the rest. A memory budget bounds the intermediate results
+    kept: branches that would exceed it are abandoned.
+
+    Args:
+        df (pd.DataFrame): Raw dataset.
+        plans (list): Candidate plans, most likely first (see candidate_plans).
+        memory_mb (float): Memory budget of the precomputed results (default 1024 MB).
+        max_workers (int): Branches computed at the same time (default: up to 2 cores).
+    """
+
+    def __init__(self, df, plans, memory_mb=1024, max_workers=None):
+        self.df = df
+        self.plans = plans
+        self.budget = memory_mb * 1024 ** 2
+        self.used = 0
+        self._cancelled = threading.Event()
+        self._chosen = None
+        self._lock = threading.Lock()
+        self._prefixes = {} # Steps applied -> (fitted step, result)
+        self._prefix_locks = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or min(2, os.cpu_count() or 1), thread_name_prefix="speculation")
+        self._futures = {_key(plan): self._pool.submit(self._run, plan) for plan in plans}
+
+    def _run(self, plan):
+        from utils.preprocessing import compile_plan
+
+        with tracer.span("speculate", "compute", plan=_key(plan)) as span:
+            pipeline = compile_plan(plan)
+            X = self.df
+            prefix = ()
+            for index, (name, step) in enumerate(pipeline.steps):
+                if step == "passthrough":
+                    continue
+                if self._cancelled.is_set() and _key(plan) != self._chosen:
+                    span.set(outcome="cancelled")
+                    return None
+                prefix += ((name, plan[PLAN_KEYS[index]]),)
+                result = self._step(prefix, step, X)
+                if result is None:
+                    span.set(outcome="over_budget")
+                    return None
+                pipeline.steps[index] = (name, result[0])
+                X = result[1]
+            span.set(outcome="ready", rows_out=X.shape[0], cols_out=X.shape[1])
+            return pipeline, X
+
+    def _step(self, prefix, step, X):
+        # Fitted step and output of a prefix, computed once and shared by every branch
+        with self._lock:
+            lock = self._prefix_locks.setdefault(prefix, threading.Lock())
+        with lock:
+            if prefix in self._prefixes:
+                return self._prefixes[prefix]
+            estimate = X.memory_usage(deep=False).sum()
+            with self._lock:
+                if self.used + estimate > self.budget:
+                    return None
+                self.used += estimate
+            result = (step, step.fit_transform(X))
+            with self._lock:
+                # Correct the estimate with the real size
+                self.used += result[1].memory_usage(deep=False).sum() - estimate
+            self._prefixes[prefix] = result
+            return result
+
+    def take(self, plan):
+        """
+        Returns the precomputed branch of a plan and cancels the others.
+
+        Args:
+            plan (dict): Plan chosen by the Director.
+
+        Returns:
+            tuple | None: (fitted pipeline, preprocessed DataFrame), or None if the
+            plan was not precomputed (or was abandoned).
+        """
+        self._chosen = _key(plan)
+        future = self._futures.pop(self._chosen, None)
+        self.close()
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Rama precalculada descartada por error: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._prefixes.clear()
+
+    def close(self):
+        """Cancels the pending branches and lets the running ones (except the chosen one) stop at their next step."""
+        self._cancelled.set()
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        self._pool.shutdown(wait=False)
+
+
+def _key(plan):
+    return tuple(plan.get(key, "skip") for key in PLAN_KEYS)
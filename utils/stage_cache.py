@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import shutil
+import threading
+import hashlib
+import pandas as pd
+from utils.artifacts import link_or_copy
+from utils.store import store
+
+STAGE_CACHE_FOLDER = os.path.join("data", "cache", "stages")
+
+
+class StageCache:
+    """
+    Content-addressed cache of pipeline stage outputs.
+
+    Every stage output is stored under the hash of the stage name, the content
+    fingerprint of its input dataset and its parameters. A run reuses every stage
+    whose key already exists, so it resumes from the first changed or failed step.
+    Unlike data/processed_data and data/clean_data, this folder is not wiped by
+    clear_old_data; instead, the least recently used entries are evicted when it
+    grows beyond max_bytes.
+
+    Args:
+        folder (str): Cache folder (default data/cache/stages).
+        max_bytes (int): Maximum size of the cache folder (default 2 GB).
+    """
+
+    def __init__(self, folder=STAGE_CACHE_FOLDER, max_bytes=2 * 1024 ** 3):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def key(self, stage, ref, params=None):
+        """
+        Computes the key of a stage.
+
+        Args:
+            stage (str): Stage name ('no_nulls', 'no_outliers', 'encoded', 'clean', 'model').
+            ref (str): Handle of the input dataset.
+            params (dict): Parameters that change the stage output.
+
+        Returns:
+            str: Hex digest identifying the stage output.
+        """
+        payload = json.dumps({"stage": stage, "input": store.fingerprint(ref), "params": params or {}}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def entry(self, key):
+        """Folder of a cache entry."""
+        return os.path.join(self.folder, key)
+
+    def restore(self, stage, ref, params, output_handle):
+        """
+        Registers a cached stage output in the store.
+
+        Args:
+            stage (str): Stage name.
+            ref (str): Handle of the input dataset.
+            params (dict): Stage parameters.
+            output_handle (str): Handle the stage registers its result under.
+
+        Returns:
+            bool: True if the output was found and registered.
+        """
+        folder = self.entry(self.key(stage, ref, params))
+        with self._lock:
+            if not self._touch(folder):
+                return False
+            df = pd.read_pickle(os.path.join(folder, "data.pkl"))
+        store.put(output_handle, df, parent=ref)
+        print(f"Etapa '{stage}' reutilizada de la caché: {output_handle}")
+        return True
+
+    def record(self, stage, ref, params, output_handle):
+        """
+        Stores the output a stage registered in the store.
+
+        Args:
+            stage (str): Stage name.
+            ref (str): Handle of the input dataset.
+            params (dict): Stage parameters.
+            output_handle (str): Handle of the registered result.
+
+        Returns:
+            bool: True if the output existed and was stored.
+        """
+        if not store.exists(output_handle):
+            return False
+        folder = self.entry(self.key(stage, ref, params))
+        self._write(folder, {"stage": stage, "params": params, "handle": output_handle},
+                    lambda tmp: store.get(output_handle).to_pickle(os.path.join(tmp, "data.pkl")))
+        return True
+
+    def restore_files(self, stage, ref, params, destination):
+        """
+        Copies the files of a cached stage into a folder (as hard links when possible).
+
+        Args:
+            stage (str): Stage name.
+            ref (str): Handle of the input dataset.
+            params (dict): Stage parameters.
+            destination (str): Folder to copy the files into.
+
+        Returns:
+            dict | None: Metadata of the entry (with its 'files' and optional 'text'), or None on a miss.
+        """
+        folder = self.entry(self.key(stage, ref, params))
+        with self._lock:
+            if not self._touch(folder):
+                return None
+            with open(os.path.join(folder, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            for name in meta.get("files", []):
+                link_or_copy(os.path.join(folder, name), os.path.join(destination, name))
+        return meta
+
+    def record_files(self, stage, ref, params, paths, text=None, summary=None):
+        """
+        Stores files produced by a stage (e.g. the clean data or the model plots), as
+        hard links when possible: artifacts are replaced, never modified in place.
+
+        Args:
+            stage (str): Stage name.
+            ref (str): Handle of the input dataset.
+            params (dict): Stage parameters.
+            paths (list): Files to store; missing files are skipped.
+            text (str): Optional text output of the stage (e.g. the agent report).
+            summary (dict): Optional results of the stage (e.g. best model and test F1).
+        """
+        paths = [path for path in paths if os.path.exists(path)]
+        folder = self.entry(self.key(stage, ref, params))
+
+        def copy_files(tmp):
+            for path in paths:
+                link_or_copy(path, os.path.join(tmp, os.path.basename(path)))
+
+        self._write(folder, {"stage": stage, "params": params, "files": [os.path.basename(p) for p in paths], "text": text, "summary": summary}, copy_files)
+
+    def _write(self, folder, meta, write_data):
+        # Write into a temporary folder and rename it, so an interrupted run never leaves a partial entry
+        tmp = f"{folder}.tmp-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        write_data(tmp)
+        meta["created"] = time.time()
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, default=str)
+        with self._lock:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.replace(tmp, folder)
+            self._evict(keep=folder)
+
+    def _touch(self, folder):
+        # Last access time (mtime of meta.json) drives the LRU eviction
+        try:
+            os.utime(os.path.join(folder, "meta.json"))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _evict(self, keep):
+        # Drop the least recently used entries until the folder fits in max_bytes (the new entry is kept)
+        entries = []
+        for name in os.listdir(self.folder):
+            folder = os.path.join(self.folder, name)
+            meta_path = os.path.join(folder, "meta.json")
+            if ".tmp-" in name or not os.path.exists(meta_path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+            entries.append((os.stat(meta_path).st_mtime, size, folder))
+        total = sum(size for _, size, _ in entries)
+        for _, size, folder in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if folder != keep:
+                shutil.rmtree(folder, ignore_errors=True)
+                total -= size
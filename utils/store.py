@@ -0,0 +1,323 @@
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from utils.artifacts import DEFAULT_FORMAT, FORMATS, file_format, write_frame, link_or_copy
+from utils.loader import loader
+from utils.tracing import tracer
+
+PROCESSED_FOLDER = os.path.join("data", "processed_data")
+CLEAN_FOLDER = os.path.join("data", "clean_data")
+
+
+class DatasetStore:
+    """
+    In-memory registry of DataFrames keyed by handle.
+
+    The raw file is parsed once and every stage passes a handle along instead of
+    re-reading a CSV. Registered DataFrames must be treated as read-only: a stage
+    that transforms a dataset registers the result under a new handle. Files are
+    only written as optional snapshots on a background thread, in a columnar
+    format by default (utils.artifacts). A copy of a dataset that is already on
+    disk in its processed folder is a hard link of that file, not a second write.
+
+    Args:
+        snapshots (bool): Write a snapshot of every registered stage (default True).
+        max_writers (int): Number of background threads writing snapshots (default 1).
+        artifact_format (str): 'parquet', 'feather' or 'csv' (default: parquet if pyarrow is installed).
+    """
+
+    def __init__(self, snapshots=True, max_writers=1, artifact_format=DEFAULT_FORMAT):
+        self.snapshots = snapshots
+        self.artifact_format = artifact_format
+        self._frames = {}
+        self._meta = {}
+        self._pending = []
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=max_writers, thread_name_prefix="snapshot")
+
+    def load(self, filepath, handle=None, processed_folder=PROCESSED_FOLDER, clean_folder=CLEAN_FOLDER, columns=None):
+        """
+        Parses a CSV file once, with its compact schema (utils.loader), and registers it.
+
+        Args:
+            filepath (str): Path to the CSV file.
+            handle (str): Handle to register it under (default: file name without extension).
+            processed_folder (str): Folder for the snapshots of this dataset and its stages.
+            clean_folder (str): Folder for the final outputs of this dataset.
+            columns (list): Read only these columns (default: all).
+
+        Returns:
+            str: The handle of the registered dataset.
+        """
+        handle = handle or os.path.splitext(os.path.basename(filepath))[0]
+        df = loader.read(filepath, columns=columns)
+        with self._lock:
+            self._frames[handle] = df
+            self._meta[handle] = {"source": filepath, "file": filepath, "processed": processed_folder, "clean": clean_folder}
+        return handle
+
+    def put(self, handle, df, parent=None, snapshot=None):
+        """
+        Registers a DataFrame produced by a stage.
+
+        Args:
+            handle (str): Handle of the new dataset.
+            df (pd.DataFrame): Result of the stage.
+            parent (str): Handle the dataset was derived from; its folders are inherited.
+            snapshot (bool): Override the store-level snapshot setting for this stage.
+
+        Returns:
+            str: Where the dataset can be found: the snapshot path if one is written, else the handle.
+        """
+        tracer.current().set(rows_out=df.shape[0], cols_out=df.shape[1])
+        with self._lock:
+            meta = dict(self._meta.get(parent, {"processed": PROCESSED_FOLDER, "clean": CLEAN_FOLDER}))
+            # Only the folders are inherited, not the parent's file or content hash
+            for key in ("path", "fingerprint", "file", "written"):
+                meta.pop(key, None)
+            meta["parent"] = parent
+            self._frames[handle] = df
+            self._meta[handle] = meta
+        if self.snapshots if snapshot is None else snapshot:
+            path = os.path.join(meta["processed"], f"{handle}{self.extension}")
+            future = self.snapshot(handle, path)
+            with self._lock:
+                meta.update(file=path, written=future)
+            return path
+        return handle
+
+    def track(self, handle, path, parent=None, processed_folder=None, clean_folder=None):
+        """
+        Registers a dataset that stays on disk (out-of-core stages) without loading it.
+        resolve() reads it from its file; get() and fingerprint() need a loaded dataset.
+
+        Args:
+            handle (str): Handle of the dataset.
+            path (str): File holding it (CSV or artifact).
+            parent (str): Handle the dataset was derived from; its folders are inherited.
+            processed_folder (str): Folder for the outputs of its stages (default: the parent's).
+            clean_folder (str): Folder for its final outputs (default: the parent's).
+
+        Returns:
+            str: The handle.
+        """
+        parent_handle = self.handle_of(parent) if parent else None
+        with self._lock:
+            meta = dict(self._meta.get(parent_handle, {"processed": PROCESSED_FOLDER, "clean": CLEAN_FOLDER}))
+            meta.pop("fingerprint", None)
+            meta.pop("written", None)
+            meta.update({"parent": parent, "path": path, "file": path})
+            if processed_folder:
+                meta["processed"] = processed_folder
+            if clean_folder:
+                meta["clean"] = clean_folder
+            self._frames.pop(handle, None)
+            self._meta[handle] = meta
+        return handle
+
+    @property
+    def extension(self):
+        """File extension of the artifacts written by the stages ('.parquet', '.feather' or '.csv')."""
+        return FORMATS[self.artifact_format]
+
+    def path_of(self, ref):
+        """File of a dataset registered with track (None if it is held in memory or unknown)."""
+        handle = self.handle_of(ref)
+        with self._lock:
+            return self._meta.get(handle, {}).get("path")
+
+    def get(self, handle):
+        """
+        Returns the DataFrame registered under a handle.
+
+        Raises:
+            KeyError: If the handle is not registered.
+        """
+        with self._lock:
+            return self._frames[handle]
+
+    def exists(self, handle):
+        """Checks whether a handle is registered."""
+        with self._lock:
+            return handle in self._frames
+
+    def resolve(self, ref, columns=None):
+        """
+        Returns the DataFrame for a handle, a snapshot path of a handle, or a CSV path.
+
+        Args:
+            ref (str): Handle or file path, as passed by the agents.
+            columns (list): Return only these columns (default: all).
+
+        Returns:
+            pd.DataFrame: The dataset. Files that are not registered are read from disk
+            with their compact schema (utils.loader).
+
+        Raises:
+            FileNotFoundError: If ref is neither a handle nor an existing file.
+        """
+        handle = self.handle_of(ref)
+        if handle is not None and self.exists(handle):
+            df = self.get(handle)
+            if columns is not None:
+                df = df[columns]
+        else:
+            df = loader.read(self.path_of(ref) or ref, columns=columns)
+        tracer.current().set(rows_in=df.shape[0], cols_in=df.shape[1])
+        return df
+
+    def handles(self):
+        """Handles of every registered dataset."""
+        with self._lock:
+            return list(self._meta)
+
+    def children(self, ref):
+        """
+        Handles of the datasets registered as derived directly from a dataset.
+
+        Args:
+            ref (str): Handle or snapshot path.
+
+        Returns:
+            list: The handles, in registration order.
+        """
+        handle = self.handle_of(ref)
+        with self._lock:
+            parents = [(name, meta.get("parent")) for name, meta in self._meta.items()]
+        return [name for name, parent in parents if parent is not None and self.handle_of(parent) == handle]
+
+    def handle_of(self, ref):
+        """
+        Maps a handle or a snapshot path to its registered handle.
+
+        Returns:
+            str | None: The handle, or None if ref is not registered.
+        """
+        with self._lock:
+            if ref in self._meta:
+                return ref
+            stem = os.path.splitext(os.path.basename(ref))[0]
+            if stem in self._meta:
+                return stem
+        return None
+
+    def fingerprint(self, ref):
+        """
+        Content hash of a registered dataset (values, index, column names and types).
+        It is computed once per handle.
+
+        Args:
+            ref (str): Handle or snapshot path.
+
+        Returns:
+            str: Hex digest of the dataset content.
+        """
+        handle = self.handle_of(ref)
+        with self._lock:
+            cached = self._meta.get(handle, {}).get("fingerprint")
+        if cached:
+            return cached
+        df = self.get(handle)
+        digest = hashlib.sha256()
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        digest.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode("utf-8"))
+        fingerprint = digest.hexdigest()
+        with self._lock:
+            self._meta[handle]["fingerprint"] = fingerprint
+        return fingerprint
+
+    def processed_folder(self, ref):
+        """Folder where the stages of a dataset write their outputs."""
+        return self._folder(ref, "processed", PROCESSED_FOLDER)
+
+    def clean_folder(self, ref):
+        """Folder where the final outputs of a dataset are written."""
+        return self._folder(ref, "clean", CLEAN_FOLDER)
+
+    def _folder(self, ref, key, default):
+        handle = self.handle_of(ref)
+        with self._lock:
+            return self._meta.get(handle, {}).get(key, default)
+
+    def snapshot(self, handle, path):
+        """
+        Writes a copy of a registered dataset in the background, in the format of the
+        path extension. If the dataset is already (being) written to a file of the
+        same format in its processed folder, the copy is a hard link of that file.
+
+        Args:
+            handle (str): Handle of the dataset.
+            path (str): Destination path.
+
+        Returns:
+            concurrent.futures.Future: Completion of the write.
+        """
+        with self._lock:
+            meta = dict(self._meta.get(handle, {}))
+        source = meta.get("file")
+        if source and file_format(source) == file_format(path) and meta.get("processed") \
+                and os.path.abspath(os.path.dirname(source)) == os.path.abspath(meta["processed"]):
+            future = self._writer.submit(_link_file, meta.get("written"), source, path)
+        else:
+            future = self._writer.submit(_write_frame, self.get(handle), path)
+        with self._lock:
+            self._pending.append(future)
+        return future
+
+    def wait(self):
+        """
+        Blocks until every pending snapshot is written.
+
+        Raises:
+            Exception: The first error raised by a snapshot write.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def drop(self, ref):
+        """
+        Drops a registered dataset and every dataset derived from it.
+
+        Args:
+            ref (str): Handle or snapshot path.
+        """
+        handle = self.handle_of(ref)
+        if handle is None:
+            return
+        with self._lock:
+            dropped = {handle}
+            # Descendants are registered after their parents, so one pass in order suffices
+            for name, meta in list(self._meta.items()):
+                if meta.get("parent") in dropped:
+                    dropped.add(name)
+            for name in dropped:
+                self._frames.pop(name, None)
+                self._meta.pop(name, None)
+
+    def clear(self):
+        """Drops every registered dataset."""
+        self.wait()
+        with self._lock:
+            self._frames.clear()
+            self._meta.clear()
+
+
+def _write_frame(df, path):
+    # Runs on the snapshot thread; write_frame opens its own span
+    write_frame(df, path)
+
+
+def _link_file(written, source, path):
+    # Runs on the snapshot thread, after the write of the source file (submitted earlier) if it is pending
+    if written is not None:
+        written.result()
+    with tracer.span("link", "io", path=path):
+        link_or_copy(source, path)
+
+
+# Process-wide store shared by main.py and the agent tools
+store = DatasetStore()
@@ -0,0 +1,413 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.artifacts import FrameWriter, file_format
+from utils.encoding import CategoricalEncoder
+from utils.loader import loader
+from utils.preprocessing import NullHandler, OutlierHandler, DummiesEncoder
+from utils.sketches import KLLSketch
+from utils.store import store
+from utils.tracing import tracer
+
+# Accuracy of the quantile sketches of the first pass
+QUANTILE_K = 2000
+# Values kept at each side of a sketch estimate (fraction of the column), widened x4 when it misses
+QUANTILE_MARGIN = 3 / QUANTILE_K
+
+
+class StreamingQuantiles:
+    """
+    Exact quantiles of the columns of a file read in chunks, in bounded memory.
+
+    The first pass feeds a KLL sketch per column. For every order statistic a
+    quantile needs, the sketch gives a narrow range of values that should hold it;
+    the second pass counts the values below each range and keeps the ones inside,
+    among which the exact order statistic is read. A range that missed (the sketch
+    error is probabilistic) is widened and the pass repeated. Quantiles are then
+    interpolated linearly, exactly like utils.profiling.iqr_bounds and pandas.
+
+    Args:
+        columns (list): Column names, in the order of the blocks passed to collect.
+        quantiles (tuple): Quantiles between 0 and 1.
+        k (int): Accuracy parameter of the sketches (default QUANTILE_K).
+    """
+
+    def __init__(self, columns, quantiles, k=QUANTILE_K):
+        self.columns = list(columns)
+        self.quantiles = tuple(quantiles)
+        self.sketches = [KLLSketch(k=k) for _ in self.columns]
+        self.margin = QUANTILE_MARGIN
+        self.ranges = {} # (column position, rank) -> [low, high, values below, kept values]
+        self.order_stats = {} # (column position, rank) -> exact value
+        self.first_pass = True
+        self.done = False
+
+    def collect(self, values):
+        """
+        Feeds one chunk.
+
+        Args:
+            values (np.ndarray): 2D float array, one column per entry of columns. NaN values are ignored.
+        """
+        if self.first_pass:
+            for i, sketch in enumerate(self.sketches):
+                sketch.update(values[:, i])
+            return
+        for (i, _), entry in self.ranges.items():
+            column = values[:, i]
+            entry[2] += int(np.count_nonzero(column < entry[0]))
+            entry[3].append(column[(column >= entry[0]) & (column <= entry[1])])
+
+    def end_pass(self):
+        """Closes a pass over the file; done tells whether another one is needed."""
+        if self.first_pass:
+            self.first_pass = False
+            pending = []
+            for i, sketch in enumerate(self.sketches):
+                if sketch.exact:
+                    # Every value is still in the sketch
+                    values = np.sort(sketch.levels[0])
+                    self.order_stats.update({(i, rank): values[rank] for rank in self._ranks(i)})
+                else:
+                    pending.extend((i, rank) for rank in self._ranks(i))
+            self._set_ranges(pending)
+            return
+        missed = []
+        for (i, rank), (_, _, below, kept) in self.ranges.items():
+            kept = np.sort(np.concatenate(kept)) if kept else np.empty(0)
+            if below <= rank < below + len(kept):
+                self.order_stats[(i, rank)] = kept[rank - below]
+            else:
+                missed.append((i, rank))
+        self.margin *= 4
+        self._set_ranges(missed)
+
+    def quantile(self, column, q):
+        """
+        Exact quantile of a column, once done.
+
+        Args:
+            column (str): Column name.
+            q (float): One of the quantiles.
+
+        Returns:
+            float: The quantile (NaN if the column has no values).
+        """
+        i = self.columns.index(column)
+        n = self.sketches[i].n
+        if n == 0:
+            return np.nan
+        position = (n - 1) * q
+        low = int(np.floor(position))
+        high = min(low + 1, n - 1)
+        v_low, v_high = self.order_stats[(i, low)], self.order_stats[(i, high)]
+        return v_low + (v_high - v_low) * (position - low)
+
+    def _ranks(self, i):
+        # Order statistics (0-based) interpolated by the quantiles of column i
+        n = self.sketches[i].n
+        ranks = set()
+        for q in self.quantiles if n else ():
+            low = int(np.floor((n - 1) * q))
+            ranks.update((low, min(low + 1, n - 1)))
+        return sorted(ranks)
+
+    def _set_ranges(self, keys):
+        self.ranges = {}
+        for i, rank in keys:
+            sketch = self.sketches[i]
+            q = rank / max(sketch.n - 1, 1)
+            low = sketch.quantile(q - self.margin) if q - self.margin > 0 else -np.inf
+            high = sketch.quantile(q + self.margin) if q + self.margin < 1 else np.inf
+            self.ranges[(i, rank)] = [low, high, 0, []]
+        self.done = not self.ranges
+
+
+class _NullFit:
+    # Medians and most frequent levels of a NullHandler; its training transform (dropna) needs no statistics
+    ready = True
+
+    def __init__(self, step):
+        if step.strategy != "drop":
+            raise ValueError("La imputación KNN necesita el dataset en memoria; por bloques solo se admite la estrategia 'drop'.")
+        self.step = step
+        self.medians = None
+        self.counts = {}
+
+    @property
+    def done(self):
+        return self.medians is not None and self.medians.done
+
+    def collect(self, X):
+        if self.medians is None:
+            self.step.numeric_ = X.select_dtypes(include=[np.number]).columns.tolist()
+            self.dtypes = X[self.step.numeric_].dtypes
+            self.medians = StreamingQuantiles(self.step.numeric_, (0.5,))
+        if self.medians.first_pass:
+            for col in X.columns.difference(self.step.numeric_):
+                self.counts[col] = _add_counts(self.counts.get(col), X[col])
+        self.medians.collect(X[self.step.numeric_].to_numpy(dtype=np.float64, na_value=np.nan))
+
+    def end_pass(self):
+        self.medians.end_pass()
+        if self.done:
+            self.step.fill_values_ = {col: _as_float(self.medians.quantile(col, 0.5), self.dtypes[col]) for col in self.step.numeric_}
+            for col, counts in self.counts.items():
+                self.step.fill_values_[col] = _mode(counts)
+            # Only the KNN strategy searches donors, and it is not run by chunks
+            self.step.donors_ = np.empty((0, len(self.step.numeric_)))
+
+
+class _OutlierFit:
+    # IQR bounds of an OutlierHandler, from the exact quartiles
+    def __init__(self, step):
+        if step.strategy not in ("drop", "capping"):
+            raise ValueError(f"Estrategia de outliers '{step.strategy}' no soportada. Usa 'drop' o 'capping'.")
+        self.step = step
+        self.quartiles = None
+
+    @property
+    def done(self):
+        return self.quartiles is not None and self.quartiles.done
+
+    @property
+    def ready(self):
+        return self.done
+
+    def collect(self, X):
+        if self.quartiles is None:
+            self.step.columns_ = X.select_dtypes(include=[np.number]).columns.tolist()
+            self.quartiles = StreamingQuantiles(self.step.columns_, (0.25, 0.75))
+        self.quartiles.collect(X[self.step.columns_].to_numpy(dtype=np.float64, na_value=np.nan))
+
+    def end_pass(self):
+        self.quartiles.end_pass()
+        if self.done:
+            q1 = np.array([self.quartiles.quantile(col, 0.25) for col in self.step.columns_], dtype=np.float64)
+            q3 = np.array([self.quartiles.quantile(col, 0.75) for col in self.step.columns_], dtype=np.float64)
+            iqr = q3 - q1
+            self.step.lower_ = pd.Series(q1 - 1.5 * iqr, index=self.step.columns_)
+            self.step.upper_ = pd.Series(q3 + 1.5 * iqr, index=self.step.columns_)
+
+
+class _EncoderFit:
+    # Level counts of a DummiesEncoder, accumulated over the chunks in one pass
+    def __init__(self, step):
+        self.step = step
+        self.columns = None
+        self.counts = {}
+        self.done = False
+
+    @property
+    def ready(self):
+        return self.done
+
+    def collect(self, X):
+        if self.columns is None:
+            self.columns = X.select_dtypes(include=["object", "category"]).columns.tolist()
+            self.target = X.columns[-1]
+        for col in self.columns:
+            self.counts[col] = _add_counts(self.counts.get(col), X[col])
+
+    def end_pass(self):
+        encoder = CategoricalEncoder(self.step.max_levels, self.step.min_frequency)
+        self.step.encoder_ = encoder.fit_counts(self.counts, target=self.target if self.target in self.columns else None)
+        self.done = True
+
+
+def fit_chunked(pipeline, filepath, chunksize):
+    """
+    Fits a compiled pipeline (utils.preprocessing) on a CSV file read in chunks,
+    so that memory does not grow with the file. The fitted steps are the same as
+    with pipeline.fit on the whole dataset.
+
+    Every pass streams the file through the steps already fitted and feeds the
+    statistics of the next ones: exact quantiles take two passes (see
+    StreamingQuantiles) and level counts one. A step whose training transform
+    needs no statistics (dropping nulls) lets the next step collect in the same
+    pass, so nulls + outliers + encoding are fitted in three passes.
+
+    Args:
+        pipeline (Pipeline): Pipeline built by compile_plan (KNN imputation is not supported).
+        filepath (str): Path to the CSV file.
+        chunksize (int): Rows per chunk.
+
+    Returns:
+        Pipeline: The fitted pipeline.
+
+    Raises:
+        ValueError: If the pipeline imputes nulls with KNN.
+        pd.errors.EmptyDataError: If the file has no rows.
+    """
+    fitters = [_fitter(step) for _, step in pipeline.steps if step != "passthrough"]
+    passes = 0
+    while not all(fitter.done for fitter in fitters):
+        # Steps that collect in this pass: the next unfitted ones, up to the first without a training transform
+        active = []
+        for fitter in fitters:
+            if not fitter.done:
+                active.append(fitter)
+            if not fitter.ready:
+                break
+        passes += 1
+        with tracer.span("fit_pass", "compute", path=filepath, number=passes, steps=len(active)) as span:
+            rows = 0
+            for chunk in loader.chunks(filepath, chunksize):
+                rows += len(chunk)
+                X = chunk
+                for fitter in fitters:
+                    if fitter in active:
+                        fitter.collect(X)
+                    if not fitter.ready:
+                        break
+                    X = train_transform(fitter.step, X)
+            span.set(rows_in=rows)
+        if rows == 0:
+            raise pd.errors.EmptyDataError(f"El archivo '{filepath}' no tiene filas.")
+        for fitter in active:
+            fitter.end_pass()
+    return pipeline
+
+
+def fit_transform_chunked(pipeline, filepath, output_path, chunksize):
+    """
+    Fits a compiled pipeline on a CSV file read in chunks (see fit_chunked) and
+    writes its training transform, chunk by chunk, to another file (see
+    transform_chunked). The output is the same as fit_pipeline on the whole dataset.
+
+    Args:
+        pipeline (Pipeline): Pipeline built by compile_plan.
+        filepath (str): Path to the raw CSV file.
+        output_path (str): Destination file.
+        chunksize (int): Rows per chunk.
+
+    Returns:
+        dict: Rows and columns read and written, and chunks.
+    """
+    fit_chunked(pipeline, filepath, chunksize)
+    steps = [step for _, step in pipeline.steps if step != "passthrough"]
+
+    def apply(chunk):
+        for step in steps:
+            chunk = train_transform(step, chunk)
+        return chunk
+
+    return transform_chunked(apply, filepath, output_path, chunksize)
+
+
+def transform_chunked(function, filepath, output_path, chunksize):
+    """
+    Applies a row-local function to a file chunk by chunk and appends the results
+    to another file (CSV, Parquet or Feather, from its extension). The schema of a
+    CSV output is registered in the loader, so the next stage reads it without
+    inferring it again.
+
+    Args:
+        function (callable): DataFrame -> DataFrame, applied to every chunk.
+        filepath (str): Path to the input file.
+        output_path (str): Destination file.
+        chunksize (int): Rows per chunk.
+
+    Returns:
+        dict: rows_in, cols_in, rows_out, cols_out and chunks.
+    """
+    stats = {"rows_in": 0, "cols_in": 0, "rows_out": 0, "cols_out": 0, "chunks": 0}
+    dtypes = {}
+    with tracer.span("transform_chunked", "compute", path=filepath) as span, FrameWriter(output_path) as writer:
+        for chunk in loader.chunks(filepath, chunksize):
+            result = function(chunk)
+            writer.write(result)
+            for col, dtype in result.dtypes.items():
+                dtypes.setdefault(col, set()).add(str(dtype))
+            stats["rows_in"] += len(chunk)
+            stats["rows_out"] += len(result)
+            stats["cols_in"], stats["cols_out"] = chunk.shape[1], result.shape[1]
+            stats["chunks"] += 1
+        span.set(**stats)
+    if stats["chunks"] == 0:
+        raise pd.errors.EmptyDataError(f"El archivo '{filepath}' no tiene filas.")
+    if file_format(output_path) != "csv":
+        return stats
+    # Columns with one dense type in every chunk keep it when the output is read
+    loader.remember(output_path, {col: types.pop() for col, types in dtypes.items() if len(types) == 1 and not next(iter(types)).startswith("Sparse")})
+    return stats
+
+
+def stream_stage(filepath, output_handle, function, chunksize):
+    """
+    Runs a row-local stage from the file of a dataset to a new file in its
+    processed folder (in the artifact format of the store), and registers the
+    result in the store without loading it.
+
+    Args:
+        filepath (str): Handle or CSV path of the input dataset.
+        output_handle (str): Handle of the result (also the name of its CSV file).
+        function (callable): DataFrame -> DataFrame, applied to every chunk.
+        chunksize (int): Rows per chunk.
+
+    Returns:
+        tuple: (output path, stats of transform_chunked).
+    """
+    output_path = os.path.join(store.processed_folder(filepath), f"{output_handle}{store.extension}")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    stats = transform_chunked(function, source_path(filepath), output_path, chunksize)
+    store.track(output_handle, output_path, parent=filepath)
+    return output_path, stats
+
+
+def source_path(filepath):
+    """CSV file of a dataset kept on disk (store.track), or filepath itself."""
+    return store.path_of(filepath) or filepath
+
+
+def train_transform(step, X):
+    """
+    Applies a fitted step to (a chunk of) its training data, like its fit_transform
+    would: rows with nulls or outliers are dropped according to the strategy.
+
+    Args:
+        step (NullHandler | OutlierHandler | DummiesEncoder): Fitted step.
+        X (pd.DataFrame): Chunk.
+
+    Returns:
+        pd.DataFrame: Transformed chunk.
+    """
+    if isinstance(step, NullHandler):
+        return X.dropna()
+    if isinstance(step, OutlierHandler) and step.strategy == "drop":
+        return X[~step.outliers(X).any(axis=1)] if step.columns_ else X
+    return step.transform(X)
+
+
+def _fitter(step):
+    if isinstance(step, NullHandler):
+        return _NullFit(step)
+    if isinstance(step, OutlierHandler):
+        return _OutlierFit(step)
+    if isinstance(step, DummiesEncoder):
+        return _EncoderFit(step)
+    raise ValueError(f"Paso '{type(step).__name__}' no soportado por bloques.")
+
+
+def _add_counts(total, series):
+    # Level counts of one more chunk; category levels are compared by value, not by chunk-local code
+    counts = series.value_counts()
+    counts.index = counts.index.astype(object)
+    return counts if total is None else total.add(counts, fill_value=0)
+
+
+def _as_float(value, dtype):
+    # Median in the precision of its column, like Series.median (float32 columns give float32)
+    return dtype.type(value) if dtype.kind == "f" else value
+
+
+def _mode(counts):
+    # Most frequent level, the smallest one on ties (like Series.mode().iloc[0])
+    counts = counts[counts > 0]
+    if counts.empty:
+        return None
+    modes = counts.index[counts == counts.max()].tolist()
+    try:
+        return sorted(modes)[0]
+    except TypeError:
+        return sorted(modes, key=str)[0]
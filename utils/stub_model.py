@@ -0,0 +1,107 @@
+import os
+import re
+import json
+from dataclasses import dataclass
+from uuid import uuid4
+from agno.models.base import Model
+from agno.models.response import ModelResponse
+
+PROMPT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "prompts.json")
+
+# Prompt placeholder -> tool argument
+PROMPT_ARGS = {"filename": "filepath", "action": "strategy", "plan": "use_smote", "chunksize": "chunksize", "budget": "tune_budget"}
+
+
+@dataclass
+class StubModel(Model):
+    """
+    Offline stand-in of the Gemini model for benchmarks and dry runs.
+
+    It never calls an API. The first request of an agent run answers with a call
+    to the agent's tool, with the arguments read back from the prompt (matched
+    against the templates of config/prompts.json). Once the tool has run, the
+    stub answers with the tool result as the final response. The tools are thus
+    executed exactly as with the real model, deterministically and for free.
+    Agents without tools answer with their prompt (the narrator of the tool-first
+    mode); structured outputs (the LLM Director) are not supported.
+    """
+
+    id: str = "stub"
+    name: str = "Stub"
+    provider: str = "Stub"
+
+    def invoke(self, messages, assistant_message=None, response_format=None, tools=None, tool_choice=None, run_response=None, **kwargs):
+        return self._respond(messages, tools, response_format)
+
+    async def ainvoke(self, messages, assistant_message=None, response_format=None, tools=None, tool_choice=None, run_response=None, **kwargs):
+        return self._respond(messages, tools, response_format)
+
+    def invoke_stream(self, messages, assistant_message=None, response_format=None, tools=None, tool_choice=None, run_response=None, **kwargs):
+        yield self._respond(messages, tools, response_format)
+
+    async def ainvoke_stream(self, messages, assistant_message=None, response_format=None, tools=None, tool_choice=None, run_response=None, **kwargs):
+        yield self._respond(messages, tools, response_format)
+
+    def _parse_provider_response(self, response, **kwargs):
+        return response
+
+    def _parse_provider_response_delta(self, response):
+        return response
+
+    def _respond(self, messages, tools, response_format=None):
+        # After the tool call: answer with the tool results
+        results = []
+        for message in reversed(messages):
+            if message.role != "tool":
+                break
+            results.append(str(message.content))
+        if results:
+            return ModelResponse(role="assistant", content="\n\n".join(reversed(results)))
+
+        prompt = next((str(m.content) for m in reversed(messages) if m.role == "user"), "")
+        if not tools:
+            if response_format is not None:
+                raise NotImplementedError("StubModel no simula respuestas estructuradas.")
+            return ModelResponse(role="assistant", content=prompt)
+        function = tools[0].get("function", tools[0]) if isinstance(tools[0], dict) else tools[0].to_dict()
+        accepted = set(function.get("parameters", {}).get("properties", {}))
+        arguments = {name: value for name, value in prompt_arguments(prompt).items() if name in accepted}
+        tool_call = {
+            "id": str(uuid4()),
+            "type": "function",
+            "function": {"name": function["name"], "arguments": json.dumps(arguments)},
+        }
+        return ModelResponse(role="assistant", tool_calls=[tool_call])
+
+
+def prompt_arguments(prompt):
+    """
+    Reads the tool arguments back from a prompt built with config/prompts.json.
+
+    Args:
+        prompt (str): Prompt sent to the agent.
+
+    Returns:
+        dict: Tool arguments (filepath, strategy, use_smote, chunksize, tune_budget) found in the prompt.
+    """
+    for pattern in _prompt_patterns():
+        match = pattern.match(prompt)
+        if match:
+            arguments = {PROMPT_ARGS[name]: value for name, value in match.groupdict().items() if name in PROMPT_ARGS}
+            if "chunksize" in arguments:
+                arguments["chunksize"] = int(arguments["chunksize"])
+            if "tune_budget" in arguments:
+                arguments["tune_budget"] = float(arguments["tune_budget"])
+            return arguments
+    return {}
+
+
+def _prompt_patterns():
+    with open(PROMPT_PATH, "r", encoding="utf-8") as f:
+        templates = json.load(f).values()
+    patterns = []
+    # Longest templates first, so that a prompt matches its most specific template
+    for template in sorted(templates, key=len, reverse=True):
+        regex = re.sub(r"\\\{(\w+)\\\}", lambda m: f"(?P<{m.group(1)}>.+?)", re.escape(template))
+        patterns.append(re.compile(f"^{regex}$", re.DOTALL))
+    return patterns
@@ -0,0 +1,333 @@
+import os
+import sys
+import json
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+
+
+def rss_bytes():
+    """
+    Resident memory of the process. Uses /proc/self/statm when available (Linux);
+    elsewhere ru_maxrss, which is the peak of the whole process.
+    """
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    import resource
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def tree_rss_bytes():
+    """
+    Resident memory of the process and all its descendants (e.g. the joblib/loky
+    workers of model selection). On Linux the children are read from
+    /proc/<pid>/task/<tid>/children; elsewhere psutil is used if it is installed,
+    and only the process itself is counted if it is not. Pages shared between
+    processes are counted once per process, so the sum is an upper bound.
+    """
+    if not os.path.exists("/proc/self/statm"):
+        try:
+            import psutil
+        except ImportError:
+            return rss_bytes()
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass # Exited while it was being sampled
+        return total
+    page = os.sysconf("SC_PAGE_SIZE")
+    total, pending, seen = 0, [os.getpid()], set()
+    while pending:
+        pid = pending.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page
+            for task in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            pass # Exited while it was being sampled
+    return total
+
+
+class PeakRSS:
+    """
+    Samples the resident memory of the process while a block runs, on a
+    background thread, independently of the tracer.
+
+    Uses rss_bytes: /proc/self/statm on Linux, elsewhere ru_maxrss (the peak of
+    the whole process, not of the block). With children, the memory of the
+    child processes (worker pools) is added (tree_rss_bytes).
+
+    Args:
+        interval (float): Seconds between samples (default 0.005).
+        children (bool): Also count the child processes (default False).
+
+    Attributes:
+        start (int): Resident bytes when the block started.
+        peak (int): Highest resident bytes sampled while it ran.
+    """
+
+    def __init__(self, interval=0.005, children=False):
+        self.interval = interval
+        self.children = children
+        self.start = 0
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _rss(self):
+        return tree_rss_bytes() if self.children else rss_bytes()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start = self.peak = self._rss()
+        self._thread = threading.Thread(target=self._sample, name="peak-rss", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+    @property
+    def peak_mb(self):
+        return self.peak / 1024 ** 2
+
+    @property
+    def delta_mb(self):
+        """Memory the block added on top of what the process held when it started (MB)."""
+        return max(0, self.peak - self.start) / 1024 ** 2
+
+
+class Span:
+    """
+    One traced operation (pipeline stage, agent call, model request, tool execution or file I/O).
+
+    Attributes:
+        name (str): Operation name.
+        category (str): 'dataset', 'stage', 'agent', 'llm', 'tool', 'compute' or 'io'.
+        attrs (dict): Measurements of the operation (rows and columns in and out, tokens, delays...).
+    """
+
+    def __init__(self, span_id, parent, name, category, attrs):
+        self.id = span_id
+        self.parent = parent
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.thread = threading.current_thread().name
+        self.tid = threading.get_ident()
+        self.start = time.time()
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_rss_mb = rss_bytes() / 1024 ** 2
+        self.error = None
+
+    def set(self, **attrs):
+        """Sets attributes of the span."""
+        self.attrs.update(attrs)
+
+    def add(self, key, value):
+        """Adds to a numeric attribute of the span (e.g. tokens or delays of several requests)."""
+        self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def to_dict(self):
+        return {
+            "id": self.id, "parent": self.parent, "name": self.name, "category": self.category,
+            "thread": self.thread, "start": self.start, "wall_s": self.wall_s, "cpu_s": self.cpu_s,
+            "peak_rss_mb": self.peak_rss_mb, "error": self.error, **self.attrs,
+        }
+
+
+class _NoSpan:
+    # Returned while tracing is disabled: every call is a no-op
+    def set(self, **attrs):
+        pass
+
+    def add(self, key, value):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """
+    Records nested spans of the pipeline with wall and CPU time and peak memory.
+
+    Spans nest per thread, so the batch mode threads get one tree each. While
+    tracing is enabled a background thread samples the resident memory and
+    updates the peak of every open span. Disabled (the default), span() costs
+    a single attribute check.
+
+    Args:
+        sample_interval (float): Seconds between memory samples (default 0.01).
+    """
+
+    def __init__(self, sample_interval=0.01):
+        self.enabled = False
+        self.sample_interval = sample_interval
+        self._spans = []
+        self._open = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        """Enables tracing and starts the memory sampler."""
+        self.enabled = True
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, name="trace-rss", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """Disables tracing."""
+        self.enabled = False
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            rss = rss_bytes() / 1024 ** 2
+            with self._lock:
+                for span in self._open.values():
+                    span.peak_rss_mb = max(span.peak_rss_mb, rss)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name, category="stage", **attrs):
+        """
+        Traces a block.
+
+        Args:
+            name (str): Operation name.
+            category (str): Operation category.
+            **attrs: Initial attributes of the span.
+
+        Yields:
+            Span: The span, to add measurements from inside the block.
+        """
+        if not self.enabled:
+            yield NO_SPAN
+            return
+        stack = self._stack()
+        span = Span(next(self._ids), stack[-1].id if stack else None, name, category, attrs)
+        with self._lock:
+            self._open[span.id] = span
+        stack.append(span)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.wall_s = time.perf_counter() - wall
+            span.cpu_s = time.thread_time() - cpu
+            stack.pop()
+            with self._lock:
+                self._open.pop(span.id, None)
+                span.peak_rss_mb = max(span.peak_rss_mb, rss_bytes() / 1024 ** 2)
+                self._spans.append(span)
+
+    def current(self):
+        """Innermost open span of the calling thread (a no-op span if there is none)."""
+        stack = self._stack() if self.enabled else None
+        return stack[-1] if stack else NO_SPAN
+
+    def spans(self):
+        """Closed spans, in start order."""
+        with self._lock:
+            return sorted(self._spans, key=lambda span: span.start)
+
+    def export(self, path):
+        """
+        Writes the trace. A .json path gets the Chrome trace event format (open it in
+        chrome://tracing or https://ui.perfetto.dev for a flame graph); any other path
+        gets one JSON object per span and line (JSONL).
+
+        Args:
+            path (str): Destination file.
+        """
+        spans = self.spans()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                origin = min((span.start for span in spans), default=0)
+                events = [{
+                    "name": span.name, "cat": span.category, "ph": "X", "pid": os.getpid(), "tid": span.tid,
+                    "ts": (span.start - origin) * 1e6, "dur": span.wall_s * 1e6,
+                    "args": {k: v for k, v in span.to_dict().items() if k not in ("name", "category", "start", "thread")},
+                } for span in spans]
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+            else:
+                for span in spans:
+                    f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+    def breakdown(self):
+        """
+        Self time per category: the wall time of every span minus the time of its
+        children in the same thread. Shows whether a run was dominated by the model,
+        the tools or the file I/O.
+
+        Returns:
+            dict: Category -> seconds, sorted from slowest.
+        """
+        spans = self.spans()
+        children = {}
+        for span in spans:
+            if span.parent is not None:
+                children[span.parent] = children.get(span.parent, 0.0) + span.wall_s
+        totals = {}
+        for span in spans:
+            own = max(0.0, span.wall_s - children.get(span.id, 0.0))
+            totals[span.category] = totals.get(span.category, 0.0) + own
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+    def report(self):
+        """One-line summary of the breakdown."""
+        return "Tiempo por categoría: " + " | ".join(f"{category}: {seconds:.2f} s" for category, seconds in self.breakdown().items())
+
+
+# Process-wide tracer shared by main.py, the agents and the utilities
+tracer = Tracer()
+
+
+def trace_tool(function_name, function_call, arguments):
+    """
+    agno tool hook: runs every tool call of an agent inside a 'tool' span.
+
+    Args:
+        function_name (str): Name of the tool.
+        function_call (callable): The tool (or the next hook of the chain).
+        arguments (dict): Arguments chosen by the model.
+
+    Returns:
+        The result of the tool.
+    """
+    with tracer.span(function_name, "tool", arguments=arguments):
+        return function_call(**arguments)
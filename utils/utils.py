@@ -1,47 +1,101 @@
-import time
 import os
+import time
 import shutil
+from rich.console import Console
+from rich.markdown import Markdown
+from utils.llm_cache import recorded_tools
+from utils.scheduler import is_retryable
+from utils.store import store
+from utils.tracing import tracer
 
-def retry(function, agent, prompt, attempts=3, initial_wait=5):
+def retry(function, agent, prompt, cache=None, context=None):
     """
-    Executes a function on an agent with retry logic for connection-related errors.
+    Executes a function on an agent. Every model request the agent makes goes
+    through the process-wide scheduler (utils/scheduler.py), which paces the calls
+    to the quota and retries rate-limit and temporary errors on its own.
 
     Args:
-        function_name (str): The function to call ('run' or 'print_response').
+        function (str): 'run', or 'print_response' to also print the response.
         agent (object): The agent object with the method to call.
         prompt (str): The prompt string to send to the agent.
-        attempts (int): Number of retry attempts (default 3).
-        initial_wait (int): Initial wait time between retries in seconds (default 5).
+        cache (ResponseCache): Optional response cache. Cached responses are replayed
+            instead of calling the model (re-executing the tools whose outputs are gone).
+        context (list): Extra cache key material, e.g. fingerprints of the input datasets.
 
     Returns:
-        The result of the agent method call.
+        RunOutput: The agent response (also printed with 'print_response').
 
     Raises:
-        Exception: If retries are exhausted or other errors occur.
+        Exception: If the scheduler exhausted its retries or other errors occur.
     """
-    for i in range(attempts):
+    with tracer.span(getattr(agent, "name", "agente"), "agent", function=function):
+        if cache is not None:
+            return _cached_call(function, agent, prompt, cache, context)
         try:
             if function == 'run':
                 return agent.run(prompt, stream=False) # Run without streaming
             elif function == 'print_response':
-                return agent.print_response(prompt, stream=True) # Print with streaming
+                response = agent.run(prompt, stream=False) # Run without streaming, to return the full response
+                Console().print(Markdown(str(response.content)))
+                return response
             else:
                 raise Exception
-        
         except Exception as e:
-            msg = str(e)
-            # Check for connection-related errors
-            if "503" in msg or "429" in msg or "RESOURCE_EXHAUSTED" in msg or "UNAVAILABLE" in msg:
-                print(f"Error de conexión (Intento {i+1}/{attempts}): {msg}")
-                if i < attempts - 1:
-                    print(f"Esperando {initial_wait} segundos para reintentar...")
-                    time.sleep(initial_wait)
-                    initial_wait *= 2 # Exponential backoff
-                else:
-                    print("Se agotaron los reintentos.")
-                    raise e # Rethrow exception after final attempt
-            else:
-                raise e # Rethrow non-connection-related exceptions
+            if is_retryable(e):
+                print(f"Error de conexión: se agotaron los reintentos. {e}")
+            raise e
+
+
+class ToolRun:
+    """
+    Result of a tool called directly (tool-first mode), shaped like an agent RunOutput.
+
+    Attributes:
+        content (str): Output of the tool.
+        tools (list): The tool call, with its arguments and result.
+    """
+
+    def __init__(self, content, tools):
+        self.content = content
+        self.tools = tools
+
+
+def call_tool(function, tool, arguments):
+    """
+    Runs the tool of an agent directly, without any model round-trip.
+
+    Args:
+        function (str): 'run' or 'print_response' (also prints the output, like the agent would).
+        tool (callable): Tool function (see agents.get_tool).
+        arguments (dict): Tool arguments.
+
+    Returns:
+        ToolRun: The tool output.
+    """
+    with tracer.span(tool.__name__, "tool", arguments=arguments):
+        output = tool(**arguments)
+    if function == 'print_response':
+        Console().print(Markdown(str(output)))
+    return ToolRun(output, [{"tool_name": tool.__name__, "tool_args": arguments, "result": output}])
+
+
+def _cached_call(function, agent, prompt, cache, context):
+    # Replay a cached response when the agent, prompt and input data are unchanged
+    key = cache.key(agent, prompt, context)
+    entry = cache.get(key)
+    response = cache.replay(agent, entry) if entry is not None else None
+    if response is None:
+        # Cache miss: call the model (without streaming, to capture the full response)
+        handles, since = store.handles(), time.time()
+        response = retry('run', agent, prompt)
+        cache.put(key, response.content, recorded_tools(response, handles, since))
+    else:
+        tracer.current().set(cached=True)
+        print(f"Respuesta reutilizada de la caché ({getattr(agent, 'name', 'agente')}).")
+    if function == 'print_response':
+        Console().print(Markdown(str(response.content)))
+    return response
+
             
 def clear_old_data():
     """